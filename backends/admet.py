@@ -0,0 +1,359 @@
+"""
+ADMET descriptor backend (RDKit).
+
+Molecules are split into chunks and computed on a process pool. Each
+worker parses its chunk, computes base descriptors per molecule, then
+derives the rule-based property groups over the whole chunk with array
+operations. Results come back as one columnar DataFrame; invalid
+molecules get valid=False and an error message instead of aborting the
+batch.
+"""
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, Sequence
+
+from backends.base import Capabilities
+from utils.batch_engine import run_batch
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from utils.record_index import RecordIndex
+
+# (id, kind, text) where kind is "smiles" or "molblock"
+MoleculeInput = tuple[str, str, str]
+# (molecules, property groups): one caller's request to ADMETBackend
+ADMETRequest = tuple[Sequence[MoleculeInput], Sequence[str]]
+
+PROPERTY_GROUPS: dict[str, list[str]] = {
+    "Lipinski Rule of 5": ["MW", "LogP", "HBD", "HBA", "Lipinski_violations", "Lipinski_pass"],
+    "Drug-likeness": ["QED", "TPSA", "RotatableBonds", "Veber_pass"],
+    "Solubility": ["ESOL_logS", "Solubility_class"],
+    "Permeability": ["GI_absorption_high", "BBB_permeant"],
+    "Toxicity": ["PAINS_alerts", "Brenk_alerts"],
+}
+
+DEFAULT_CHUNK_SIZE = 2_000
+_BASE = ("MW", "LogP", "HBD", "HBA", "TPSA", "RotatableBonds", "AromaticProportion", "QED", "PAINS_alerts", "Brenk_alerts")
+
+_filter_catalogs = None
+
+
+def _catalogs():
+    """PAINS and Brenk catalogs, built once per worker process."""
+    global _filter_catalogs
+    if _filter_catalogs is None:
+        from rdkit.Chem import FilterCatalog
+
+        catalogs = []
+        for name in ("PAINS", "BRENK"):
+            params = FilterCatalog.FilterCatalogParams()
+            params.AddCatalog(getattr(FilterCatalog.FilterCatalogParams.FilterCatalogs, name))
+            catalogs.append(FilterCatalog.FilterCatalog(params))
+        _filter_catalogs = tuple(catalogs)
+    return _filter_catalogs
+
+
+def _base_descriptors(mol, with_alerts: bool) -> tuple:
+    from rdkit.Chem import Crippen, Descriptors, Lipinski, QED, rdMolDescriptors
+
+    heavy = mol.GetNumHeavyAtoms()
+    aromatic = sum(atom.GetIsAromatic() for atom in mol.GetAtoms())
+    pains = brenk = float("nan")
+    if with_alerts:
+        pains_catalog, brenk_catalog = _catalogs()
+        pains = len(pains_catalog.GetMatches(mol))
+        brenk = len(brenk_catalog.GetMatches(mol))
+    return (
+        Descriptors.MolWt(mol),
+        Crippen.MolLogP(mol),
+        Lipinski.NumHDonors(mol),
+        Lipinski.NumHAcceptors(mol),
+        rdMolDescriptors.CalcTPSA(mol),
+        rdMolDescriptors.CalcNumRotatableBonds(mol),
+        aromatic / heavy if heavy else 0.0,
+        QED.qed(mol),
+        pains,
+        brenk,
+    )
+
+
+def compute_chunk(molecules: Sequence[MoleculeInput], properties: Sequence[str]) -> dict:
+    """
+    Compute descriptors for one chunk. Runs in a worker process.
+
+    Returns:
+        {'status': 'done', 'output': {column: list}} in the batch-engine contract
+    """
+    import numpy as np
+    from rdkit import Chem, RDLogger
+
+    RDLogger.DisableLog("rdApp.*")
+    with_alerts = "Toxicity" in properties
+    ids, smiles, errors = [], [], []
+    base = np.full((len(molecules), len(_BASE)), np.nan)
+    for i, (mol_id, kind, text) in enumerate(molecules):
+        mol = Chem.MolFromSmiles(text) if kind == "smiles" else Chem.MolFromMolBlock(text)
+        ids.append(mol_id)
+        if mol is None:
+            smiles.append(text if kind == "smiles" else None)
+            errors.append(f"Could not parse {kind}")
+            continue
+        try:
+            base[i] = _base_descriptors(mol, with_alerts)
+            smiles.append(Chem.MolToSmiles(mol))
+            errors.append(None)
+        except Exception as e:
+            smiles.append(text if kind == "smiles" else None)
+            errors.append(str(e))
+
+    columns = dict(zip(_BASE, base.T))
+    valid = np.array([e is None for e in errors], dtype=bool)
+    mw, logp, hbd, hba = columns["MW"], columns["LogP"], columns["HBD"], columns["HBA"]
+    tpsa, rotb = columns["TPSA"], columns["RotatableBonds"]
+
+    derived = {
+        "Lipinski_violations": (mw > 500).astype(int) + (logp > 5) + (hbd > 5) + (hba > 10),
+        "Veber_pass": (rotb <= 10) & (tpsa <= 140),
+        # Delaney ESOL: logS = 0.16 - 0.63 cLogP - 0.0062 MW + 0.066 RB - 0.74 AP
+        "ESOL_logS": 0.16 - 0.63 * logp - 0.0062 * mw + 0.066 * rotb - 0.74 * columns["AromaticProportion"],
+        # BOILED-Egg style cut-offs on TPSA and logP
+        "GI_absorption_high": (tpsa <= 142) & (logp >= -2.3) & (logp <= 6.8),
+        "BBB_permeant": (tpsa <= 79) & (logp >= 0.4) & (logp <= 6.0),
+    }
+    derived["Lipinski_pass"] = derived["Lipinski_violations"] <= 1
+    derived["Solubility_class"] = np.select(
+        [derived["ESOL_logS"] >= -2, derived["ESOL_logS"] >= -4, derived["ESOL_logS"] >= -6],
+        ["High", "Moderate", "Low"],
+        "Insoluble",
+    )
+    columns.update(derived)
+
+    out = {"id": ids, "smiles": smiles, "valid": valid.tolist(), "error": errors}
+    for group in properties:
+        for name in PROPERTY_GROUPS.get(group, []):
+            values = np.asarray(columns[name], dtype=object)
+            values[~valid] = None
+            out[name] = values.tolist()
+    return {"status": "done", "output": out}
+
+
+def predict(
+    molecules: Iterable[MoleculeInput],
+    properties: Sequence[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_workers: Optional[int] = None,
+    on_progress=None,
+) -> "pd.DataFrame":
+    """
+    Compute the selected property groups for many molecules.
+
+    Args:
+        molecules: (id, kind, text) tuples; kind is "smiles" or "molblock"
+        properties: Keys of PROPERTY_GROUPS
+        chunk_size: Molecules per worker task
+        max_workers: Worker processes (defaults to the CPU count)
+        on_progress: Called as on_progress(chunks_done, total_chunks)
+
+    Returns:
+        DataFrame with id, smiles, valid, error and the selected property columns
+    """
+    unknown = [p for p in properties if p not in PROPERTY_GROUPS]
+    if unknown:
+        raise ValueError(f"Unknown property groups: {', '.join(unknown)}")
+    chunks = list(_chunked(molecules, chunk_size))
+    if not chunks:
+        return _empty_frame(properties)
+
+    if len(chunks) == 1:
+        results = [_run_inline(_compute_task, (chunks[0], tuple(properties)))]
+    else:
+        results = run_batch(
+            [(chunk, tuple(properties)) for chunk in chunks],
+            _compute_task,
+            executor="process",
+            max_workers=max_workers or os.cpu_count() or 1,
+            on_progress=on_progress,
+        )
+    return _assemble(
+        results, [[(m[0], m[2] if m[1] == "smiles" else None) for m in chunk] for chunk in chunks], properties
+    )
+
+
+def predict_sdf(
+    index: "RecordIndex",
+    properties: Sequence[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_workers: Optional[int] = None,
+    on_progress=None,
+) -> "pd.DataFrame":
+    """
+    Like predict(), for an indexed SDF file. Workers receive record ranges
+    and read their own molecules from the file, so nothing is split or
+    pickled in the parent process.
+
+    Args:
+        index: RecordIndex over the SDF file (its .idx is reused by workers)
+    """
+    unknown = [p for p in properties if p not in PROPERTY_GROUPS]
+    if unknown:
+        raise ValueError(f"Unknown property groups: {', '.join(unknown)}")
+    shards = index.shards(-(-len(index) // chunk_size))
+    if not shards:
+        return _empty_frame(properties)
+
+    tasks = [(str(index.path), start, stop, tuple(properties)) for start, stop in shards]
+    if len(tasks) == 1:
+        results = [_run_inline(_compute_sdf_task, tasks[0])]
+    else:
+        results = run_batch(
+            tasks,
+            _compute_sdf_task,
+            executor="process",
+            max_workers=max_workers or os.cpu_count() or 1,
+            on_progress=on_progress,
+        )
+    return _assemble(
+        results, [[(f"mol_{i + 1}", None) for i in range(start, stop)] for start, stop in shards], properties
+    )
+
+
+class ADMETBackend:
+    """
+    backends.base.Backend adapter. Requests from many callers are computed
+    in one predict() call over all their molecules, with the union of their
+    property groups, and the frame is split back into one DataFrame per
+    request holding only the groups that request asked for.
+    """
+
+    capabilities = Capabilities("admet", batchable=True, max_batch_size=16, batch_window=0.02)
+
+    def run_batch(self, requests: Sequence[ADMETRequest]) -> list:
+        out: list = [None] * len(requests)
+        batch = []
+        for i, (molecules, properties) in enumerate(requests):
+            unknown = [p for p in properties if p not in PROPERTY_GROUPS]
+            if unknown:
+                out[i] = ValueError(f"Unknown property groups: {', '.join(unknown)}")
+            elif not molecules:
+                out[i] = _empty_frame(properties)
+            else:
+                batch.append(i)
+        if not batch:
+            return out
+
+        union = [g for g in PROPERTY_GROUPS if any(g in requests[i][1] for i in batch)]
+        df = predict((m for i in batch for m in requests[i][0]), union)
+        start = 0
+        for i in batch:
+            molecules, properties = requests[i]
+            out[i] = df.iloc[start : start + len(molecules)][_columns(properties)].reset_index(drop=True)
+            start += len(molecules)
+        return out
+
+
+def _columns(properties: Sequence[str]) -> list[str]:
+    return ["id", "smiles", "valid", "error"] + [c for g in properties for c in PROPERTY_GROUPS[g]]
+
+
+def _empty_frame(properties: Sequence[str] = ()) -> "pd.DataFrame":
+    import pandas as pd
+
+    return pd.DataFrame(columns=_columns(properties))
+
+
+def _run_inline(fn, task) -> dict:
+    """Run a single chunk in this process, failing its molecules as a pool worker would."""
+    try:
+        return fn(task)
+    except Exception as e:
+        return {"status": "failed", "error": str(e)}
+
+
+def _assemble(
+    results: Sequence[dict], fallbacks: Sequence[list[tuple[str, Optional[str]]]], properties: Sequence[str]
+) -> "pd.DataFrame":
+    """Concatenate chunk results; property columns of failed chunks are NaN."""
+    import pandas as pd
+
+    frames = []
+    for fallback, result in zip(fallbacks, results):
+        if result.get("status") == "done":
+            frames.append(pd.DataFrame(result["output"]))
+        else:
+            # A crashed chunk only fails its own molecules
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "id": [m[0] for m in fallback],
+                        "smiles": [m[1] for m in fallback],
+                        "valid": False,
+                        "error": result.get("error", "Worker failed"),
+                    }
+                )
+            )
+    return pd.concat(frames, ignore_index=True).reindex(columns=_columns(properties))
+
+
+def _compute_sdf_task(task: tuple[str, int, int, tuple[str, ...]]) -> dict:
+    from utils.record_index import RecordIndex, sdf_title
+
+    path, start, stop, properties = task
+    with RecordIndex(path, "sdf") as index:
+        molecules = [
+            (sdf_title(record) or f"mol_{start + i + 1}", "molblock", record)
+            for i, record in enumerate(index.records(start, stop))
+        ]
+    return compute_chunk(molecules, properties)
+
+
+def _compute_task(task: tuple[Sequence[MoleculeInput], tuple[str, ...]]) -> dict:
+    return compute_chunk(*task)
+
+
+def _chunked(items: Iterable[MoleculeInput], size: int) -> Iterator[list[MoleculeInput]]:
+    chunk: list[MoleculeInput] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def smiles_inputs(smiles: Iterable[str], ids: Optional[Iterable[str]] = None) -> Iterator[MoleculeInput]:
+    """Wrap SMILES strings (one per line in free text is fine) as molecule inputs."""
+    ids = iter(ids) if ids is not None else None
+    for i, smi in enumerate(smiles):
+        smi = str(smi).strip()
+        if smi:
+            yield (str(next(ids)) if ids is not None else f"mol_{i + 1}", "smiles", smi)
+
+
+def sdf_inputs(text: str) -> Iterator[MoleculeInput]:
+    """Split multi-record SDF/MOL text into molblock inputs, named by their title line."""
+    for i, record in enumerate(text.split("$$$$")):
+        # Drop only the line break after "$$$$"; a molblock's title line may be blank
+        block = record
+        if i > 0:
+            block = record[2:] if record.startswith("\r\n") else record[1:] if record.startswith("\n") else record
+        if not block.strip():
+            continue
+        title = block.splitlines()[0].strip() if block else ""
+        yield (title or f"mol_{i + 1}", "molblock", block)
+
+
+def csv_inputs(path: Path) -> Iterator[MoleculeInput]:
+    """Stream a CSV with a SMILES column (and optional id/name column) as molecule inputs."""
+    from utils.batch_reader import BatchSource
+
+    first_row = 0
+    for chunk in BatchSource(path).iter_chunks():
+        lower = {c.lower(): c for c in chunk.columns}
+        if "smiles" not in lower:
+            raise ValueError("CSV needs a 'smiles' column.")
+        id_col = lower.get("id") or lower.get("name")
+        ids = chunk[id_col].astype(str) if id_col else [f"mol_{first_row + i + 1}" for i in range(len(chunk))]
+        yield from zip(ids, ["smiles"] * len(chunk), chunk[lower["smiles"]].astype(str))
+        first_row += len(chunk)
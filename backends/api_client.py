@@ -0,0 +1,290 @@
+"""
+Asynchronous HTTP client for remote RDF3 providers.
+
+All jobs in a batch share one aiohttp session, so requests reuse pooled
+keep-alive connections; get_shared_client() keeps one session per provider
+open for the whole process. Jobs are submitted concurrently, polled with
+exponential backoff and jitter, and yielded as they complete. Rate-limit
+responses (429/503 with Retry-After, or X-RateLimit-Remaining: 0 with
+X-RateLimit-Reset) pause every request in the batch, not just the one
+that hit the limit.
+
+Provider protocol:
+    POST {api_url}/jobs         {"output_prefix", "num_designs", "seed",
+                                 "constraints", "scaffold_pdb_b64",
+                                 "ligand_sdf_b64"}  -> {"job_id": ...}
+                                with an Idempotency-Key header: a retried
+                                submission returns the job the key created
+    GET  {api_url}/jobs/{id}    -> {"status": "queued"|"running"|"done"|"failed",
+                                    "results": [{"name", "pdb"}], "error"}
+"""
+import asyncio
+import atexit
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Optional, Sequence
+
+from backends.rdf3 import RDF3Config, RDF3Result
+from utils.metrics import count, record, span
+
+DEFAULT_MAX_CONNECTIONS = 32
+DEFAULT_MAX_JOBS = 256
+POLL_INITIAL_SECONDS = 1.0
+POLL_MAX_SECONDS = 30.0
+POLL_BACKOFF = 1.5
+REQUEST_RETRIES = 5
+JOB_TIMEOUT_SECONDS = 3600.0
+# X-RateLimit-Reset values above this are Unix timestamps rather than delays
+EPOCH_THRESHOLD = 1e9
+
+
+class _RateGate:
+    """Shared pause that every request waits on after a rate-limit signal."""
+
+    def __init__(self) -> None:
+        self.resume_at = 0.0
+
+    async def wait(self) -> None:
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    def observe(self, headers: Any) -> None:
+        if headers.get("X-RateLimit-Remaining") == "0":
+            try:
+                reset = float(headers.get("X-RateLimit-Reset", "1"))
+            except ValueError:
+                reset = 1.0
+            if reset > EPOCH_THRESHOLD:  # some providers send the reset time, not seconds until it
+                reset = reset - time.time()
+            self.pause(max(reset, 0.0))
+
+
+def _retry_after(headers: Any, default: float) -> float:
+    try:
+        return float(headers.get("Retry-After", default))
+    except ValueError:
+        return default
+
+
+def _result_name(name: Any, default: str) -> str:
+    """A provider-supplied file name reduced to a safe basename (it becomes a local path and ZIP entry)."""
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", Path(str(name or "").replace("\\", "/")).name)
+    return name if name.strip(".") else default
+
+
+def config_payload(config: RDF3Config) -> dict[str, Any]:
+    """JSON body for submitting one config."""
+    scaffold = config.scaffold_pdb
+    if scaffold is None and config.scaffold_path is not None:
+        scaffold = Path(config.scaffold_path).read_bytes()
+    ligand = config.ligand_sdf
+    if ligand is None and config.ligand_path is not None:
+        ligand = Path(config.ligand_path).read_bytes()
+    return {
+        "output_prefix": config.output_prefix,
+        "num_designs": config.num_designs,
+        "seed": config.seed,
+        "constraints": json.loads(config.constraints_json or "{}"),
+        "scaffold_pdb_b64": base64.b64encode(scaffold).decode("ascii") if scaffold else None,
+        "ligand_sdf_b64": base64.b64encode(ligand).decode("ascii") if ligand else None,
+    }
+
+
+class RDF3ApiClient:
+    """
+    Pooled async client for one provider.
+
+    Args:
+        api_url: Provider base URL
+        api_key: Bearer token, if the provider needs one
+        max_connections: Size of the keep-alive connection pool
+        max_jobs: Maximum remote jobs outstanding at once
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: Optional[str] = None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_jobs: int = DEFAULT_MAX_JOBS,
+    ):
+        if not api_url:
+            raise ValueError("api_url is required for the API backend.")
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self._jobs = asyncio.Semaphore(max_jobs)
+        self._gate = _RateGate()
+        self._session = None
+
+    async def __aenter__(self) -> "RDF3ApiClient":
+        import aiohttp
+
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        self._session = aiohttp.ClientSession(
+            headers=headers,
+            connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=120),
+        )
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self._session.close()
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> dict:
+        import aiohttp
+
+        delay = POLL_INITIAL_SECONDS
+        for attempt in range(REQUEST_RETRIES + 1):
+            await self._gate.wait()
+            try:
+                async with self._session.request(method, self.api_url + path, **kwargs) as resp:
+                    self._gate.observe(resp.headers)
+                    if resp.status in (429, 503):
+                        self._gate.pause(_retry_after(resp.headers, delay))
+                    elif resp.status >= 500:
+                        pass  # transient, retry below
+                    else:
+                        resp.raise_for_status()
+                        return await resp.json()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == REQUEST_RETRIES:
+                    raise
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, POLL_MAX_SECONDS)
+        raise RuntimeError(f"{method} {path} failed after {REQUEST_RETRIES + 1} attempts")
+
+    async def run(self, config: RDF3Config) -> list[RDF3Result]:
+        """Submit one config and poll until it finishes. Failures become failed results."""
+        queued_at = time.perf_counter()
+        async with self._jobs:
+            record("api.slot_wait", time.perf_counter() - queued_at)
+            try:
+                with span("api.submit"):
+                    # Retries of a submission that may have reached the provider must not start a second job
+                    submitted = await self._request(
+                        "POST", "/jobs", json=config_payload(config), headers={"Idempotency-Key": uuid.uuid4().hex}
+                    )
+                job_id = submitted["job_id"]
+                interval = POLL_INITIAL_SECONDS
+                deadline = time.monotonic() + JOB_TIMEOUT_SECONDS
+                with span("api.remote"):
+                    while True:
+                        # Full jitter keeps hundreds of pollers from synchronizing
+                        await asyncio.sleep(interval * random.uniform(0.5, 1.0))
+                        job = await self._request("GET", f"/jobs/{job_id}")
+                        if job["status"] in ("done", "failed"):
+                            break
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"Remote job {job_id} did not finish in time.")
+                        interval = min(interval * POLL_BACKOFF, POLL_MAX_SECONDS)
+            except Exception as e:
+                return [RDF3Result(status="failed", error=str(e) or type(e).__name__)]
+
+        if job["status"] == "failed":
+            return [RDF3Result(status="failed", error=job.get("error") or "Remote job failed.")]
+        count("portal_bytes_total", sum(len(item["pdb"]) for item in job.get("results", [])), stage="api.results")
+        return [
+            RDF3Result(
+                status="done",
+                pdb_content=item["pdb"],
+                output_path=Path(_result_name(item.get("name"), f"{config.output_prefix}_{i}.pdb")),
+            )
+            for i, item in enumerate(job.get("results", []))
+        ]
+
+    async def run_many(self, configs: Sequence[RDF3Config]) -> AsyncIterator[tuple[int, list[RDF3Result]]]:
+        """Run all configs concurrently, yielding (index, results) as each finishes."""
+
+        async def indexed(i: int, config: RDF3Config) -> tuple[int, list[RDF3Result]]:
+            return i, await self.run(config)
+
+        for next_done in asyncio.as_completed([indexed(i, c) for i, c in enumerate(configs)]):
+            yield await next_done
+
+
+class SharedApiClient:
+    """
+    One long-lived RDF3ApiClient on a background event loop. Every caller in
+    the process shares its connection pool, job limit and rate-limit pause.
+
+    Args:
+        api_url: Provider base URL
+        api_key: Bearer token
+        **client_options: max_connections, max_jobs
+    """
+
+    def __init__(self, api_url: str, api_key: Optional[str] = None, **client_options: Any):
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="rdf3-api", daemon=True).start()
+        self._client = RDF3ApiClient(api_url, api_key, **client_options)
+        asyncio.run_coroutine_threadsafe(self._client.__aenter__(), self._loop).result()
+
+    def submit(self, config: RDF3Config) -> Future:
+        """Start one config; the future resolves to its results (failures become failed results)."""
+        return asyncio.run_coroutine_threadsafe(self._client.run(config), self._loop)
+
+    def close(self) -> None:
+        """Close the session and stop the loop."""
+        try:
+            asyncio.run_coroutine_threadsafe(self._client.__aexit__(), self._loop).result(timeout=5)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_shared_clients: dict[tuple, SharedApiClient] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(api_url: str, api_key: Optional[str] = None) -> SharedApiClient:
+    """Return the process-wide client for this provider URL and key."""
+    key = (api_url, api_key)
+    with _shared_clients_lock:
+        if key not in _shared_clients:
+            _shared_clients[key] = SharedApiClient(api_url, api_key)
+            atexit.register(_shared_clients[key].close)
+        return _shared_clients[key]
+
+
+def run_api_many(
+    configs: Sequence[RDF3Config],
+    api_url: str,
+    api_key: Optional[str] = None,
+    on_result: Optional[Callable[[int, list[RDF3Result]], None]] = None,
+    **client_options: Any,
+) -> list[list[RDF3Result]]:
+    """
+    Synchronous entry point: run a batch of configs against the provider.
+
+    Args:
+        configs: Configs to run
+        api_url: Provider base URL
+        api_key: Bearer token
+        on_result: Called as on_result(index, results) on the calling thread as jobs finish
+        **client_options: max_connections, max_jobs
+
+    Returns:
+        Results per config, in input order
+    """
+
+    async def _run() -> list[list[RDF3Result]]:
+        out: list[list[RDF3Result]] = [[] for _ in configs]
+        async with RDF3ApiClient(api_url, api_key, **client_options) as client:
+            async for i, results in client.run_many(configs):
+                out[i] = results
+                if on_result:
+                    on_result(i, results)
+        return out
+
+    return asyncio.run(_run())
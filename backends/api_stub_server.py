@@ -0,0 +1,155 @@
+"""
+Local stand-in for a remote RDF3 provider, for development and tests.
+
+Implements the protocol documented in backends.api_client: jobs finish
+after a fixed delay and return stub structures. Optionally enforces a
+requests-per-second limit with 429 + Retry-After and X-RateLimit-* headers.
+
+Run with: python -m backends.api_stub_server --port 8765
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from backends.rdf3 import STUB_PDB
+
+
+class StubApiServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP/1.1 server holding job state in memory.
+
+    Args:
+        address: (host, port); port 0 picks a free port
+        job_seconds: How long each job stays queued/running
+        rate_limit: Maximum requests per second (None for unlimited)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], job_seconds: float = 0.5, rate_limit: Optional[int] = None):
+        super().__init__(address, _Handler)
+        self.job_seconds = job_seconds
+        self.rate_limit = rate_limit
+        self.jobs: dict[str, dict] = {}
+        self.idempotency_keys: dict[str, str] = {}  # Idempotency-Key -> job_id
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.requests = 0
+        self.connections = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def admit(self) -> Optional[float]:
+        """Count a request; return seconds to wait if it exceeds the rate limit."""
+        with self.lock:
+            self.requests += 1
+            if self.rate_limit is None:
+                return None
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start, self.window_count = now, 0
+            self.window_count += 1
+            if self.window_count > self.rate_limit:
+                return max(0.0, 1.0 - (now - self.window_start))
+            return None
+
+    def start_background(self) -> threading.Thread:
+        """Serve on a daemon thread; call shutdown() to stop."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    server: StubApiServer
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: dict, headers: Optional[dict] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _limited(self) -> bool:
+        wait = self.server.admit()
+        if wait is None:
+            return False
+        self._send(
+            429,
+            {"error": "rate limited"},
+            {"Retry-After": f"{wait:.2f}", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": f"{wait:.2f}"},
+        )
+        return True
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self._limited():
+            return
+        if self.path != "/jobs":
+            self._send(404, {"error": "not found"})
+            return
+        payload = json.loads(body or b"{}")
+        key = self.headers.get("Idempotency-Key")
+        with self.server.lock:
+            job_id = self.server.idempotency_keys.get(key) if key else None
+            if job_id is None:
+                job_id = uuid.uuid4().hex
+                self.server.jobs[job_id] = {"payload": payload, "created": time.monotonic()}
+                if key:
+                    self.server.idempotency_keys[key] = job_id
+        self._send(202, {"job_id": job_id})
+
+    def do_GET(self) -> None:
+        if self._limited():
+            return
+        job_id = self.path.rsplit("/", 1)[-1]
+        with self.server.lock:
+            job = self.server.jobs.get(job_id)
+        if not self.path.startswith("/jobs/") or job is None:
+            self._send(404, {"error": "not found"})
+            return
+        elapsed = time.monotonic() - job["created"]
+        if elapsed < self.server.job_seconds:
+            status = "queued" if elapsed < self.server.job_seconds / 2 else "running"
+            self._send(200, {"status": status})
+            return
+        payload = job["payload"]
+        prefix = payload.get("output_prefix", "design")
+        results = [{"name": f"{prefix}_{i}.pdb", "pdb": STUB_PDB} for i in range(payload.get("num_designs", 1))]
+        self._send(200, {"status": "done", "results": results})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--job-seconds", type=float, default=0.5)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    args = parser.parse_args()
+    server = StubApiServer((args.host, args.port), job_seconds=args.job_seconds, rate_limit=args.rate_limit)
+    print(f"Serving stub RDF3 API on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
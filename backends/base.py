@@ -0,0 +1,49 @@
+"""
+Common interface for tool backends.
+
+A backend runs a batch of independent requests and returns one result per
+request, in order. Its Capabilities tell callers how it may be driven:
+whether requests from different users may share one invocation, how many
+at once, how long to wait for more, and which resource it occupies.
+backends.dispatcher uses them to coalesce concurrent requests.
+"""
+from dataclasses import dataclass
+from typing import Any, Literal, Protocol, Sequence
+
+ResourceClass = Literal["cpu", "gpu", "remote"]
+
+
+@dataclass(frozen=True)
+class Capabilities:
+    """
+    How a backend can be called.
+
+    Args:
+        name: Stable identifier; one dispatcher is shared per name
+        batchable: Requests from different callers may run in one invocation
+        max_batch_size: Most requests per invocation (ignored unless batchable)
+        resource_class: "cpu", "gpu" or "remote" (a provider API)
+        batch_window: Seconds to wait for more requests before running a partial batch
+    """
+
+    name: str
+    batchable: bool = False
+    max_batch_size: int = 1
+    resource_class: ResourceClass = "cpu"
+    batch_window: float = 0.0
+
+
+class Backend(Protocol):
+    """A tool backend callable with batches of requests."""
+
+    capabilities: Capabilities
+
+    def run_batch(self, requests: Sequence[Any]) -> list[Any]:
+        """
+        Run requests together.
+
+        Returns:
+            One result per request, in order. An Exception instance in a
+            slot fails only that request; raising fails the whole batch.
+        """
+        ...
@@ -0,0 +1,163 @@
+"""
+Durable job queue with lease-based delivery.
+
+The web tier enqueues job IDs with a payload; workers claim them with a
+visibility timeout. A claimed message stays invisible to other workers
+until its lease expires, and the worker extends the lease with heartbeats
+while the job runs and acks it when done. A worker that dies stops
+heartbeating, so its message becomes visible again and is re-delivered
+to another worker (at-least-once delivery; attempts are counted).
+
+Broker is the interface the registry and workers use. SQLiteBroker
+implements it on one SQLite file, enough for a single host or a shared
+local volume; other brokers only need the same methods.
+"""
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Protocol
+
+DEFAULT_QUEUE_PATH = Path(tempfile.gettempdir()) / "portal_jobs" / "queue.sqlite3"
+DEFAULT_VISIBILITY_TIMEOUT = 60.0
+
+# Unset/empty: run jobs in the web process. "sqlite": SQLiteBroker at
+# DEFAULT_QUEUE_PATH. Anything else: path of the SQLite queue file.
+QUEUE_ENV_VAR = "PORTAL_JOB_QUEUE"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS messages ("
+    "job_id TEXT PRIMARY KEY, payload BLOB NOT NULL, enqueued_at REAL NOT NULL, "
+    "visible_at REAL NOT NULL, token TEXT, worker TEXT, attempts INTEGER NOT NULL DEFAULT 0)",
+    "CREATE INDEX IF NOT EXISTS messages_ready ON messages (visible_at, enqueued_at)",
+)
+
+
+@dataclass
+class Lease:
+    """A claimed message; valid until expires_at unless extended by heartbeat()."""
+
+    job_id: str
+    payload: bytes
+    token: str
+    attempts: int
+    enqueued_at: float
+    expires_at: float
+
+
+class Broker(Protocol):
+    """Queue operations used by JobRegistry and backends.worker."""
+
+    def enqueue(self, job_id: str, payload: bytes) -> None:
+        """Add a message, visible immediately."""
+        ...
+
+    def claim(self, worker_id: str, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> Optional[Lease]:
+        """Lease the oldest visible message, or return None if there is none."""
+        ...
+
+    def heartbeat(self, lease: Lease, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> bool:
+        """Extend a lease. False if it was lost (expired and claimed by another worker)."""
+        ...
+
+    def ack(self, lease: Lease) -> None:
+        """Remove a finished message."""
+        ...
+
+    def release(self, lease: Lease, delay: float = 0.0) -> None:
+        """Give a message back for re-delivery after delay seconds."""
+        ...
+
+    def depth(self) -> dict[str, int]:
+        """Return counts of waiting ("ready") and claimed ("leased") messages."""
+        ...
+
+
+class SQLiteBroker:
+    """
+    Broker on a SQLite file in WAL mode; safe for many processes on one host.
+
+    Args:
+        path: Queue database file (created if missing)
+    """
+
+    def __init__(self, path: Path = DEFAULT_QUEUE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def enqueue(self, job_id: str, payload: bytes) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO messages (job_id, payload, enqueued_at, visible_at) VALUES (?, ?, ?, ?)",
+                (job_id, payload, now, now),
+            )
+
+    def claim(self, worker_id: str, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> Optional[Lease]:
+        token = uuid.uuid4().hex
+        now = time.time()
+        expires_at = now + visibility_timeout
+        with self._connect() as conn:
+            # A single UPDATE is atomic, so concurrent claimers never share a message
+            conn.execute(
+                "UPDATE messages SET token = ?, worker = ?, visible_at = ?, attempts = attempts + 1 "
+                "WHERE job_id = (SELECT job_id FROM messages WHERE visible_at <= ? "
+                "ORDER BY enqueued_at LIMIT 1)",
+                (token, worker_id, expires_at, now),
+            )
+            row = conn.execute(
+                "SELECT job_id, payload, attempts, enqueued_at FROM messages WHERE token = ?", (token,)
+            ).fetchone()
+        if row is None:
+            return None
+        return Lease(job_id=row[0], payload=row[1], token=token, attempts=row[2], enqueued_at=row[3],
+                     expires_at=expires_at)
+
+    def heartbeat(self, lease: Lease, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> bool:
+        expires_at = time.time() + visibility_timeout
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE messages SET visible_at = ? WHERE job_id = ? AND token = ?",
+                (expires_at, lease.job_id, lease.token),
+            ).rowcount
+        if updated:
+            lease.expires_at = expires_at
+        return bool(updated)
+
+    def ack(self, lease: Lease) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM messages WHERE job_id = ? AND token = ?", (lease.job_id, lease.token))
+
+    def release(self, lease: Lease, delay: float = 0.0) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE messages SET token = NULL, worker = NULL, visible_at = ? WHERE job_id = ? AND token = ?",
+                (time.time() + delay, lease.job_id, lease.token),
+            )
+
+    def depth(self) -> dict[str, int]:
+        with self._connect() as conn:
+            ready, leased = conn.execute(
+                "SELECT COALESCE(SUM(visible_at <= ?1), 0), COALESCE(SUM(token IS NOT NULL AND visible_at > ?1), 0) "
+                "FROM messages",
+                (time.time(),),
+            ).fetchone()
+        return {"ready": ready, "leased": leased}
+
+
+def broker_from_env() -> Optional[Broker]:
+    """Broker selected by the PORTAL_JOB_QUEUE environment variable, or None for in-process jobs."""
+    setting = os.environ.get(QUEUE_ENV_VAR, "").strip()
+    if not setting:
+        return None
+    return SQLiteBroker(DEFAULT_QUEUE_PATH if setting == "sqlite" else Path(setting))
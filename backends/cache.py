@@ -0,0 +1,199 @@
+"""
+Persistent, content-addressed result cache.
+
+DiskCache stores blobs under their key on disk, with a SQLite index that
+tracks size and last access for size-capped LRU eviction, plus hit/miss
+counters shared by every process using the same cache directory.
+ResultCache keys RDF3 results on a stable hash of the normalized design
+config, backend and seed.
+"""
+import hashlib
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from backends.rdf3 import RDF3Config, RDF3Result, decode_results, results_to_archive
+
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / "portal_cache"
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)",
+    "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+)
+
+
+class DiskCache:
+    """
+    Size-capped LRU blob store keyed by hex digest.
+
+    Args:
+        root: Cache directory (created if missing)
+        max_bytes: Total payload size above which least-recently-used entries are evicted
+    """
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.root / "index.sqlite3", timeout=30)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _count(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the blob for key, or None on a miss."""
+        try:
+            data = self._path(key).read_bytes()
+        except FileNotFoundError:
+            data = None
+        with self._connect() as conn:
+            if data is None:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count(conn, "misses")
+            else:
+                conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._count(conn, "hits")
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store a blob under key, then evict LRU entries over the size cap."""
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{key}.{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+                (key, len(data), time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            self._path(key).unlink(missing_ok=True)
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._count(conn, "evictions")
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict[str, int]:
+        """Return hits, misses, evictions, entries and total bytes."""
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+def _normalized_bytes(data: Optional[bytes], path: Optional[Path]) -> bytes:
+    if data is None and path is not None:
+        data = Path(path).read_bytes()
+    return (data or b"").replace(b"\r\n", b"\n")
+
+
+def config_key(config: RDF3Config, backend: str) -> str:
+    """
+    Stable hash of everything that determines a run's output.
+
+    Inline bytes and file paths with the same content hash identically;
+    constraints JSON is compared semantically; output_prefix is ignored.
+    """
+    try:
+        constraints = json.loads(config.constraints_json or "{}")
+    except ValueError:
+        constraints = config.constraints_json
+    normalized = {
+        "backend": backend,
+        "scaffold": hashlib.sha256(_normalized_bytes(config.scaffold_pdb, config.scaffold_path)).hexdigest(),
+        "ligand": hashlib.sha256(_normalized_bytes(config.ligand_sdf, config.ligand_path)).hexdigest(),
+        "constraints": constraints,
+        "num_designs": config.num_designs,
+        "seed": config.seed,
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    RDF3 result cache on top of DiskCache. Only seeded configs are cached: a
+    run without a seed is a fresh sample, and caching it would hand every
+    later seedless request the same designs.
+    """
+
+    def __init__(self, store: DiskCache):
+        self.store = store
+
+    @staticmethod
+    def cacheable(config: RDF3Config) -> bool:
+        return config.seed is not None
+
+    def get(self, config: RDF3Config, backend: str) -> Optional[list[RDF3Result]]:
+        """Return cached results relabeled with config.output_prefix, or None."""
+        if not self.cacheable(config):
+            return None
+        data = self.store.get(config_key(config, backend))
+        if data is None:
+            return None
+        results = decode_results(data)
+        for i, res in enumerate(results):
+            if res.output_path is not None:
+                res.output_path = Path(f"{config.output_prefix}_{i}{res.output_path.suffix}")
+        return results
+
+    def put(self, config: RDF3Config, backend: str, results: list[RDF3Result]) -> None:
+        """Cache results if the config is seeded and every design succeeded."""
+        if not self.cacheable(config) or not results or any(r.status != "done" for r in results):
+            return
+        # Store content, not paths: CLI output directories may be cleaned up
+        loaded = [
+            r if r.packed is not None else RDF3Result(status=r.status, pdb_content=r.read_pdb(), output_path=r.output_path)
+            for r in results
+        ]
+        self.store.put(config_key(config, backend), results_to_archive(loaded))
+
+    def stats(self) -> dict[str, int]:
+        return self.store.stats()
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide RDF3 result cache."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(DiskCache(DEFAULT_CACHE_DIR / "rdf3"))
+        return _result_cache
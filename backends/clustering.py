@@ -0,0 +1,272 @@
+"""
+Structural clustering of design outputs by CA RMSD.
+
+Batch runs produce many near-duplicate backbones. cluster_results() takes
+a list of RDF3Result, superposes every pair of designs with the same number
+of CA atoms (Kabsch), and groups designs within an RMSD threshold
+(Taylor–Butina: the design with the most neighbors becomes a representative
+and takes its unassigned neighbors, repeatedly).
+
+The O(n²) pair work is done in blocks: for a block of designs against
+another, all cross-covariance matrices come from one matrix product and the
+RMSDs from one batched SVD. Designs are sorted by radius of gyration first;
+since RMSD after superposition is at least the difference of the two radii,
+block pairs whose radii are further apart than the threshold are skipped
+without being computed. Blocks are spread over a process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional
+
+from utils.metrics import span
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from backends.rdf3 import RDF3Result
+
+DEFAULT_RMSD_THRESHOLD = 2.0  # Å
+DEFAULT_BLOCK_SIZE = 256
+# Fewer pairs than this are computed inline, without a process pool
+MIN_PARALLEL_PAIRS = 200_000
+
+
+@dataclass
+class Cluster:
+    """Designs within the RMSD threshold of a representative; indices into the clustered list."""
+
+    representative: int
+    members: list[int] = field(default_factory=list)  # includes the representative
+
+    @property
+    def size(self) -> int:
+        return len(self.members)
+
+
+def _centered(coords: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    coords = np.asarray(coords, dtype=np.float64)
+    return coords - coords.mean(axis=-2, keepdims=True)
+
+
+def _rmsd_from_covariance(h: "np.ndarray", g: "np.ndarray", n_atoms: int) -> "np.ndarray":
+    """RMSD after optimal rotation, from cross-covariances (..., 3, 3) and summed squared norms (...)."""
+    import numpy as np
+
+    s = np.linalg.svd(h, compute_uv=False)
+    s[..., 2] *= np.sign(np.linalg.det(h))  # reflection: flip the smallest singular value
+    return np.sqrt(np.maximum(g - 2 * s.sum(axis=-1), 0.0) / n_atoms)
+
+
+def kabsch_rmsd(a: "np.ndarray", b: "np.ndarray") -> "np.ndarray":
+    """
+    CA RMSD of coordinate sets after optimal superposition, for many pairs at once.
+
+    Args:
+        a: (..., N, 3) coordinates
+        b: (..., N, 3) coordinates, broadcastable against a
+
+    Returns:
+        (...) RMSDs in the coordinates' units
+    """
+    import numpy as np
+
+    a, b = _centered(a), _centered(b)
+    h = np.swapaxes(a, -1, -2) @ b
+    g = (a**2).sum(axis=(-1, -2)) + (b**2).sum(axis=(-1, -2))
+    return _rmsd_from_covariance(h, g, a.shape[-2])
+
+
+def _block_rmsd(a: "np.ndarray", b: "np.ndarray") -> "np.ndarray":
+    """(len(a), len(b)) RMSDs between two blocks of centered (n, N, 3) coordinates."""
+    n_a, n_atoms, _ = a.shape
+    n_b = len(b)
+    # H[i, j, k, l] = sum_n a[i, n, k] * b[j, n, l], as one matrix product
+    h = a.transpose(0, 2, 1).reshape(n_a * 3, n_atoms) @ b.transpose(0, 2, 1).reshape(n_b * 3, n_atoms).T
+    h = h.reshape(n_a, 3, n_b, 3).transpose(0, 2, 1, 3)
+    g = (a**2).sum(axis=(1, 2))[:, None] + (b**2).sum(axis=(1, 2))[None, :]
+    return _rmsd_from_covariance(h, g, n_atoms)
+
+
+def _neighbor_block(
+    a: "np.ndarray", b: "np.ndarray", a_start: int, b_start: int, threshold: float
+) -> tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """Pairs (i < j, global indices) of one block pair within the threshold (runs in a pool worker)."""
+    import numpy as np
+
+    rmsd = _block_rmsd(a, b)
+    i, j = np.nonzero(rmsd <= threshold)
+    i, j, rmsd = i + a_start, j + b_start, rmsd[i, j]
+    keep = i < j
+    return i[keep], j[keep], rmsd[keep].astype(np.float32)
+
+
+def _block_pairs(n: int, block_size: int) -> list[tuple[int, int]]:
+    """Start indices of the upper-triangle block pairs (diagonal included)."""
+    starts = range(0, n, block_size)
+    return [(i, j) for i in starts for j in starts if j >= i]
+
+
+def pairwise_rmsd(coords: "np.ndarray", block_size: int = DEFAULT_BLOCK_SIZE) -> "np.ndarray":
+    """
+    Full (n, n) RMSD matrix of n coordinate sets of N atoms each.
+
+    Args:
+        coords: (n, N, 3) coordinates
+        block_size: Designs per block; memory is about 100 bytes per block pair element
+
+    Returns:
+        Symmetric (n, n) matrix of RMSDs after superposition
+    """
+    import numpy as np
+
+    coords = _centered(coords)
+    n = len(coords)
+    out = np.zeros((n, n))
+    for i, j in _block_pairs(n, block_size):
+        block = _block_rmsd(coords[i : i + block_size], coords[j : j + block_size])
+        out[i : i + block_size, j : j + block_size] = block
+        out[j : j + block_size, i : i + block_size] = block.T
+    np.fill_diagonal(out, 0.0)
+    return out
+
+
+def rmsd_neighbors(
+    coords: "np.ndarray",
+    threshold: float,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    workers: Optional[int] = None,
+) -> tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    All pairs of coordinate sets within an RMSD threshold.
+
+    Args:
+        coords: (n, N, 3) coordinates
+        threshold: Maximum RMSD of a reported pair
+        block_size: Designs per block
+        workers: Processes for the block pairs (default: one per core; 1 runs inline)
+
+    Returns:
+        (i, j, rmsd) arrays with i < j
+    """
+    import numpy as np
+
+    coords = _centered(coords)
+    n, n_atoms = coords.shape[:2]
+    radius = np.sqrt((coords**2).sum(axis=(1, 2)) / max(n_atoms, 1))
+    order = np.argsort(radius, kind="stable")
+    coords, radius = coords[order], radius[order]
+
+    tasks = []
+    for i, j in _block_pairs(n, block_size):
+        # Lower bound on every RMSD in the block pair: the gap between the radii ranges
+        if radius[j] - radius[min(i + block_size, n) - 1] <= threshold:
+            tasks.append((i, j))
+
+    workers = workers or os.cpu_count() or 1
+    parts = []
+    if workers > 1 and len(tasks) > 1 and len(tasks) * block_size**2 >= MIN_PARALLEL_PAIRS:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            futures = [
+                pool.submit(
+                    _neighbor_block, coords[i : i + block_size], coords[j : j + block_size], i, j, threshold
+                )
+                for i, j in tasks
+            ]
+            parts = [future.result() for future in futures]
+    else:
+        parts = [
+            _neighbor_block(coords[i : i + block_size], coords[j : j + block_size], i, j, threshold)
+            for i, j in tasks
+        ]
+    if not parts:
+        return np.array([], dtype=int), np.array([], dtype=int), np.array([], dtype=np.float32)
+    i, j, rmsd = (np.concatenate(column) for column in zip(*parts))
+    i, j = order[i], order[j]
+    return np.minimum(i, j), np.maximum(i, j), rmsd
+
+
+def butina(n: int, i: "np.ndarray", j: "np.ndarray") -> list[Cluster]:
+    """
+    Taylor–Butina clustering of n items from their neighbor pairs.
+
+    The unassigned item with the most neighbors (ties: lowest index) becomes a
+    representative and takes all its unassigned neighbors, until none remain.
+    """
+    import numpy as np
+
+    degree = np.bincount(np.concatenate([i, j]), minlength=n)
+    source = np.concatenate([i, j])
+    target = np.concatenate([j, i])
+    by_source = np.argsort(source, kind="stable")
+    bounds = np.searchsorted(source[by_source], np.arange(n + 1))
+    neighbors = target[by_source]
+
+    assigned = np.zeros(n, dtype=bool)
+    clusters = []
+    for item in np.lexsort((np.arange(n), -degree)):
+        if assigned[item]:
+            continue
+        near = neighbors[bounds[item] : bounds[item + 1]]
+        near = near[~assigned[near]]
+        assigned[near] = True
+        assigned[item] = True
+        clusters.append(Cluster(int(item), [int(item)] + sorted(int(k) for k in near)))
+    return clusters
+
+
+def ca_coords(result: "RDF3Result") -> Optional["np.ndarray"]:
+    """(N, 3) CA coordinates of a result's first model, or None if it has no CA atoms or does not parse."""
+    try:
+        structure = result.structure() if result.status == "done" else None
+    except ValueError:
+        return None
+    if structure is None or not len(structure):
+        return None
+    ca = structure[structure.ca_mask & (structure.model == structure.model[0])]
+    return ca.coords if len(ca) else None
+
+
+def cluster_results(
+    results: list["RDF3Result"],
+    threshold: float = DEFAULT_RMSD_THRESHOLD,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    workers: Optional[int] = None,
+) -> list[Cluster]:
+    """
+    Cluster designs by CA RMSD after superposition.
+
+    Only designs with the same number of CA atoms are compared; results that
+    failed or have no CA atoms are left out of every cluster.
+
+    Args:
+        results: Designs to cluster
+        threshold: RMSD (Å) within which designs are neighbors
+        block_size: Designs per block of the pairwise computation
+        workers: Processes for the pairwise computation (default: one per core)
+
+    Returns:
+        Clusters, largest first (ties: by representative index), with indices into results
+    """
+    import numpy as np
+
+    groups: dict[int, list[tuple[int, "np.ndarray"]]] = {}
+    for index, result in enumerate(results):
+        coords = ca_coords(result)
+        if coords is not None:
+            groups.setdefault(len(coords), []).append((index, coords))
+
+    clusters = []
+    with span("rdf3.cluster"):
+        for members in groups.values():
+            indices = np.array([index for index, _ in members])
+            coords = np.stack([c for _, c in members])
+            i, j, _ = rmsd_neighbors(coords, threshold, block_size, workers)
+            for cluster in butina(len(members), i, j):
+                clusters.append(
+                    Cluster(int(indices[cluster.representative]), [int(indices[k]) for k in cluster.members])
+                )
+    clusters.sort(key=lambda c: (-c.size, c.representative))
+    return clusters
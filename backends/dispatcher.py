@@ -0,0 +1,148 @@
+"""
+Dynamic micro-batching across sessions.
+
+A MicroBatcher sits in front of one backend. Callers from any session
+submit single requests; dispatcher threads take the first waiting request,
+keep collecting for up to the backend's batch window (or until the batch
+is full), run the batch in one backend invocation and resolve each
+caller's future with its own result. Backends that are not batchable run
+one request per invocation, with no added latency.
+
+get_batcher() returns the process-wide batcher for a backend, so
+requests from every Streamlit session share it.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Optional
+
+from backends.base import Backend
+from utils.metrics import bind_session, count, current_session_id, record, span
+
+REMOTE_CONCURRENCY = 4
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests into batched backend calls.
+
+    Args:
+        backend: Backend to call; its capabilities set the defaults below
+        batch_window: Seconds to wait for more requests after the first one
+        max_batch_size: Most requests per backend call
+        concurrency: Batches that may run at the same time
+    """
+
+    def __init__(
+        self,
+        backend: Backend,
+        batch_window: Optional[float] = None,
+        max_batch_size: Optional[int] = None,
+        concurrency: int = 1,
+    ):
+        caps = backend.capabilities
+        self.backend = backend
+        self.name = caps.name
+        self.batch_window = caps.batch_window if batch_window is None else batch_window
+        if max_batch_size is None:
+            max_batch_size = caps.max_batch_size if caps.batchable else 1
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue: queue.Queue = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"dispatch-{self.name}-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, request: Any) -> Future:
+        """Queue a request; the future resolves to its result."""
+        future: Future = Future()
+        self._queue.put((request, future, time.monotonic(), current_session_id()))
+        return future
+
+    def call(self, request: Any, timeout: Optional[float] = None) -> Any:
+        """Submit a request and wait for its result (re-raising its error)."""
+        return self.submit(request).result(timeout)
+
+    def close(self) -> None:
+        """Run what is queued, then stop the dispatcher threads."""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.put(_STOP)  # leave it for the outer loop
+                    break
+                batch.append(item)
+            self._run(batch)
+
+    def _run(self, batch: list) -> None:
+        now = time.monotonic()
+        live = []
+        for request, future, submitted_at, session_id in batch:
+            if future.set_running_or_notify_cancel():
+                live.append((request, future))
+                with bind_session(session_id):
+                    record("dispatch.wait", now - submitted_at, backend=self.name)
+        if not live:
+            return
+
+        count("portal_dispatch_batches_total", backend=self.name)
+        count("portal_dispatch_requests_total", len(live), backend=self.name)
+        try:
+            with span("dispatch.run", backend=self.name):
+                results = self.backend.run_batch([request for request, _ in live])
+            if len(results) != len(live):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for {len(live)} requests")
+        except Exception as e:
+            for _, future in live:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(live, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+_batchers: dict[tuple, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def _batcher_key(backend: Backend) -> tuple:
+    """Capabilities name plus the backend's options (e.g. provider URL and key), if it has any."""
+    options = getattr(backend, "options", None) or {}
+    return (backend.capabilities.name, tuple(sorted((name, repr(value)) for name, value in options.items())))
+
+
+def get_batcher(backend: Backend) -> MicroBatcher:
+    """
+    Return the process-wide batcher for backend.capabilities.name and the
+    backend's options, creating it with this backend on first use; later
+    backends with the same name and options reuse it, so requests are never
+    run with another caller's options. Remote backends get several batches
+    in flight; local ones run one at a time.
+    """
+    key = _batcher_key(backend)
+    with _batchers_lock:
+        if key not in _batchers:
+            concurrency = REMOTE_CONCURRENCY if backend.capabilities.resource_class == "remote" else 1
+            _batchers[key] = MicroBatcher(backend, concurrency=concurrency)
+        return _batchers[key]
@@ -0,0 +1,713 @@
+"""
+Protein–ligand docking with cached receptor grids and sharded search.
+
+Re-docking new ligands against the same target is the common case, and
+receptor preparation (cleaning, atom typing) plus the scoring grids for a
+search box are pure repeated cost. GridCache stores them once per
+(receptor content, box, engine) in a size-capped DiskCache, shared by
+every session and process on the host, and unpacks them to a local work
+directory on use.
+
+One docking run's search is split across CPU cores: the exhaustiveness is
+divided into shards, each run with its own random seed in a process pool,
+and the shards' poses are merged by score with near-duplicates removed.
+
+Engines: AutoDock Vina (the vina and meeko packages) when installed, or a
+stand-in that scores rigid-body poses on a NumPy grid, for development.
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import zipfile
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, ContextManager, Iterator, Optional, Protocol
+
+from backends.cache import DEFAULT_CACHE_DIR, DiskCache
+from utils.metrics import count, span
+
+if TYPE_CHECKING:
+    import numpy as np
+    from rdkit import Chem
+
+    from utils.structure import Structure
+
+# Bump when prepared receptors or grid files change format
+GRID_VERSION = 1
+DEFAULT_GRID_CACHE_BYTES = 10 * 1024**3
+MAX_BOX_SIZE = 40.0
+DEFAULT_BOX_PADDING = 8.0
+# Unpacked grids kept in the work directory (least recently used are removed, unless pinned)
+MAX_UNPACKED_GRIDS = 8
+# Poses closer than this heavy-atom RMSD (Å) to a better one are dropped when merging shards
+DUPLICATE_RMSD = 1.0
+# Grid point x receptor atom pairs scored at once by the stand-in engine (about 12 MB per float64 xyz temporary)
+STAND_IN_CHUNK_PAIRS = 1 << 19
+
+_WATERS = ("HOH", "WAT", "DOD", "H2O")
+_AROMATIC_CARBONS = {
+    "PHE": {"CG", "CD1", "CD2", "CE1", "CE2", "CZ"},
+    "TYR": {"CG", "CD1", "CD2", "CE1", "CE2", "CZ"},
+    "TRP": {"CG", "CD1", "CD2", "CE2", "CE3", "CZ2", "CZ3", "CH2"},
+    "HIS": {"CG", "CD2", "CE1"},
+}
+_ACCEPTOR_NITROGENS = {"HIS": {"ND1", "NE2"}}
+_VDW_RADII = {"C": 1.9, "N": 1.8, "O": 1.7, "S": 2.0}
+
+
+@dataclass(frozen=True)
+class Box:
+    """Search box: center and edge lengths in Å."""
+
+    center: tuple[float, float, float]
+    size: tuple[float, float, float]
+
+    def key(self) -> str:
+        """Stable text form (0.01 Å resolution) for cache keys."""
+        return " ".join(f"{v:.2f}" for v in (*self.center, *self.size))
+
+    @classmethod
+    def around(cls, coords: "np.ndarray", padding: float = DEFAULT_BOX_PADDING) -> "Box":
+        """Box enclosing coords plus padding on every side, capped at MAX_BOX_SIZE."""
+        import numpy as np
+
+        lo, hi = coords.min(axis=0), coords.max(axis=0)
+        size = np.minimum(hi - lo + 2 * padding, MAX_BOX_SIZE)
+        return cls(tuple(float(v) for v in (lo + hi) / 2), tuple(float(v) for v in size))
+
+
+@dataclass
+class PreparedReceptor:
+    """A receptor's cached preparation for one box, unpacked on local disk."""
+
+    key: str
+    box: Box
+    grid_dir: Path
+    receptor_pdb: str  # cleaned receptor, for display
+    cache: Optional["GridCache"] = field(default=None, repr=False, compare=False)  # for pinning the grids
+
+    def pinned(self) -> ContextManager[None]:
+        """Context manager that keeps grid_dir on disk while a search uses it (see GridCache.pin)."""
+        return self.cache.pin(self) if self.cache is not None else nullcontext()
+
+
+@dataclass
+class Pose:
+    """One docked pose."""
+
+    score: float  # kcal/mol for Vina; arbitrary units for the stand-in
+    molblock: str
+    seed: int  # seed of the shard that found it
+
+
+@dataclass
+class DockingResult:
+    """Poses of one ligand against one receptor."""
+
+    name: str
+    poses: list[Pose]
+    receptor_pdb: str
+    box: Box
+    engine: str
+    grid_cached: bool
+
+
+class DockingEngine(Protocol):
+    """Prepares receptor grids and searches ligand poses on them."""
+
+    name: str
+
+    @property
+    def version(self) -> str:
+        """Identifies the engine and scoring function; part of the grid cache key."""
+        ...
+
+    def prepare(self, receptor: "Structure", box: Box, out_dir: Path) -> None:
+        """Write everything search() needs for this receptor and box into out_dir."""
+        ...
+
+    def search(self, grid_dir: Path, ligand: str, exhaustiveness: int, seed: int, n_poses: int) -> list[Pose]:
+        """Dock a ligand (MOL block) and return its best poses, best first."""
+        ...
+
+
+# ---------------------------------------------------------------- structures
+
+
+def clean_receptor(data: bytes, fmt: Optional[str] = None) -> "Structure":
+    """
+    Protein atoms of the first model: waters, HETATM records, alternate
+    locations other than the first, and non-polar hydrogens removed.
+    """
+    import numpy as np
+
+    from utils.structure import Structure
+
+    structure = Structure.parse(data, fmt)
+    keep = (structure.model == structure.model.min()) & structure.record.isin(["ATOM"])
+    keep &= ~structure.res_name.isin(_WATERS) & structure.alt_loc.isin(["", "A", "1"])
+    structure = structure[keep]
+    hydrogens = structure.element.isin(["H", "D"])
+    polar = structure.element.isin(["N", "O"])
+    if hydrogens.any() and polar.any():
+        h_index, p_xyz = np.flatnonzero(hydrogens), structure.coords[polar]
+        bonded = np.zeros(len(h_index), dtype=bool)
+        for lo in range(0, len(h_index), 1024):
+            d = np.linalg.norm(structure.coords[h_index[lo : lo + 1024], None] - p_xyz[None], axis=-1)
+            bonded[lo : lo + 1024] = d.min(axis=1) < 1.15
+        hydrogens[h_index[bonded]] = False
+    structure = structure[~hydrogens]
+    if not len(structure):
+        raise ValueError("No protein atoms in the receptor structure")
+    return structure
+
+
+def receptor_pdbqt(receptor: "Structure") -> str:
+    """
+    PDBQT text with AutoDock atom types from element and residue/atom names.
+    Hydrogens left by clean_receptor() are polar (HD); charges are zero,
+    which Vina's scoring function does not use.
+    """
+    lines = []
+    for i, (xyz, element, atom, res, chain, res_seq) in enumerate(
+        zip(
+            receptor.coords,
+            receptor.element.values,
+            receptor.atom_name.values,
+            receptor.res_name.values,
+            receptor.chain_id.values,
+            receptor.res_seq,
+        )
+    ):
+        element = element.upper() or atom[:1]
+        if element == "C":
+            ad_type = "A" if atom in _AROMATIC_CARBONS.get(res, ()) else "C"
+        elif element == "N":
+            ad_type = "NA" if atom in _ACCEPTOR_NITROGENS.get(res, ()) else "N"
+        elif element in ("O", "S"):
+            ad_type = element + "A"
+        elif element in ("H", "D"):
+            ad_type = "HD"
+        else:
+            continue
+        lines.append(
+            f"ATOM  {(i + 1) % 100000:5d} {atom:<4} {res:>3} {chain:1}{res_seq % 10000:4d}    "
+            f"{xyz[0]:8.3f}{xyz[1]:8.3f}{xyz[2]:8.3f}  1.00  0.00    +0.000 {ad_type:<2}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def ligand_molblock(data: bytes, fmt: str) -> str:
+    """MOL block of a ligand given as SDF/MOL (first record), MOL2 or PDB."""
+    from rdkit import Chem
+
+    text = data.decode("utf-8", "replace")
+    if fmt == "mol2":
+        mol = Chem.MolFromMol2Block(text, removeHs=False)
+    elif fmt == "pdb":
+        mol = Chem.MolFromPDBBlock(text, removeHs=False)
+    else:
+        mol = Chem.MolFromMolBlock(text.split("$$$$")[0], removeHs=False)
+    if mol is None:
+        raise ValueError("Could not parse the ligand")
+    return Chem.MolToMolBlock(mol)
+
+
+def ligand_coords(molblock: str) -> Optional["np.ndarray"]:
+    """Heavy-atom coordinates of a ligand, or None if it has no 3D coordinates."""
+    import numpy as np
+
+    lines = molblock.splitlines()
+    n_atoms = int(lines[3][:3])
+    atoms = [line for line in lines[4 : 4 + n_atoms] if line[31:34].strip() not in ("H", "D")]
+    if not atoms:
+        return None
+    coords = np.array([[float(line[0:10]), float(line[10:20]), float(line[20:30])] for line in atoms])
+    return coords if np.ptp(coords[:, 2]) > 0 else None
+
+
+def _embedded(molblock: str, seed: int) -> "Chem.Mol":
+    """Ligand with explicit hydrogens and 3D coordinates (embedded if it had none)."""
+    from rdkit import Chem
+    from rdkit.Chem import AllChem
+
+    mol = Chem.MolFromMolBlock(molblock, removeHs=False)
+    if mol is None:
+        raise ValueError("Could not parse the ligand")
+    if ligand_coords(molblock) is not None:
+        return Chem.AddHs(mol, addCoords=True)
+    mol = Chem.AddHs(mol)
+    if AllChem.EmbedMolecule(mol, randomSeed=seed) != 0:
+        raise ValueError("Could not generate 3D coordinates for the ligand")
+    AllChem.MMFFOptimizeMolecule(mol)
+    return mol
+
+
+def default_box(receptor: bytes, ligand: Optional[str] = None, fmt: Optional[str] = None) -> Box:
+    """
+    Box around the ligand's input coordinates when it has them (redocking
+    into a known site), otherwise around the whole receptor, capped at MAX_BOX_SIZE.
+    """
+    coords = ligand_coords(ligand) if ligand else None
+    if coords is None:
+        coords = clean_receptor(receptor, fmt).coords
+        return Box.around(coords, padding=0.0)
+    return Box.around(coords)
+
+
+# ------------------------------------------------------------------ engines
+
+
+class VinaEngine:
+    """
+    AutoDock Vina through its Python bindings; ligands are prepared with meeko.
+
+    Args:
+        spacing: Grid spacing in Å
+    """
+
+    name = "vina"
+
+    def __init__(self, spacing: float = 0.375):
+        self.spacing = spacing
+
+    @property
+    def version(self) -> str:
+        import vina
+
+        return f"vina-{vina.__version__}/{self.spacing}"
+
+    def prepare(self, receptor: "Structure", box: Box, out_dir: Path) -> None:
+        from vina import Vina
+
+        (out_dir / "receptor.pdbqt").write_text(receptor_pdbqt(receptor))
+        v = Vina(sf_name="vina", cpu=1, verbosity=0)
+        v.set_receptor(str(out_dir / "receptor.pdbqt"))
+        v.compute_vina_maps(
+            center=list(box.center), box_size=list(box.size), spacing=self.spacing, force_even_voxels=True
+        )
+        v.write_maps(str(out_dir / "grid"))
+        (out_dir / "receptor.pdbqt").unlink()
+
+    def search(self, grid_dir: Path, ligand: str, exhaustiveness: int, seed: int, n_poses: int) -> list[Pose]:
+        from meeko import MoleculePreparation, PDBQTMolecule, PDBQTWriterLegacy, RDKitMolCreate
+        from rdkit import Chem
+        from vina import Vina
+
+        setups = MoleculePreparation().prepare(_embedded(ligand, seed))
+        pdbqt, ok, error = PDBQTWriterLegacy.write_string(setups[0])
+        if not ok:
+            raise ValueError(f"Ligand preparation failed: {error}")
+        v = Vina(sf_name="vina", cpu=1, seed=seed, verbosity=0)
+        v.load_maps(str(grid_dir / "grid"))
+        v.set_ligand_from_string(pdbqt)
+        v.dock(exhaustiveness=exhaustiveness, n_poses=n_poses)
+        energies = v.energies(n_poses)[:, 0]
+        mol = RDKitMolCreate.from_pdbqt_mol(PDBQTMolecule(v.poses(n_poses), skip_typing=True))[0]
+        return [
+            Pose(score=float(energy), molblock=Chem.MolToMolBlock(mol, confId=conf.GetId()), seed=seed)
+            for energy, conf in zip(energies, mol.GetConformers())
+        ]
+
+
+class StandInEngine:
+    """
+    Rigid-body docking on a NumPy grid of Vina-like steric terms, for
+    development without Vina. Ligand conformations are not searched.
+
+    Args:
+        spacing: Grid spacing in Å
+        samples: Random poses scored per unit of exhaustiveness
+        refine_steps: Greedy perturbation steps applied to the best samples
+    """
+
+    name = "stand-in"
+
+    def __init__(self, spacing: float = 0.5, samples: int = 4096, refine_steps: int = 150):
+        self.spacing = spacing
+        self.samples = samples
+        self.refine_steps = refine_steps
+
+    @property
+    def version(self) -> str:
+        return f"stand-in-1/{self.spacing}"
+
+    def prepare(self, receptor: "Structure", box: Box, out_dir: Path) -> None:
+        import numpy as np
+
+        center, size = np.array(box.center), np.array(box.size)
+        origin = center - size / 2
+        shape = np.floor(size / self.spacing).astype(int) + 1
+        axes = [origin[i] + self.spacing * np.arange(shape[i]) for i in range(3)]
+        points = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+
+        heavy = ~receptor.element.isin(["H", "D"])
+        xyz = receptor.coords[heavy].astype(np.float64)
+        near = np.all((xyz > origin - 8.0) & (xyz < origin + size + 8.0), axis=1)
+        xyz = xyz[near]
+        radii = np.array([_VDW_RADII.get(e, 1.9) for e in receptor.element.values[heavy][near]])
+        energy = np.zeros(len(points))
+        step = max(1, STAND_IN_CHUNK_PAIRS // max(1, len(xyz)))
+        for lo in range(0, len(points), step):
+            d = np.linalg.norm(points[lo : lo + step, None] - xyz[None], axis=-1)
+            s = d - (radii + 1.9)
+            e = -0.0356 * np.exp(-((s / 0.5) ** 2)) - 0.00516 * np.exp(-(((s - 3.0) / 2.0) ** 2))
+            e += 0.84 * np.where(s < 0, s * s, 0.0)
+            energy[lo : lo + step] = np.where(d < 8.0, e, 0.0).sum(axis=1)
+        np.savez(
+            out_dir / "grid.npz",
+            origin=origin,
+            spacing=self.spacing,
+            energy=np.minimum(energy, 2.0).reshape(shape).astype(np.float32),
+        )
+
+    def search(self, grid_dir: Path, ligand: str, exhaustiveness: int, seed: int, n_poses: int) -> list[Pose]:
+        import numpy as np
+        from rdkit import Chem
+
+        with np.load(grid_dir / "grid.npz") as grid:
+            origin, spacing, energy = grid["origin"], float(grid["spacing"]), grid["energy"]
+        upper = origin + spacing * (np.array(energy.shape) - 1)
+
+        def score(coords: "np.ndarray") -> "np.ndarray":
+            """Trilinear grid energy summed over atoms, +1 per atom outside the box."""
+            f = (coords - origin) / spacing
+            outside = np.any((coords < origin) | (coords > upper), axis=-1)
+            f = np.clip(f, 0, np.array(energy.shape) - 1.000001)
+            i, w = f.astype(int), f - np.floor(f)
+            total = np.zeros(coords.shape[:-1])
+            for corner in np.ndindex(2, 2, 2):
+                weight = np.prod(np.where(corner, w, 1 - w), axis=-1)
+                total += weight * energy[i[..., 0] + corner[0], i[..., 1] + corner[1], i[..., 2] + corner[2]]
+            return np.where(outside, 1.0, total).sum(axis=-1)
+
+        mol = _embedded(ligand, seed)
+        all_xyz = mol.GetConformer().GetPositions()
+        heavy = np.array([atom.GetAtomicNum() > 1 for atom in mol.GetAtoms()])
+        centroid = all_xyz[heavy].mean(axis=0)
+        local = all_xyz[heavy] - centroid
+        reach = np.linalg.norm(local, axis=1).max()
+
+        rng = np.random.default_rng(seed)
+        n = self.samples * exhaustiveness
+        half = np.maximum((upper - origin) / 2 - reach, 0.0)
+        mid = (origin + upper) / 2
+        rot = _rotations(rng.normal(size=(n, 4)))
+        trans = mid + rng.uniform(-1, 1, size=(n, 3)) * half
+        scores = score(local @ rot.transpose(0, 2, 1) + trans[:, None])
+
+        keep = np.argsort(scores)[: max(8 * n_poses, 32)]
+        rot, trans, scores = rot[keep], trans[keep], scores[keep]
+        for _ in range(self.refine_steps):
+            step = _rotations(np.concatenate([np.ones((len(keep), 1)) * 20, rng.normal(size=(len(keep), 3))], axis=1))
+            new_rot = step @ rot
+            new_trans = trans + rng.normal(scale=0.3, size=trans.shape)
+            new_scores = score(local @ new_rot.transpose(0, 2, 1) + new_trans[:, None])
+            better = new_scores < scores
+            rot[better], trans[better], scores[better] = new_rot[better], new_trans[better], new_scores[better]
+
+        poses = []
+        for j in np.argsort(scores)[:n_poses]:
+            placed = Chem.Mol(mol)
+            conf = placed.GetConformer()
+            for atom, xyz in enumerate((all_xyz - centroid) @ rot[j].T + trans[j]):
+                conf.SetAtomPosition(atom, xyz.tolist())
+            poses.append(Pose(score=float(scores[j]), molblock=Chem.MolToMolBlock(placed), seed=seed))
+        return poses
+
+
+def _rotations(quaternions: "np.ndarray") -> "np.ndarray":
+    """Rotation matrices (n, 3, 3) from unnormalized quaternions (n, 4), w first."""
+    import numpy as np
+
+    w, x, y, z = (quaternions / np.linalg.norm(quaternions, axis=1, keepdims=True)).T
+    return np.stack(
+        [
+            np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)], axis=-1),
+            np.stack([2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)], axis=-1),
+            np.stack([2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)], axis=-1),
+        ],
+        axis=1,
+    )
+
+
+def vina_available() -> bool:
+    """Whether the vina and meeko packages can be imported."""
+    import importlib.util
+
+    return all(importlib.util.find_spec(name) is not None for name in ("vina", "meeko"))
+
+
+def get_engine(name: str = "auto") -> DockingEngine:
+    """Engine by name: "vina", "stand-in", or "auto" (Vina when installed)."""
+    if name == "auto":
+        name = "vina" if vina_available() else "stand-in"
+    if name == "vina":
+        if not vina_available():
+            raise RuntimeError("Vina docking needs the vina and meeko packages")
+        return VinaEngine()
+    if name == "stand-in":
+        return StandInEngine()
+    raise ValueError(f"Unknown docking engine: {name}")
+
+
+# -------------------------------------------------------------- grid cache
+
+
+def grid_key(receptor: bytes, box: Box, engine: DockingEngine) -> str:
+    """Cache key of a receptor's preparation for one box and engine."""
+    digest = hashlib.sha256(f"v{GRID_VERSION}\n{engine.name}:{engine.version}\n{box.key()}\n".encode())
+    digest.update(receptor.replace(b"\r\n", b"\n"))
+    return digest.hexdigest()
+
+
+class GridCache:
+    """
+    Prepared receptors and grids on a size-capped DiskCache, with
+    single-flight preparation and a local directory of unpacked grids.
+
+    Args:
+        store: Blob store of zipped grid directories (LRU-evicted above its max_bytes)
+        work_dir: Where grids are unpacked for the search processes
+    """
+
+    def __init__(self, store: DiskCache, work_dir: Path):
+        self.store = store
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def get_or_prepare(
+        self, receptor: bytes, box: Box, engine: DockingEngine, fmt: Optional[str] = None
+    ) -> tuple[PreparedReceptor, bool]:
+        """Return (prepared receptor, from_cache) for a receptor file's content and a box."""
+        key = grid_key(receptor, box, engine)
+        with self._locks_guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            try:
+                grid_dir = self.work_dir / key
+                data = self.store.get(key)
+                from_cache = data is not None
+                if data is None:
+                    data = self._prepare(receptor, box, engine, fmt)
+                    self.store.put(key, data)
+                if not (grid_dir / ".complete").exists():
+                    self._unpack(key, data)
+                count("portal_cache_requests_total", cache="docking_grids", result="hit" if from_cache else "miss")
+                os.utime(grid_dir)
+                receptor_pdb = (grid_dir / "receptor.pdb").read_text()
+                prepared = PreparedReceptor(key=key, box=box, grid_dir=grid_dir, receptor_pdb=receptor_pdb, cache=self)
+                return prepared, from_cache
+            finally:
+                with self._locks_guard:
+                    self._locks.pop(key, None)
+
+    @contextmanager
+    def pin(self, prepared: PreparedReceptor) -> Iterator[None]:
+        """
+        Keep a prepared receptor's unpacked grids while a search or screen uses
+        them. Pins are files in work_dir named with the holder's pid, so every
+        process sharing the directory honors them; grids pruned before the pin
+        was taken are unpacked again from the store.
+        """
+        pin = self.work_dir / f"{prepared.key}.{os.getpid()}.{uuid.uuid4().hex}.pin"
+        pin.touch()
+        try:
+            if not (prepared.grid_dir / ".complete").exists():
+                data = self.store.get(prepared.key)
+                if data is None:
+                    raise FileNotFoundError("Receptor grids were evicted from the cache; prepare the receptor again")
+                self._unpack(prepared.key, data)
+            yield
+        finally:
+            pin.unlink(missing_ok=True)
+
+    def _pinned_keys(self) -> set[str]:
+        """Keys pinned by live processes; pins left by dead processes are removed."""
+        keys = set()
+        for pin in self.work_dir.glob("*.pin"):
+            key, pid, _ = pin.name.rsplit(".", 3)[:3]
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                pin.unlink(missing_ok=True)
+                continue
+            except (PermissionError, ValueError):
+                pass
+            keys.add(key)
+        return keys
+
+    def _prepare(self, receptor: bytes, box: Box, engine: DockingEngine, fmt: Optional[str]) -> bytes:
+        with tempfile.TemporaryDirectory(prefix="dock-prep-") as tmp:
+            out_dir = Path(tmp)
+            with span("docking.prepare", engine=engine.name):
+                structure = clean_receptor(receptor, fmt)
+                (out_dir / "receptor.pdb").write_text(structure.to_pdb())
+                engine.prepare(structure, box, out_dir)
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+                for path in sorted(out_dir.iterdir()):
+                    archive.write(path, path.name)
+            return buffer.getvalue()
+
+    def _unpack(self, key: str, data: bytes) -> None:
+        tmp = self.work_dir / f"{key}.{uuid.uuid4().hex}.tmp"
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            archive.extractall(tmp)
+        (tmp / ".complete").touch()
+        try:
+            tmp.rename(self.work_dir / key)
+        except OSError:  # another process unpacked it first
+            shutil.rmtree(tmp, ignore_errors=True)
+        unpacked = sorted(
+            (p for p in self.work_dir.iterdir() if p.is_dir() and not p.name.endswith(".tmp")),
+            key=lambda p: p.stat().st_mtime,
+        )
+        pinned = self._pinned_keys()
+        for stale in unpacked[:-MAX_UNPACKED_GRIDS]:
+            if stale.name != key and stale.name not in pinned:
+                shutil.rmtree(stale, ignore_errors=True)
+
+    def stats(self) -> dict[str, int]:
+        return self.store.stats()
+
+
+_grid_caches: dict[str, GridCache] = {}
+_grid_caches_lock = threading.Lock()
+
+
+def get_grid_cache(max_bytes: int = DEFAULT_GRID_CACHE_BYTES) -> GridCache:
+    """Return the process-wide grid cache."""
+    with _grid_caches_lock:
+        if "default" not in _grid_caches:
+            root = DEFAULT_CACHE_DIR / "docking"
+            _grid_caches["default"] = GridCache(DiskCache(root / "grids", max_bytes), root / "unpacked")
+        return _grid_caches["default"]
+
+
+# ---------------------------------------------------------------- search
+
+
+def shard_plan(exhaustiveness: int, seed: int, workers: int) -> list[tuple[int, int]]:
+    """
+    Split a search into (exhaustiveness, seed) shards, at most one per worker
+    and each with at least one unit of exhaustiveness.
+    """
+    shards = max(1, min(workers, exhaustiveness))
+    base, extra = divmod(exhaustiveness, shards)
+    return [(base + (i < extra), seed + i) for i in range(shards)]
+
+
+def merge_poses(poses: list[Pose], n_poses: int, min_rmsd: float = DUPLICATE_RMSD) -> list[Pose]:
+    """Best-scoring poses first, skipping any within min_rmsd of one already kept."""
+    import numpy as np
+
+    kept: list[Pose] = []
+    kept_xyz: list["np.ndarray"] = []
+    for pose in sorted(poses, key=lambda p: p.score):
+        xyz = ligand_coords(pose.molblock)
+        if xyz is not None and any(
+            ref.shape == xyz.shape and np.sqrt(((ref - xyz) ** 2).sum(axis=1).mean()) < min_rmsd for ref in kept_xyz
+        ):
+            continue
+        kept.append(pose)
+        if xyz is not None:
+            kept_xyz.append(xyz)
+        if len(kept) == n_poses:
+            break
+    return kept
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_search_pool() -> ProcessPoolExecutor:
+    """Process-wide pool for search shards; one worker per core, kept warm across runs."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _pool
+
+
+def discard_search_pool() -> None:
+    """Drop the search pool after it broke (a worker died), so the next get_search_pool() starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def dock(
+    prepared: PreparedReceptor,
+    ligand: str,
+    engine: DockingEngine,
+    exhaustiveness: int = 8,
+    n_poses: int = 9,
+    seed: int = 0,
+    workers: Optional[int] = None,
+) -> list[Pose]:
+    """
+    Dock one ligand against a prepared receptor.
+
+    Args:
+        prepared: Receptor and grids from GridCache.get_or_prepare()
+        ligand: Ligand MOL block (embedded in 3D if it has no coordinates)
+        engine: Engine the receptor was prepared with
+        exhaustiveness: Total search effort, split across shards
+        n_poses: Poses to return
+        seed: Seed of the first shard; shard i uses seed + i
+        workers: Most shards to split into (default: one per core)
+
+    Returns:
+        Up to n_poses distinct poses, best score first
+    """
+    plan = shard_plan(exhaustiveness, seed, workers or os.cpu_count() or 1)
+    with prepared.pinned(), span("docking.search", engine=engine.name, shards=len(plan)):
+        if len(plan) == 1:
+            poses = engine.search(prepared.grid_dir, ligand, plan[0][0], plan[0][1], n_poses)
+        else:
+            pool = get_search_pool()
+            futures = [
+                pool.submit(engine.search, prepared.grid_dir, ligand, shard_exhaustiveness, shard_seed, n_poses)
+                for shard_exhaustiveness, shard_seed in plan
+            ]
+            try:
+                poses = [pose for future in futures for pose in future.result()]
+            except BrokenExecutor:
+                discard_search_pool()
+                raise
+    return merge_poses(poses, n_poses)
+
+
+def poses_to_sdf(poses: list[Pose], name: str = "ligand") -> str:
+    """Poses as a multi-record SDF with rank and score properties."""
+    records = []
+    for rank, pose in enumerate(poses, start=1):
+        body = pose.molblock.split("\n", 1)[1]
+        records.append(
+            f"{name}_pose{rank}\n{body.rstrip()}\n"
+            f">  <rank>\n{rank}\n\n>  <score>\n{pose.score:.3f}\n\n$$$$\n"
+        )
+    return "".join(records)
+
+
+def complex_pdb(receptor_pdb: str, pose: Pose) -> str:
+    """Receptor with one pose appended as HETATM records, for viewing."""
+    from rdkit import Chem
+
+    mol = Chem.MolFromMolBlock(pose.molblock, removeHs=False)
+    ligand = [line for line in Chem.MolToPDBBlock(mol).splitlines() if line.startswith(("ATOM", "HETATM"))]
+    ligand = ["HETATM" + line[6:17] + "LIG L" + line[22:] for line in ligand]
+    receptor = [line for line in receptor_pdb.splitlines() if line.startswith(("ATOM", "HETATM", "TER"))]
+    return "\n".join(receptor + ligand + ["END"]) + "\n"
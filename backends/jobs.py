@@ -0,0 +1,467 @@
+"""
+Persistent job registry for backend runs.
+
+Jobs are recorded in a SQLite database and executed on a process-wide
+thread pool, off the Streamlit script thread. `submit()` returns a job ID
+immediately; pages keep that ID in session state / query params and call
+`get()` on every rerun to reattach to queued, running or finished jobs.
+
+With a broker (see backends.broker), `submit()` only enqueues the job and
+out-of-process workers (`python -m backends.worker`) run it, writing
+status, progress and results back to the same database.
+"""
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Optional
+
+from backends.broker import Broker, broker_from_env
+from backends.cache import get_result_cache
+from backends.rdf3 import (
+    RDF3Config,
+    RDF3Result,
+    config_from_json,
+    config_to_json,
+    decode_results,
+    results_to_archive,
+    run,
+)
+from utils.metrics import bind_session, current_session_id, record
+
+JOB_STATES = ("queued", "running", "done", "failed")
+ACTIVE_STATES = ("queued", "running")
+
+DEFAULT_DB_PATH = Path(tempfile.gettempdir()) / "portal_jobs" / "jobs.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    tool TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    status TEXT NOT NULL,
+    config BLOB NOT NULL,
+    options TEXT NOT NULL,
+    results TEXT,
+    error TEXT,
+    runner TEXT,
+    progress REAL,
+    log TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+# Processes that run jobs in-process, so a starting server can tell their jobs from orphans
+_RUNNERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runners (
+    runner_id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    heartbeat_at REAL NOT NULL
+)
+"""
+
+# Columns added after the first schema; ALTERed into older databases
+_MIGRATIONS = (
+    "ALTER TABLE jobs ADD COLUMN progress REAL",
+    "ALTER TABLE jobs ADD COLUMN log TEXT",
+    "ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0",
+)
+
+# runner of jobs handed to a broker; their liveness is tracked by leases
+QUEUE_RUNNER = "queue"
+
+# A runner that has not heartbeated for RUNNER_STALE_SECONDS is presumed dead
+RUNNER_HEARTBEAT_SECONDS = 10.0
+RUNNER_STALE_SECONDS = 60.0
+
+LOG_TAIL_LINES = 200
+LOG_FLUSH_SECONDS = 0.5
+
+
+@dataclass
+class Job:
+    """Snapshot of a registered job."""
+
+    job_id: str
+    tool: str
+    backend: str
+    status: str  # "queued" | "running" | "done" | "failed"
+    created_at: float
+    updated_at: float
+    results: list[RDF3Result] = field(default_factory=list)
+    error: Optional[str] = None
+    progress: Optional[float] = None
+    log: str = ""
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATES
+
+
+def _is_secret(name: str) -> bool:
+    return "key" in name or "token" in name
+
+
+def _redact(options: dict) -> dict:
+    """Drop credentials before options are persisted."""
+    return {k: ("***" if _is_secret(k) else v) for k, v in options.items()}
+
+
+# runner IDs of the registries created in this process
+_process_runners: set[str] = set()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+def _portable(config: RDF3Config) -> RDF3Config:
+    """Inline input files so a worker on another host does not need this one's filesystem."""
+    return replace(
+        config,
+        scaffold_pdb=config.scaffold_path.read_bytes() if config.scaffold_path else config.scaffold_pdb,
+        scaffold_path=None,
+        ligand_sdf=config.ligand_path.read_bytes() if config.ligand_path else config.ligand_sdf,
+        ligand_path=None,
+    )
+
+
+def encode_payload(config: RDF3Config, backend: str, options: dict) -> bytes:
+    """Queue payload for a job: JSON, so workers never unpickle what is in the queue."""
+    return json.dumps(
+        {"config": json.loads(config_to_json(_portable(config))), "backend": backend, "options": options},
+        default=str,
+    ).encode("utf-8")
+
+
+def decode_payload(payload: bytes) -> tuple[RDF3Config, str, dict]:
+    """Inverse of encode_payload; raises ValueError on a malformed payload."""
+    data = json.loads(payload)
+    if not (isinstance(data, dict) and isinstance(data.get("backend"), str) and isinstance(data.get("options"), dict)):
+        raise ValueError("Malformed job payload")
+    if "config" not in data:
+        raise ValueError("Job payload has no config")
+    return config_from_json(json.dumps(data["config"])), data["backend"], data["options"]
+
+
+class JobRegistry:
+    """
+    SQLite-backed registry that runs RDF3 jobs in background threads, or
+    enqueues them for workers when a broker is given.
+
+    Args:
+        db_path: SQLite database file (created if missing)
+        max_workers: Number of jobs executed concurrently by this process
+        broker: Queue that workers consume; None runs jobs in this process
+        recover_orphans: Fail in-process jobs whose runner process is dead or has
+            stopped heartbeating (workers sharing the database pass False)
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        max_workers: int = 2,
+        broker: Optional[Broker] = None,
+        recover_orphans: bool = True,
+    ):
+        self.db_path = Path(db_path or DEFAULT_DB_PATH)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.runner_id = uuid.uuid4().hex
+        _process_runners.add(self.runner_id)
+        self.broker = broker
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._cancel_events: dict[str, threading.Event] = {}
+        self._abandoned: set[str] = set()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            conn.execute(_RUNNERS_SCHEMA)
+            for statement in _MIGRATIONS:
+                try:
+                    conn.execute(statement)
+                except sqlite3.OperationalError:
+                    pass  # column already exists
+            self._heartbeat_runner(conn)
+            if recover_orphans:
+                # In-process jobs owned by a dead server process can never finish;
+                # those of other live processes sharing the database are left alone.
+                live = [self.runner_id, QUEUE_RUNNER, *self._live_runners(conn)]
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? "
+                    f"WHERE status IN ('queued', 'running') AND runner NOT IN ({', '.join('?' * len(live))})",
+                    ("Interrupted by server restart", time.time(), *live),
+                )
+        threading.Thread(target=self._heartbeat_loop, name="job-runner-heartbeat", daemon=True).start()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _heartbeat_runner(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO runners (runner_id, host, pid, heartbeat_at) VALUES (?, ?, ?, ?)",
+            (self.runner_id, socket.gethostname(), os.getpid(), time.time()),
+        )
+
+    def _heartbeat_loop(self) -> None:
+        while True:
+            time.sleep(RUNNER_HEARTBEAT_SECONDS)
+            try:
+                with self._connect() as conn:
+                    self._heartbeat_runner(conn)
+            except sqlite3.Error:
+                pass  # retried on the next beat; only a long outage makes this runner look stale
+
+    def _live_runners(self, conn: sqlite3.Connection) -> list[str]:
+        """IDs of other runners that heartbeated recently and, if on this host, whose process exists."""
+        host = socket.gethostname()
+        live, dead = [], []
+        rows = conn.execute(
+            "SELECT runner_id, host, pid, heartbeat_at FROM runners WHERE runner_id != ?", (self.runner_id,)
+        ).fetchall()
+        for runner_id, runner_host, pid, heartbeat_at in rows:
+            stale = heartbeat_at < time.time() - RUNNER_STALE_SECONDS
+            if runner_host == host and pid == os.getpid():
+                # This process's pid but not one of its registries: a previous incarnation (e.g. a restarted container)
+                gone = runner_id not in _process_runners
+            else:
+                gone = runner_host == host and not _pid_alive(pid)
+            if stale or gone:
+                dead.append(runner_id)
+            else:
+                live.append(runner_id)
+        conn.executemany("DELETE FROM runners WHERE runner_id = ?", [(runner_id,) for runner_id in dead])
+        return live
+
+    def submit(self, config: RDF3Config, backend: str = "stub", tool: str = "rdf3", **kwargs: Any) -> str:
+        """
+        Register a job and start it in the background, or enqueue it for workers.
+
+        Args:
+            config: Design configuration
+            backend: Backend passed to backends.rdf3.run
+            tool: Tool name, for listing jobs per page
+            **kwargs: Backend-specific options (must be JSON-serializable);
+                credentials are not passed to workers, which use their own
+
+        Returns:
+            The new job ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, tool, backend, status, config, options, runner, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, tool, backend, config_to_json(config), json.dumps(_redact(kwargs), default=str),
+                 QUEUE_RUNNER if self.broker else self.runner_id, now, now),
+            )
+        if self.broker is not None:
+            options = {k: v for k, v in kwargs.items() if not _is_secret(k)}
+            self.broker.enqueue(job_id, encode_payload(config, backend, options))
+            return job_id
+        self._executor.submit(self._execute, job_id, config, backend, kwargs, time.monotonic(), current_session_id())
+        return job_id
+
+    def _set_status(self, job_id: str, status: str, **columns: Any) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in ("status", "updated_at", *columns))
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                (status, time.time(), *columns.values(), job_id),
+            )
+
+    def _execute(
+        self,
+        job_id: str,
+        config: RDF3Config,
+        backend: str,
+        kwargs: dict,
+        submitted_at: float,
+        session_id: Optional[str] = None,
+    ) -> None:
+        with bind_session(session_id):
+            record("job.queue", time.monotonic() - submitted_at)
+            self.run_job(job_id, config, backend, kwargs)
+
+    def run_job(
+        self,
+        job_id: str,
+        config: RDF3Config,
+        backend: str,
+        kwargs: dict,
+        inline_outputs: bool = False,
+    ) -> None:
+        """
+        Run a registered job in the calling thread, recording its progress and outcome.
+
+        Args:
+            job_id: ID returned by submit()
+            config: Design configuration
+            backend: Backend passed to backends.rdf3.run
+            kwargs: Backend-specific options
+            inline_outputs: Store output structures in the results rather than
+                by path (for workers whose files the web tier cannot read)
+        """
+        self._abandoned.discard(job_id)
+        cancel_event = self._cancel_events.setdefault(job_id, threading.Event())
+        if cancel_event.is_set() or self.cancel_requested(job_id):
+            self._set_status(job_id, "failed", error="Cancelled.")
+            return
+        self._set_status(job_id, "running")
+        reporter = _JobReporter(self, job_id)
+        try:
+            results = run(
+                config,
+                backend=backend,
+                cache=get_result_cache(),
+                cancel_event=cancel_event,
+                on_log=reporter.log,
+                on_progress=reporter.progress,
+                **kwargs,
+            )
+            if inline_outputs:
+                for result in results:
+                    result.read_pdb()
+            archive = results_to_archive(results)
+        except Exception as e:
+            if self._abandoned_by_runner(job_id):
+                return
+            reporter.flush()
+            self._set_status(job_id, "failed", error=str(e))
+            return
+        finally:
+            self._cancel_events.pop(job_id, None)
+        if self._abandoned_by_runner(job_id):
+            return
+        reporter.flush()
+        self._set_status(job_id, "done", results=archive, progress=1.0)
+
+    def abandon(self, job_id: str) -> None:
+        """
+        Stop a job running in this process without recording an outcome, e.g.
+        when a worker's lease lapsed and the job was handed to another worker.
+        """
+        self._abandoned.add(job_id)
+        self._cancel_events.setdefault(job_id, threading.Event()).set()
+
+    def _abandoned_by_runner(self, job_id: str) -> bool:
+        if job_id not in self._abandoned:
+            return False
+        self._abandoned.discard(job_id)
+        return True
+
+    def fail(self, job_id: str, error: str) -> None:
+        """Mark a job failed without running it."""
+        self._set_status(job_id, "failed", error=error)
+
+    def cancel(self, job_id: str) -> None:
+        """Request cancellation; a running CLI job has its process tree killed."""
+        self._cancel_events.setdefault(job_id, threading.Event()).set()
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+
+    def cancel_requested(self, job_id: str) -> bool:
+        """True if cancel() was called for this job, in any process."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        """Return the job with this ID, or None if unknown."""
+        if not job_id:
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id, tool, backend, status, created_at, updated_at, results, error, progress, log "
+                "FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Job(
+            job_id=row[0],
+            tool=row[1],
+            backend=row[2],
+            status=row[3],
+            created_at=row[4],
+            updated_at=row[5],
+            results=decode_results(row[6]),
+            error=row[7],
+            progress=row[8],
+            log=row[9] or "",
+        )
+
+    def list_jobs(self, tool: Optional[str] = None, limit: int = 20) -> list[Job]:
+        """Return the most recent jobs (without results), newest first."""
+        query = "SELECT job_id, tool, backend, status, created_at, updated_at, error FROM jobs"
+        params: tuple = ()
+        if tool:
+            query += " WHERE tool = ?"
+            params = (tool,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._connect() as conn:
+            rows = conn.execute(query, (*params, limit)).fetchall()
+        return [
+            Job(job_id=r[0], tool=r[1], backend=r[2], status=r[3], created_at=r[4], updated_at=r[5], error=r[6])
+            for r in rows
+        ]
+
+
+class _JobReporter:
+    """Buffers log lines and progress from a running job into its row."""
+
+    def __init__(self, registry: JobRegistry, job_id: str):
+        self.registry = registry
+        self.job_id = job_id
+        self.lines: deque[str] = deque(maxlen=LOG_TAIL_LINES)
+        self.fraction: Optional[float] = None
+        self.last_flush = 0.0
+
+    def log(self, line: str) -> None:
+        self.lines.append(line)
+        self._maybe_flush()
+
+    def progress(self, fraction: float) -> None:
+        self.fraction = fraction
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if time.monotonic() - self.last_flush >= LOG_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self) -> None:
+        self.last_flush = time.monotonic()
+        with self.registry._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ?, log = ? WHERE job_id = ?",
+                (self.fraction, "\n".join(self.lines), self.job_id),
+            )
+
+
+_registry: Optional[JobRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> JobRegistry:
+    """Return the process-wide job registry, shared by all sessions (see broker_from_env)."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = JobRegistry(broker=broker_from_env())
+        return _registry
@@ -0,0 +1,448 @@
+"""
+ProteinMPNN backend: a resident model server shared by all sessions.
+
+Loading model weights costs far more than designing sequences for a short
+backbone, so the model lives in one long-running process instead of being
+loaded per click. The server listens on a local Unix socket
+(multiprocessing.connection, authenticated with a per-host key file),
+loads the model once in the background and reports readiness through a
+health call. Design requests from every connection go through a
+MicroBatcher, so concurrent sessions share forward passes.
+
+The default model is a CPU-only stand-in: backbone geometry features and
+a fixed linear layer giving per-residue amino-acid probabilities, sampled
+at the requested temperature. It exercises the whole path without a GPU.
+A real model is plugged in with --model module:factory, where factory()
+returns an object with a name, load() and design(requests).
+
+Pages call get_mpnn_client(), which starts the server on first use:
+
+    python -m backends.proteinmpnn [--socket PATH] [--model stand-in]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from typing import Any, Optional, Protocol, Sequence
+
+from backends.base import Capabilities
+from utils.metrics import span
+
+DEFAULT_SOCKET_PATH = Path(tempfile.gettempdir()) / "portal_mpnn" / "mpnn.sock"
+DEFAULT_MODEL = "stand-in"
+STARTUP_TIMEOUT_SECONDS = 10.0
+DESIGN_TIMEOUT_SECONDS = 600.0
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+THREE_TO_ONE = {
+    "ALA": "A", "ARG": "R", "ASN": "N", "ASP": "D", "CYS": "C", "GLN": "Q", "GLU": "E", "GLY": "G",
+    "HIS": "H", "ILE": "I", "LEU": "L", "LYS": "K", "MET": "M", "PHE": "F", "PRO": "P", "SER": "S",
+    "THR": "T", "TRP": "W", "TYR": "Y", "VAL": "V", "MSE": "M",
+}
+# Background amino-acid frequencies (UniProt), in AMINO_ACIDS order
+_BACKGROUND = (0.083, 0.014, 0.055, 0.067, 0.039, 0.071, 0.023, 0.059, 0.058, 0.097,
+               0.024, 0.041, 0.047, 0.039, 0.055, 0.066, 0.053, 0.069, 0.011, 0.029)
+
+
+@dataclass
+class MPNNRequest:
+    """One design request: a backbone and the page's sampling parameters."""
+
+    pdb: bytes
+    num_seqs: int = 8
+    temperature: float = 0.1
+    seed: Optional[int] = None
+
+
+@dataclass
+class MPNNDesign:
+    """A designed sequence; chains are separated by "/"."""
+
+    name: str
+    sequence: str
+    score: float  # mean negative log-likelihood per residue
+    recovery: float  # fraction of residues identical to the input sequence
+    temperature: float
+
+
+class DesignModel(Protocol):
+    """What the server needs from a model."""
+
+    name: str
+
+    def load(self) -> None:
+        """Load weights; called once, off the request path."""
+        ...
+
+    def design(self, requests: Sequence[MPNNRequest]) -> list[list[MPNNDesign]]:
+        """Design sequences for a batch of requests."""
+        ...
+
+
+def _backbone(pdb: bytes):
+    """CA coordinates, native one-letter sequence and chain IDs of the first model."""
+    import numpy as np
+
+    from utils.structure import Structure
+
+    structure = Structure.parse(pdb)
+    mask = structure.ca_mask & (structure.model == structure.model.min(initial=1)) & structure.alt_loc.isin(["", "A"])
+    ca = structure[mask]
+    if len(ca) < 2:
+        raise ValueError("Backbone needs at least two residues with CA atoms.")
+    native = "".join(THREE_TO_ONE.get(name, "X") for name in ca.res_name.values)
+    return ca.coords.astype(np.float64), native, ca.chain_id.values
+
+
+def _backbone_features(ca) -> Any:
+    """Per-residue burial, local geometry and chain position, shape (L, 8)."""
+    import numpy as np
+
+    n = len(ca)
+    neighbours = np.zeros((n, 2))
+    for lo in range(0, n, 1024):
+        d = np.linalg.norm(ca[lo : lo + 1024, None] - ca[None], axis=-1)
+        neighbours[lo : lo + 1024] = np.stack([(d < 8).sum(1) - 1, (d < 12).sum(1) - 1], axis=1)
+
+    bonds = np.diff(ca, axis=0)
+    bonds /= np.maximum(np.linalg.norm(bonds, axis=1, keepdims=True), 1e-6)
+    angle = np.zeros(n)
+    angle[1:-1] = -(bonds[:-1] * bonds[1:]).sum(1)
+    normals = np.cross(bonds[:-1], bonds[1:])
+    dihedral = np.zeros((n, 2))
+    if n > 3:
+        n1, n2 = normals[:-1], normals[1:]
+        cos = (n1 * n2).sum(1)
+        sin = (np.cross(n1, n2) * bonds[1:-1]).sum(1)
+        norm = np.maximum(np.hypot(cos, sin), 1e-6)
+        dihedral[1:-2] = np.stack([cos / norm, sin / norm], axis=1)
+
+    position = np.linspace(0.0, 1.0, n)
+    return np.column_stack(
+        [np.ones(n), neighbours[:, 0] / 20, neighbours[:, 1] / 40, angle, dihedral, position, 1 - position]
+    )
+
+
+class StandInModel:
+    """CPU-only stand-in: a fixed linear layer over backbone geometry features."""
+
+    name = "stand-in (CPU)"
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self.weights = None
+        self.bias = None
+
+    def load(self) -> None:
+        import numpy as np
+
+        rng = np.random.default_rng(self.seed)
+        self.weights = rng.normal(scale=0.8, size=(8, len(AMINO_ACIDS)))
+        self.bias = np.log(np.asarray(_BACKGROUND))
+
+    def design(self, requests: Sequence[MPNNRequest]) -> list[list[MPNNDesign]]:
+        import numpy as np
+
+        backbones = [_backbone(r.pdb) for r in requests]
+        features = [_backbone_features(ca) for ca, _, _ in backbones]
+        # One forward pass for the whole batch
+        logits = np.concatenate(features) @ self.weights + self.bias
+        bounds = np.cumsum([0] + [len(f) for f in features])
+
+        out = []
+        for request, (ca, native, chains), lo, hi in zip(requests, backbones, bounds[:-1], bounds[1:]):
+            scaled = logits[lo:hi] / max(request.temperature, 1e-3)
+            probs = np.exp(scaled - scaled.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            seed = request.seed if request.seed is not None else int(abs(ca).sum() * 1000) % 2**32
+            rng = np.random.default_rng(seed)
+            draws = rng.random((request.num_seqs, len(ca), 1))
+            choices = np.minimum((probs.cumsum(axis=1)[None] < draws).sum(axis=2), len(AMINO_ACIDS) - 1)
+            nll = -np.log(probs[np.arange(len(ca))[None], choices])
+            letters = np.asarray(list(AMINO_ACIDS))[choices]
+            native_arr = np.asarray(list(native))
+            breaks = np.flatnonzero(chains[1:] != chains[:-1]) + 1
+            designs = []
+            for i in range(request.num_seqs):
+                chain_seqs = ["".join(part) for part in np.split(letters[i], breaks)]
+                designs.append(
+                    MPNNDesign(
+                        name=f"design_{i + 1}",
+                        sequence="/".join(chain_seqs),
+                        score=float(nll[i].mean()),
+                        recovery=float((letters[i] == native_arr).mean()),
+                        temperature=request.temperature,
+                    )
+                )
+            out.append(designs)
+        return out
+
+
+def load_model(spec: str = DEFAULT_MODEL) -> DesignModel:
+    """Model from a spec: "stand-in", or "module:factory" for a real model."""
+    if spec == DEFAULT_MODEL:
+        return StandInModel()
+    import importlib
+
+    module, _, factory = spec.partition(":")
+    return getattr(importlib.import_module(module), factory)()
+
+
+class MPNNBackend:
+    """backends.base.Backend adapter over a loaded model; requests are MPNNRequests."""
+
+    def __init__(self, model: DesignModel, max_batch_size: int = 16, batch_window: float = 0.02):
+        self.model = model
+        resource = "cpu" if isinstance(model, StandInModel) else "gpu"
+        self.capabilities = Capabilities(
+            "proteinmpnn", batchable=True, max_batch_size=max_batch_size, resource_class=resource,
+            batch_window=batch_window,
+        )
+
+    def run_batch(self, requests: Sequence[MPNNRequest]) -> list:
+        try:
+            return self.model.design(requests)
+        except Exception:
+            if len(requests) == 1:
+                raise
+        # Isolate the request that broke the batch
+        out: list = []
+        for request in requests:
+            try:
+                out.extend(self.model.design([request]))
+            except Exception as e:
+                out.append(e)
+        return out
+
+
+def _authkey(socket_path: Path) -> bytes:
+    """Per-host secret shared by server and clients, readable only by this user."""
+    path = socket_path.with_suffix(".key")
+    if path.exists():
+        return path.read_bytes()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{os.getpid()}.{threading.get_ident()}.key")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(os.urandom(32))
+    try:
+        os.link(tmp, path)  # atomic; the first writer wins
+    except FileExistsError:
+        pass
+    finally:
+        tmp.unlink()
+    return path.read_bytes()
+
+
+class ModelServer:
+    """
+    Serves design and health requests for one resident model.
+
+    Args:
+        socket_path: Unix socket to listen on
+        model: Model to load and serve
+    """
+
+    def __init__(self, socket_path: Path, model: DesignModel):
+        from backends.dispatcher import MicroBatcher
+
+        self.socket_path = Path(socket_path)
+        self.model = model
+        self.batcher = MicroBatcher(MPNNBackend(model))
+        self.ready = threading.Event()
+        self.load_error: Optional[str] = None
+        self.started_at = time.time()
+        self.loaded_at: Optional[float] = None
+        self.served = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def health(self) -> dict:
+        return {
+            "ready": self.ready.is_set() and self.load_error is None,
+            "model": self.model.name,
+            "error": self.load_error,
+            "pid": os.getpid(),
+            "uptime_s": time.time() - self.started_at,
+            "load_s": (self.loaded_at - self.started_at) if self.loaded_at else None,
+            "served": self.served,
+            "in_flight": self.in_flight,
+        }
+
+    def _load(self) -> None:
+        try:
+            self.model.load()
+            self.loaded_at = time.time()
+        except Exception as e:
+            self.load_error = f"Model failed to load: {e}"
+        self.ready.set()
+
+    def _design(self, request: MPNNRequest) -> list[MPNNDesign]:
+        self.ready.wait()
+        if self.load_error:
+            raise RuntimeError(self.load_error)
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return self.batcher.call(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.served += 1
+
+    def _handle(self, conn) -> None:
+        with conn:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if op == "health":
+                    conn.send(("ok", self.health()))
+                elif op == "design":
+                    try:
+                        conn.send(("ok", self._design(payload)))
+                    except Exception as e:
+                        conn.send(("error", str(e)))
+                else:
+                    conn.send(("error", f"Unknown operation: {op}"))
+
+    def serve_forever(self) -> None:
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self.socket_path.unlink(missing_ok=True)
+        with Listener(str(self.socket_path), family="AF_UNIX", authkey=_authkey(self.socket_path)) as listener:
+            threading.Thread(target=self._load, name="mpnn-load", daemon=True).start()
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception:
+                    continue  # failed handshake (wrong key); keep serving
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+class MPNNClient:
+    """
+    Client for the model server; starts the server if it is not running.
+
+    Args:
+        socket_path: Server socket
+        model: Model spec passed to a server this client starts
+    """
+
+    def __init__(self, socket_path: Path = DEFAULT_SOCKET_PATH, model: str = DEFAULT_MODEL):
+        self.socket_path = Path(socket_path)
+        self.model = model
+        self._start_lock = threading.Lock()
+
+    def _call(self, op: str, payload: Any = None, timeout: Optional[float] = None) -> Any:
+        with Client(str(self.socket_path), family="AF_UNIX", authkey=_authkey(self.socket_path)) as conn:
+            conn.send((op, payload))
+            if timeout is not None and not conn.poll(timeout):
+                raise TimeoutError(f"ProteinMPNN server did not answer within {timeout:g}s.")
+            status, result = conn.recv()
+        if status != "ok":
+            raise RuntimeError(result)
+        return result
+
+    def health(self) -> Optional[dict]:
+        """Server health, or None if no server is running."""
+        try:
+            return self._call("health", timeout=5)
+        except (FileNotFoundError, ConnectionRefusedError, TimeoutError, EOFError):
+            return None
+
+    def ensure_running(self) -> dict:
+        """Start the server if needed; returns its health (possibly still loading)."""
+        health = self.health()
+        if health is None:
+            with self._start_lock:
+                self._spawn()
+            health = self.health()
+        if health is None:
+            raise RuntimeError(f"ProteinMPNN server did not start; see {self.socket_path.with_suffix('.log')}")
+        return health
+
+    def _spawn(self) -> None:
+        """Start the server unless another thread or process already has, and wait for its socket."""
+        import fcntl
+
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.socket_path.with_suffix(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self.health() is not None:
+                return
+            with open(self.socket_path.with_suffix(".log"), "ab") as log:
+                subprocess.Popen(
+                    [sys.executable, "-m", "backends.proteinmpnn", "--socket", str(self.socket_path),
+                     "--model", self.model],
+                    cwd=Path(__file__).resolve().parents[1],
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True,
+                )
+            deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+            while self.health() is None and time.monotonic() < deadline:
+                time.sleep(0.1)
+
+    def wait_ready(self, timeout: float = 300.0) -> dict:
+        """Block until the model is loaded; raises if loading failed or timed out."""
+        deadline = time.monotonic() + timeout
+        while True:
+            health = self.ensure_running()
+            if health["error"]:
+                raise RuntimeError(health["error"])
+            if health["ready"]:
+                return health
+            if time.monotonic() >= deadline:
+                raise TimeoutError("ProteinMPNN model is still loading.")
+            time.sleep(0.5)
+
+    def design(self, request: MPNNRequest, timeout: float = DESIGN_TIMEOUT_SECONDS) -> list[MPNNDesign]:
+        """Design sequences for one backbone on the shared server."""
+        with span("mpnn.design"):
+            return self._call("design", request, timeout=timeout)
+
+
+def to_fasta(designs: Sequence[MPNNDesign]) -> str:
+    """FASTA text with ProteinMPNN-style headers."""
+    return "".join(
+        f">{d.name}, T={d.temperature:g}, score={d.score:.4f}, seq_recovery={d.recovery:.4f}\n{d.sequence}\n"
+        for d in designs
+    )
+
+
+_client: Optional[MPNNClient] = None
+_client_lock = threading.Lock()
+
+
+def get_mpnn_client(model: Optional[str] = None) -> MPNNClient:
+    """Return the process-wide client; model (a load_model spec) applies when it starts the server."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MPNNClient(model=model or DEFAULT_MODEL)
+        return _client
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", type=Path, default=DEFAULT_SOCKET_PATH)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help='"stand-in" or module:factory')
+    args = parser.parse_args(argv)
+    server = ModelServer(args.socket, load_model(args.model))
+    print(f"Serving {server.model.name} on {args.socket}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    # Run from the importable module so results pickle as backends.proteinmpnn.*, not __main__.*
+    from backends.proteinmpnn import main as _main
+
+    _main()
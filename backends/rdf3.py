@@ -6,9 +6,21 @@ Supports:
 - API: HTTP POST to custom or Tamarind API
 - Stub: mock results for development
 """
+import base64
+import json
+import tempfile
+import threading
+from concurrent.futures import Future
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
+
+from backends.base import Capabilities
+from utils.metrics import count, span
+
+if TYPE_CHECKING:
+    from backends.cache import ResultCache
+    from utils.structure import Structure
 
 # Stub PDB for demo (minimal valid PDB)
 STUB_PDB = """ATOM      1  N   ALA A   1       0.000   0.000   0.000  1.00  0.00           N
@@ -31,6 +43,7 @@ class RDF3Config:
     constraints_json: Optional[str] = None
     num_designs: int = 1
     output_prefix: str = "design"
+    seed: Optional[int] = None
 
 
 @dataclass
@@ -41,6 +54,150 @@ class RDF3Result:
     pdb_content: Optional[str] = None
     error: Optional[str] = None
     output_path: Optional[Path] = None
+    packed: Optional[bytes] = None  # compact binary form (utils.structure_pack), converted on demand
+
+    def read_pdb(self) -> Optional[str]:
+        """
+        Return the structure text, loading it from output_path if needed. A
+        packed structure is converted (to mmCIF for .cif outputs) on every call
+        and not kept, so stored results stay compact.
+        """
+        if self.pdb_content is None and self.packed is not None:
+            from utils.structure_pack import to_text
+
+            fmt = "cif" if self.output_path is not None and self.output_path.suffix == ".cif" else "pdb"
+            return to_text(self.packed, fmt, self.output_path.stem if self.output_path else "structure")
+        if self.pdb_content is None and self.output_path is not None and self.output_path.exists():
+            self.pdb_content = self.output_path.read_text()
+        return self.pdb_content
+
+    def has_structure(self) -> bool:
+        return self.packed is not None or bool(self.read_pdb())
+
+    def structure(self) -> Optional["Structure"]:
+        """Parse the output into a columnar Structure (PDB or mmCIF)."""
+        from utils.structure import Structure
+
+        if self.packed is not None:
+            from utils.structure_pack import unpack
+
+            return unpack(self.packed)
+        text = self.read_pdb()
+        return Structure.parse(text) if text else None
+
+
+_CONFIG_BYTES = ("scaffold_pdb", "ligand_sdf")
+_CONFIG_PATHS = ("scaffold_path", "ligand_path")
+
+
+def config_to_json(config: RDF3Config) -> str:
+    """Serialize a config to JSON (for job storage and queues); inline inputs are base64."""
+    data = dict(vars(config))
+    for name in _CONFIG_BYTES:
+        if data[name] is not None:
+            data[name] = base64.b64encode(data[name]).decode("ascii")
+    for name in _CONFIG_PATHS:
+        if data[name] is not None:
+            data[name] = str(data[name])
+    return json.dumps(data)
+
+
+def config_from_json(text: Union[str, bytes]) -> RDF3Config:
+    """Inverse of config_to_json; raises ValueError on malformed input."""
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Config must be a JSON object")
+    for name in _CONFIG_BYTES:
+        if data.get(name) is not None:
+            data[name] = base64.b64decode(data[name], validate=True)
+    for name in _CONFIG_PATHS:
+        if data.get(name) is not None:
+            data[name] = Path(data[name])
+    try:
+        return RDF3Config(**data)
+    except TypeError as e:
+        raise ValueError(f"Invalid config: {e}") from e
+
+
+def results_to_json(results: list[RDF3Result]) -> str:
+    """Serialize results to JSON (for job storage and caching)."""
+    return json.dumps(
+        [
+            {
+                "status": r.status,
+                "pdb_content": r.pdb_content,
+                "error": r.error,
+                "output_path": str(r.output_path) if r.output_path else None,
+            }
+            for r in results
+        ]
+    )
+
+
+def results_from_json(text: Optional[str]) -> list[RDF3Result]:
+    """Inverse of results_to_json."""
+    if not text:
+        return []
+    return [
+        RDF3Result(
+            status=d["status"],
+            pdb_content=d.get("pdb_content"),
+            error=d.get("error"),
+            output_path=Path(d["output_path"]) if d.get("output_path") else None,
+        )
+        for d in json.loads(text)
+    ]
+
+
+def results_to_archive(results: list[RDF3Result]) -> bytes:
+    """
+    Serialize results as a packed structure archive (for job storage and
+    caching). Structures held in memory are stored packed; outputs only on
+    disk are stored by path. Text that fails to parse, or parses to no atoms,
+    is kept verbatim.
+    """
+    from utils.structure import Structure
+    from utils.structure_pack import pack, write_archive
+
+    entries = []
+    for i, r in enumerate(results):
+        meta = {"status": r.status, "error": r.error, "output_path": str(r.output_path) if r.output_path else None}
+        packed = r.packed
+        if packed is None and r.pdb_content:
+            try:
+                structure = Structure.parse(r.pdb_content)
+            except ValueError:  # malformed records: keep the text as the backend returned it
+                structure = None
+            if structure is not None and len(structure):
+                packed = pack(structure)
+                meta["format"] = "cif" if r.output_path is not None and r.output_path.suffix == ".cif" else "pdb"
+            else:
+                meta["pdb_content"] = r.pdb_content
+        entries.append((r.output_path.name if r.output_path else f"result_{i}", packed, meta))
+    return write_archive(entries)
+
+
+def decode_results(data: Union[str, bytes, None]) -> list[RDF3Result]:
+    """Inverse of results_to_archive; also reads results stored by results_to_json."""
+    from utils.structure_pack import PackedArchive, is_archive
+
+    if not data:
+        return []
+    if isinstance(data, bytes) and not is_archive(data):
+        data = data.decode("utf-8")
+    if isinstance(data, str):
+        return results_from_json(data)
+    archive = PackedArchive(data)
+    return [
+        RDF3Result(
+            status=entry.meta["status"],
+            pdb_content=entry.meta.get("pdb_content"),
+            error=entry.meta.get("error"),
+            output_path=Path(entry.meta["output_path"]) if entry.meta.get("output_path") else None,
+            packed=archive.packed(i),
+        )
+        for i, entry in enumerate(archive)
+    ]
 
 
 def run_stub(config: RDF3Config) -> list[RDF3Result]:
@@ -60,44 +217,122 @@ def run_stub(config: RDF3Config) -> list[RDF3Result]:
     return results
 
 
-def run_cli(config: RDF3Config, out_dir: Path) -> list[RDF3Result]:
+def _write_inputs(config: RDF3Config, run_dir: Path) -> Path:
+    """Materialize config inputs in run_dir and return the inputs spec path."""
+    spec: dict[str, Any] = {}
+    if config.constraints_json:
+        spec.update(json.loads(config.constraints_json))
+    scaffold = config.scaffold_path
+    if scaffold is None and config.scaffold_pdb is not None:
+        scaffold = run_dir / "scaffold.pdb"
+        scaffold.write_bytes(config.scaffold_pdb)
+    if scaffold is not None:
+        spec["input"] = str(scaffold)
+    ligand = config.ligand_path
+    if ligand is None and config.ligand_sdf is not None:
+        ligand = run_dir / "ligand.sdf"
+        ligand.write_bytes(config.ligand_sdf)
+    if ligand is not None:
+        spec["ligand"] = str(ligand)
+
+    inputs_path = run_dir / "inputs.json"
+    inputs_path.write_text(json.dumps({config.output_prefix: spec}, indent=2))
+    return inputs_path
+
+
+def build_cli_command(config: RDF3Config, run_dir: Path, inputs_path: Path, rfd3_bin: str = "rfd3") -> list[str]:
+    """Build the `rfd3 design` command line (hydra-style key=value overrides)."""
+    cmd = [
+        rfd3_bin,
+        "design",
+        f"out_dir={run_dir / 'outputs'}",
+        f"inputs={inputs_path}",
+        f"n_designs={config.num_designs}",
+    ]
+    if config.seed is not None:
+        cmd.append(f"seed={config.seed}")
+    return cmd
+
+
+def run_cli(
+    config: RDF3Config,
+    out_dir: Path,
+    timeout: Optional[float] = None,
+    cancel_event: Optional[threading.Event] = None,
+    on_log: Optional[Callable[[str], None]] = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+    rfd3_bin: str = "rfd3",
+) -> list[RDF3Result]:
     """
     Run RDF3 via foundry CLI: rfd3 design ...
-    Requires rc-foundry and rfd3 to be installed.
+    Requires rc-foundry and rfd3 to be installed (or any `rfd3` on PATH).
+
+    Each run gets its own directory under out_dir. Output structures are
+    returned by path; RDF3Result.read_pdb() loads them on demand.
+
+    Args:
+        config: Design configuration
+        out_dir: Parent directory for run directories
+        timeout: Wall-clock limit in seconds
+        cancel_event: Set to kill the rfd3 process tree
+        on_log: Called with each output line
+        on_progress: Called with a progress fraction parsed from the log
+        rfd3_bin: rfd3 executable name or path
     """
-    import subprocess
+    from backends.subprocess_runner import run_process
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with span("rdf3.cli.prepare"):
+        run_dir = Path(tempfile.mkdtemp(prefix=f"{config.output_prefix}_", dir=out_dir))
+        inputs_path = _write_inputs(config, run_dir)
+
+    with span("rdf3.cli.compute"):
+        proc = run_process(
+            build_cli_command(config, run_dir, inputs_path, rfd3_bin),
+            cwd=run_dir,
+            timeout=timeout,
+            cancel_event=cancel_event,
+            on_line=on_log,
+            on_progress=on_progress,
+        )
+    if proc.cancelled:
+        raise RuntimeError("Cancelled.")
+    if proc.timed_out:
+        raise TimeoutError(f"rfd3 exceeded the {timeout:g}s time limit.")
+    if proc.returncode != 0:
+        detail = "\n".join(proc.tail[-10:])
+        raise RuntimeError(f"rfd3 exited with code {proc.returncode}:\n{detail}")
 
-    # TODO: Implement subprocess call to rfd3
-    # rfd3 design out_dir=... inputs=...
-    raise NotImplementedError("CLI backend not yet implemented. Use stub for development.")
+    outputs = sorted((run_dir / "outputs").rglob("*.pdb")) + sorted((run_dir / "outputs").rglob("*.cif"))
+    if not outputs:
+        return [RDF3Result(status="failed", error="rfd3 produced no structures")]
+    return [RDF3Result(status="done", output_path=path) for path in outputs]
 
 
 def run_api(config: RDF3Config, api_url: str, api_key: Optional[str] = None) -> list[RDF3Result]:
     """
     Run RDF3 via HTTP API (e.g. Tamarind, custom).
+    Requires aiohttp. For many configs, use backends.api_client.run_api_many,
+    which multiplexes them over one connection pool.
     """
-    import requests
+    from backends.api_client import run_api_many
 
-    # TODO: Implement API submission and result polling
-    raise NotImplementedError("API backend not yet implemented. Use stub for development.")
+    return run_api_many([config], api_url=api_url, api_key=api_key)[0]
 
 
-def run(config: RDF3Config, backend: str = "stub", **kwargs: Any) -> list[RDF3Result]:
-    """
-    Run RDF3 with the specified backend.
-
-    Args:
-        config: Design configuration
-        backend: "stub" | "cli" | "api"
-        **kwargs: Backend-specific options (out_dir for CLI, api_url for API)
-
-    Returns:
-        List of RDF3Result
-    """
+def _dispatch(config: RDF3Config, backend: str, **kwargs: Any) -> list[RDF3Result]:
     if backend == "stub":
         return run_stub(config)
     if backend == "cli":
-        return run_cli(config, out_dir=kwargs.get("out_dir", Path("/tmp/rdf3_out")))
+        return run_cli(
+            config,
+            out_dir=kwargs.get("out_dir", Path("/tmp/rdf3_out")),
+            timeout=kwargs.get("timeout"),
+            cancel_event=kwargs.get("cancel_event"),
+            on_log=kwargs.get("on_log"),
+            on_progress=kwargs.get("on_progress"),
+        )
     if backend == "api":
         return run_api(
             config,
@@ -105,3 +340,113 @@ def run(config: RDF3Config, backend: str = "stub", **kwargs: Any) -> list[RDF3Re
             api_key=kwargs.get("api_key"),
         )
     raise ValueError(f"Unknown backend: {backend}")
+
+
+def run(
+    config: RDF3Config,
+    backend: str = "stub",
+    cache: Optional["ResultCache"] = None,
+    **kwargs: Any,
+) -> list[RDF3Result]:
+    """
+    Run RDF3 with the specified backend.
+
+    Args:
+        config: Design configuration
+        backend: "stub" | "cli" | "api"
+        cache: Optional result cache consulted before running the backend
+        **kwargs: Backend-specific options (out_dir, timeout, cancel_event,
+            on_log, on_progress for CLI; api_url for API)
+
+    Returns:
+        List of RDF3Result
+    """
+    with span("rdf3.run", backend=backend):
+        try:
+            if cache is None or not cache.cacheable(config):
+                results = _dispatch(config, backend, **kwargs)
+            else:
+                results = cache.get(config, backend)
+                count("portal_cache_requests_total", result="miss" if results is None else "hit")
+                if results is None:
+                    results = _dispatch(config, backend, **kwargs)
+                    cache.put(config, backend, results)
+        except Exception:
+            count("portal_jobs_total", tool="rdf3", backend=backend, status="failed")
+            raise
+    status = "done" if results and all(r.status == "done" for r in results) else "failed"
+    count("portal_jobs_total", tool="rdf3", backend=backend, status=status)
+    return results
+
+
+class RDF3Backend:
+    """
+    backends.base.Backend adapter: requests are RDF3Configs, results their
+    list[RDF3Result]. API configs go to the process-wide client (one
+    connection pool, job limit and rate-limit pause for every caller); stub
+    and CLI batches run one config at a time (the CLI holds a GPU per run).
+
+    Args:
+        backend: "stub" | "cli" | "api"
+        cache: Optional result cache consulted per config
+        **options: Backend-specific options, as for run()
+    """
+
+    def __init__(self, backend: str = "stub", cache: Optional["ResultCache"] = None, **options: Any):
+        from backends.api_client import DEFAULT_MAX_JOBS
+
+        self.backend = backend
+        self.cache = cache
+        self.options = options
+        self.capabilities = {
+            "stub": Capabilities("rdf3.stub", batchable=True, max_batch_size=64, batch_window=0.01),
+            "cli": Capabilities("rdf3.cli", resource_class="gpu"),
+            # The shared client bounds outstanding jobs, so batches need not
+            "api": Capabilities("rdf3.api", batchable=True, max_batch_size=DEFAULT_MAX_JOBS, resource_class="remote",
+                                batch_window=0.05),
+        }.get(backend) or Capabilities(f"rdf3.{backend}")
+
+    def submit(self, config: RDF3Config) -> Future:
+        """
+        Start one API config without blocking (cache hits resolve at once).
+        The future resolves to its results; callers may wait on many at a time.
+        """
+        from backends.api_client import get_shared_client
+
+        if self.backend != "api":
+            raise ValueError(f"submit() is for the API backend, not {self.backend}")
+        cacheable = self.cache is not None and self.cache.cacheable(config)
+        if cacheable:
+            results = self.cache.get(config, "api")
+            count("portal_cache_requests_total", result="miss" if results is None else "hit")
+            if results is not None:
+                future: Future = Future()
+                future.set_result(results)
+                return future
+
+        def finished(future: Future) -> None:
+            results = None if future.exception() else future.result()
+            status = "done" if results and all(r.status == "done" for r in results) else "failed"
+            count("portal_jobs_total", tool="rdf3", backend="api", status=status)
+            if cacheable and results is not None:
+                self.cache.put(config, "api", results)
+
+        future = get_shared_client(self.options.get("api_url", ""), self.options.get("api_key")).submit(config)
+        future.add_done_callback(finished)
+        return future
+
+    def run_batch(self, requests: list[RDF3Config]) -> list:
+        out: list = []
+        if self.backend == "api":
+            for future in [self.submit(config) for config in requests]:
+                try:
+                    out.append(future.result())
+                except Exception as e:
+                    out.append(e)
+            return out
+        for config in requests:
+            try:
+                out.append(run(config, backend=self.backend, cache=self.cache, **self.options))
+            except Exception as e:
+                out.append(e)
+        return out
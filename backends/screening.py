@@ -0,0 +1,348 @@
+"""
+Virtual screening: one receptor against a streamed ligand library.
+
+The receptor is prepared once through the docking GridCache. Library
+records are read lazily from the uploaded SDF's RecordIndex and docked on
+the shared search pool, one ligand per task with a bounded number in
+flight. Each ligand keeps its best K poses, and only the global top-N
+ligands are retained (HitHeap), so memory does not grow with the library.
+
+Progress is checkpointed to disk as the contiguous prefix of screened
+records plus the current hits. Starting a screen with the same receptor,
+box, library and parameters resumes from its checkpoint; records finished
+past the prefix before an interruption are docked again with the same seed,
+and the heap ignores ligands it already holds.
+"""
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, Future, wait
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Literal, Optional
+
+from backends.cache import DEFAULT_CACHE_DIR
+from backends.docking import (
+    DockingEngine,
+    Pose,
+    PreparedReceptor,
+    discard_search_pool,
+    get_search_pool,
+    ligand_molblock,
+    merge_poses,
+)
+from utils.metrics import count, span
+
+SCREEN_DIR = DEFAULT_CACHE_DIR / "docking" / "screens"
+DEFAULT_TOP_K = 3
+DEFAULT_TOP_N = 100
+CHECKPOINT_SECONDS = 10.0
+IN_FLIGHT_PER_WORKER = 2
+# Bump when the checkpoint layout changes
+CHECKPOINT_VERSION = 1
+# Errors from the grids or the pool rather than the ligand: they stop the screen
+# (resumable from its checkpoint) instead of counting the ligand as failed
+INFRASTRUCTURE_ERRORS = (OSError, BrokenExecutor)
+
+ScreenStatus = Literal["running", "stopping", "stopped", "done", "failed"]
+
+
+@dataclass
+class Hit:
+    """A screened ligand and its best poses."""
+
+    index: int  # 0-based record number in the library
+    name: str
+    score: float  # best pose score
+    poses: list[Pose] = field(default_factory=list)
+
+
+@dataclass
+class ScreenProgress:
+    """Snapshot of a screen for display."""
+
+    status: ScreenStatus
+    screened: int  # records 0..screened-1 are finished
+    total: int
+    failed: int
+    hits: list[Hit]  # best first
+    error: Optional[str] = None
+    last_failure: Optional[str] = None
+    rate: Optional[float] = None  # ligands per second in this run
+
+
+class HitHeap:
+    """
+    The best `size` hits by score (lower is better), one entry per ligand.
+
+    Args:
+        size: Hits to keep
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._heap: list[tuple[float, int, Hit]] = []  # (-score, -index, hit): worst hit on top
+        self._indices: set[int] = set()
+
+    def push(self, hit: Hit) -> bool:
+        """Add a hit if it ranks in the top `size`; returns whether it was kept."""
+        if hit.index in self._indices:
+            return False
+        entry = (-hit.score, -hit.index, hit)
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            _, _, dropped = heapq.heapreplace(self._heap, entry)
+            self._indices.discard(dropped.index)
+        else:
+            return False
+        self._indices.add(hit.index)
+        return True
+
+    def ranked(self) -> list[Hit]:
+        """Hits, best first."""
+        return [hit for _, _, hit in sorted(self._heap, key=lambda e: (-e[0], -e[1]))]
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+def screen_key(
+    prepared: PreparedReceptor,
+    library: Path,
+    engine: DockingEngine,
+    exhaustiveness: int,
+    top_k: int,
+    top_n: int,
+    seed: int,
+) -> str:
+    """Identifies a screen for checkpoints: receptor grids, library content and search parameters."""
+    params = f"{exhaustiveness}/{top_k}/{top_n}/{seed}"
+    payload = f"{prepared.key}\n{Path(library).name}\n{engine.name}:{engine.version}\n{params}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _screen_ligand(
+    engine: DockingEngine, grid_dir: Path, record: str, exhaustiveness: int, seed: int, top_k: int
+) -> list[Pose]:
+    """Dock one SDF record (runs in a search pool worker)."""
+    poses = engine.search(grid_dir, ligand_molblock(record.encode(), "sdf"), exhaustiveness, seed, top_k)
+    return merge_poses(poses, top_k)
+
+
+class Screen:
+    """
+    A screen running on a background thread, checkpointed under SCREEN_DIR.
+
+    Args:
+        key: screen_key() of the inputs
+        prepared: Receptor grids from the docking GridCache
+        library: SDF file (in the upload store) to screen
+        engine: Engine the receptor was prepared with
+        exhaustiveness: Search effort per ligand
+        top_k: Poses kept per ligand
+        top_n: Ligands kept overall
+        seed: Search seed, the same for every ligand
+        workers: Ligands docked at once (default: the search pool size)
+    """
+
+    def __init__(
+        self,
+        key: str,
+        prepared: PreparedReceptor,
+        library: Path,
+        engine: DockingEngine,
+        exhaustiveness: int = 8,
+        top_k: int = DEFAULT_TOP_K,
+        top_n: int = DEFAULT_TOP_N,
+        seed: int = 0,
+        workers: Optional[int] = None,
+    ):
+        self.key = key
+        self.prepared = prepared
+        self.library = Path(library)
+        self.engine = engine
+        self.exhaustiveness = exhaustiveness
+        self.top_k = top_k
+        self.seed = seed
+        self.workers = workers
+        self.checkpoint_path = SCREEN_DIR / f"{key}.json"
+        self._heap = HitHeap(top_n)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._status: ScreenStatus = "stopped"
+        self._error: Optional[str] = None
+        self._last_failure: Optional[str] = None
+        self._screened = self._failed = self._total = 0
+        self._started_at = time.monotonic()
+        self._started_from = 0
+        self._load_checkpoint()
+
+    # ------------------------------------------------------------ control
+
+    def start(self) -> None:
+        """Start (or resume) screening; no-op while already running or done."""
+        with self._lock:
+            if self._status in ("running", "stopping", "done"):
+                return
+            self._status, self._error = "running", None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"screen-{self.key[:8]}", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop after the ligands in flight finish; progress is checkpointed."""
+        with self._lock:
+            if self._status == "running":
+                self._status = "stopping"
+        self._stop.set()
+
+    def progress(self) -> ScreenProgress:
+        with self._lock:
+            elapsed = time.monotonic() - self._started_at
+            done_now = self._screened - self._started_from
+            return ScreenProgress(
+                status=self._status,
+                screened=self._screened,
+                total=self._total,
+                failed=self._failed,
+                hits=self._heap.ranked(),
+                error=self._error,
+                last_failure=self._last_failure,
+                rate=done_now / elapsed if self._status == "running" and elapsed > 0 and done_now else None,
+            )
+
+    # -------------------------------------------------------- checkpoints
+
+    def _load_checkpoint(self) -> None:
+        try:
+            state = json.loads(self.checkpoint_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return
+        if state.get("version") != CHECKPOINT_VERSION:
+            return
+        self._screened, self._failed, self._total = state["screened"], state["failed"], state["total"]
+        for hit in state["hits"]:
+            hit["poses"] = [Pose(**pose) for pose in hit["poses"]]
+            self._heap.push(Hit(**hit))
+        if state["done"]:
+            self._status = "done"
+
+    def _save_checkpoint(self, done: bool = False) -> None:
+        with self._lock:
+            state = {
+                "version": CHECKPOINT_VERSION,
+                "screened": self._screened,
+                "failed": self._failed,
+                "total": self._total,
+                "done": done,
+                "hits": [asdict(hit) for hit in self._heap.ranked()],
+            }
+        SCREEN_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_name(f"{self.checkpoint_path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_text(json.dumps(state))
+        tmp.replace(self.checkpoint_path)
+
+    # ------------------------------------------------------------- runner
+
+    def _run(self) -> None:
+        from utils.record_index import RecordIndex, sdf_title
+
+        pending: dict[Future, tuple[int, str]] = {}
+        try:
+            with (
+                RecordIndex(self.library, "sdf") as records,
+                self.prepared.pinned(),
+                span("docking.screen", engine=self.engine.name),
+            ):
+                pool = get_search_pool()
+                window = IN_FLIGHT_PER_WORKER * (self.workers or os.cpu_count() or 1)
+                with self._lock:
+                    self._total = len(records)
+                    self._started_at, self._started_from = time.monotonic(), self._screened
+                next_index = self._screened
+                finished: dict[int, bool] = {}  # results past the prefix: index -> failed
+                last_checkpoint = time.monotonic()
+                while True:
+                    while not self._stop.is_set() and next_index < len(records) and len(pending) < window:
+                        record = records[next_index]
+                        future = pool.submit(
+                            _screen_ligand,
+                            self.engine,
+                            self.prepared.grid_dir,
+                            record,
+                            self.exhaustiveness,
+                            self.seed,
+                            self.top_k,
+                        )
+                        pending[future] = (next_index, sdf_title(record) or f"ligand_{next_index + 1}")
+                        next_index += 1
+                    if not pending:
+                        break
+                    done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, name = pending.pop(future)
+                        error = future.exception()
+                        if isinstance(error, INFRASTRUCTURE_ERRORS):
+                            raise error
+                        poses = [] if error else future.result()
+                        with self._lock:
+                            if poses:
+                                self._heap.push(Hit(index, name, poses[0].score, poses))
+                            else:
+                                self._last_failure = f"{name}: {error or 'no poses found'}"
+                            finished[index] = not poses
+                            while self._screened in finished:
+                                self._failed += finished.pop(self._screened)
+                                self._screened += 1
+                        count("portal_batch_rows_total", status="done" if poses else "failed")
+                    if time.monotonic() - last_checkpoint > CHECKPOINT_SECONDS:
+                        self._save_checkpoint()
+                        last_checkpoint = time.monotonic()
+            complete = self._screened >= self._total
+            self._save_checkpoint(done=complete)
+            with self._lock:
+                self._status = "done" if complete else "stopped"
+        except Exception as e:
+            for future in pending:
+                future.cancel()
+            if isinstance(e, BrokenExecutor):
+                discard_search_pool()
+            with self._lock:
+                self._status, self._error = "failed", f"{type(e).__name__}: {e}"
+            self._save_checkpoint()
+
+
+_screens: dict[str, Screen] = {}
+_screens_lock = threading.Lock()
+
+
+def get_screen(key: str) -> Optional[Screen]:
+    """Return the screen with this key if one was opened in this process."""
+    with _screens_lock:
+        return _screens.get(key)
+
+
+def open_screen(
+    prepared: PreparedReceptor,
+    library: Path,
+    engine: DockingEngine,
+    exhaustiveness: int = 8,
+    top_k: int = DEFAULT_TOP_K,
+    top_n: int = DEFAULT_TOP_N,
+    seed: int = 0,
+) -> Screen:
+    """
+    Return the process-wide Screen for these inputs, loading its checkpoint
+    if one exists; call start() to run or resume it.
+    """
+    key = screen_key(prepared, library, engine, exhaustiveness, top_k, top_n, seed)
+    with _screens_lock:
+        if key not in _screens:
+            _screens[key] = Screen(key, prepared, library, engine, exhaustiveness, top_k, top_n, seed)
+        return _screens[key]
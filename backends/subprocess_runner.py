@@ -0,0 +1,185 @@
+"""
+Local subprocess execution for CLI backends.
+
+Runs commands in their own process group, bounded by a shared slot count,
+streams merged stdout/stderr line by line to a callback, parses progress
+lines, and enforces wall-clock timeouts and cancellation by killing the
+whole process tree.
+"""
+import os
+import queue
+import re
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+LineCallback = Callable[[str], None]
+ProgressCallback = Callable[[float], None]
+
+DEFAULT_SLOTS = 2
+KILL_GRACE_SECONDS = 5.0
+LOG_TAIL_LINES = 50
+
+# "12/50", "design 3 of 10", "45%", "progress: 0.45"
+_PROGRESS_PATTERNS = (
+    (re.compile(r"(\d+)\s*(?:/|of)\s*(\d+)"), lambda m: int(m[1]) / int(m[2]) if int(m[2]) else None),
+    (re.compile(r"(\d+(?:\.\d+)?)\s*%"), lambda m: float(m[1]) / 100),
+    (re.compile(r"progress[:=\s]+(\d*\.\d+|[01])\b", re.IGNORECASE), lambda m: float(m[1])),
+)
+
+_slots = threading.BoundedSemaphore(DEFAULT_SLOTS)
+_slot_count = DEFAULT_SLOTS
+_slots_lock = threading.Lock()
+
+
+def set_slot_count(slots: int) -> None:
+    """
+    Set how many CLI processes may run at once (affects later acquisitions).
+    Set from the cli_slots secret by init_page and from the worker's --cli-slots.
+    """
+    global _slots, _slot_count
+    slots = max(1, slots)
+    with _slots_lock:
+        if slots != _slot_count:  # called on every rerun; keep the semaphore (and its holders) if unchanged
+            _slots = threading.BoundedSemaphore(slots)
+            _slot_count = slots
+
+
+def parse_progress(line: str) -> Optional[float]:
+    """Extract a progress fraction in [0, 1] from a log line, if it has one."""
+    for pattern, convert in _PROGRESS_PATTERNS:
+        match = pattern.search(line)
+        if match:
+            value = convert(match)
+            if value is not None and 0.0 <= value <= 1.0:
+                return value
+    return None
+
+
+@dataclass
+class ProcessResult:
+    """Outcome of a run_process call."""
+
+    returncode: Optional[int]
+    timed_out: bool = False
+    cancelled: bool = False
+    tail: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and not self.cancelled
+
+
+def _kill_tree(proc: subprocess.Popen) -> None:
+    """SIGTERM the process group, then SIGKILL whatever survives the grace period."""
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        proc.wait(timeout=KILL_GRACE_SECONDS)
+    except subprocess.TimeoutExpired:
+        pass
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    proc.wait()
+
+
+def _pump(stream, lines: queue.Queue) -> None:
+    for line in stream:
+        lines.put(line.rstrip("\n"))
+    lines.put(None)
+
+
+def run_process(
+    cmd: Sequence[str],
+    cwd: Optional[Path] = None,
+    timeout: Optional[float] = None,
+    cancel_event: Optional[threading.Event] = None,
+    on_line: Optional[LineCallback] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    env: Optional[dict[str, str]] = None,
+) -> ProcessResult:
+    """
+    Run a command in a process slot, streaming its output.
+
+    Args:
+        cmd: Command and arguments
+        cwd: Working directory
+        timeout: Wall-clock limit in seconds, including time waiting for a slot
+        cancel_event: Set from another thread to kill the process tree
+        on_line: Called with each output line (stdout and stderr merged)
+        on_progress: Called with a fraction whenever a line reports progress
+        env: Environment for the child (defaults to the current one)
+
+    Returns:
+        ProcessResult with return code, timeout/cancel flags and the log tail
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    tail: deque[str] = deque(maxlen=LOG_TAIL_LINES)
+    slots = _slots
+
+    while not slots.acquire(timeout=0.2):
+        if cancel_event is not None and cancel_event.is_set():
+            return ProcessResult(None, cancelled=True)
+        if deadline is not None and time.monotonic() >= deadline:
+            return ProcessResult(None, timed_out=True)
+
+    try:
+        proc = subprocess.Popen(
+            list(cmd),
+            cwd=cwd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            errors="replace",
+            bufsize=1,
+            start_new_session=True,
+        )
+        lines: queue.Queue = queue.Queue()
+        reader = threading.Thread(target=_pump, args=(proc.stdout, lines), daemon=True)
+        reader.start()
+
+        timed_out = cancelled = False
+        try:
+            while True:
+                try:
+                    line = lines.get(timeout=0.2)
+                except queue.Empty:
+                    line = ""
+                if line is None:
+                    break
+                if line:
+                    tail.append(line)
+                    if on_line:
+                        on_line(line)
+                    if on_progress:
+                        fraction = parse_progress(line)
+                        if fraction is not None:
+                            on_progress(fraction)
+                if cancel_event is not None and cancel_event.is_set():
+                    cancelled = True
+                elif deadline is not None and time.monotonic() >= deadline:
+                    timed_out = True
+                if cancelled or timed_out:
+                    _kill_tree(proc)
+                    break
+        except BaseException:
+            # A raising callback (or KeyboardInterrupt) must not leave the tree running unattended
+            _kill_tree(proc)
+            raise
+
+        returncode = proc.wait()
+        reader.join(timeout=1)
+        return ProcessResult(returncode, timed_out=timed_out, cancelled=cancelled, tail=list(tail))
+    finally:
+        slots.release()
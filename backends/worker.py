@@ -0,0 +1,198 @@
+"""
+Worker daemon that runs queued design jobs outside the web server.
+
+Claims jobs from the broker with a visibility-timeout lease, heartbeats
+while running them through backends.rdf3 (stub, CLI or API runners) and
+writes status, progress, logs and results to the shared job database.
+Jobs whose worker dies are re-delivered once their lease expires; after
+max_attempts deliveries they are failed. A worker whose lease lapses
+stops its run and leaves the job to the worker it was re-delivered to.
+Cancellation requested from the
+web tier is picked up on the next heartbeat.
+
+Start any number of workers against the same queue and job database:
+
+    PORTAL_JOB_QUEUE=sqlite python -m backends.worker --concurrency 2
+
+Credentials are never queued; API keys are read from the environment
+(RDF3_API_KEY by default).
+
+SIGINT/SIGTERM stops claiming and waits for running jobs; a second
+signal exits at once, leaving their leases to expire.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from backends.broker import DEFAULT_QUEUE_PATH, DEFAULT_VISIBILITY_TIMEOUT, Broker, Lease, SQLiteBroker, broker_from_env
+from backends.jobs import DEFAULT_DB_PATH, JobRegistry, decode_payload
+from backends.subprocess_runner import DEFAULT_SLOTS, set_slot_count
+from utils.metrics import count, record, start_exporter
+
+logger = logging.getLogger("portal.worker")
+
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 5.0
+
+
+class Worker:
+    """
+    Pulls jobs from a broker and runs them with a JobRegistry.
+
+    Args:
+        registry: Registry on the job database shared with the web tier
+        broker: Queue to consume
+        concurrency: Jobs run at the same time
+        visibility_timeout: Lease length; heartbeats renew it every third of this
+        poll_interval: Sleep between claims when the queue is empty
+        max_attempts: Deliveries after which a job is failed instead of run again
+        options: Backend options added to every job (credentials, out_dir, timeout)
+    """
+
+    def __init__(
+        self,
+        registry: JobRegistry,
+        broker: Broker,
+        concurrency: int = 1,
+        visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT,
+        poll_interval: float = 1.0,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        options: Optional[dict] = None,
+    ):
+        self.registry = registry
+        self.broker = broker
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.options = options or {}
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.stop_event = threading.Event()
+
+    def run_once(self) -> bool:
+        """Claim and run one job. Returns False if the queue was empty."""
+        lease = self.broker.claim(self.worker_id, self.visibility_timeout)
+        if lease is None:
+            return False
+        self._process(lease)
+        return True
+
+    def run(self) -> None:
+        """Run jobs on `concurrency` threads until stop_event is set, then wait for them."""
+        threads = [
+            threading.Thread(target=self._loop, name=f"worker-{i}", daemon=True) for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+
+    def _loop(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                if not self.run_once():
+                    self.stop_event.wait(self.poll_interval)
+            except Exception:
+                logger.exception("Worker loop error")
+                self.stop_event.wait(RETRY_DELAY_SECONDS)
+
+    def _process(self, lease: Lease) -> None:
+        try:
+            config, backend, options = decode_payload(lease.payload)
+        except ValueError as e:
+            # Retrying cannot fix a payload that does not decode; fail it rather than re-deliver it forever
+            logger.error("Job %s has an invalid payload: %s", lease.job_id, e)
+            self.registry.fail(lease.job_id, f"Invalid job payload: {e}")
+            self.broker.ack(lease)
+            count("portal_jobs_total", tool="rdf3", backend="unknown", status="failed")
+            return
+        if lease.attempts > self.max_attempts:
+            logger.warning("Job %s failed after %d deliveries", lease.job_id, lease.attempts - 1)
+            self.registry.fail(lease.job_id, f"Worker lost {lease.attempts - 1} times; giving up.")
+            self.broker.ack(lease)
+            count("portal_jobs_total", tool="rdf3", backend=backend, status="abandoned")
+            return
+
+        record("job.queue", time.time() - lease.enqueued_at)
+        logger.info("Running job %s (%s, attempt %d)", lease.job_id, backend, lease.attempts)
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(lease, done), daemon=True)
+        heartbeat.start()
+        try:
+            self.registry.run_job(lease.job_id, config, backend, {**options, **self.options}, inline_outputs=True)
+        except Exception:
+            # Backend errors are recorded by run_job; this is e.g. the database being unavailable
+            logger.exception("Job %s could not be run; re-queueing", lease.job_id)
+            self.broker.release(lease, delay=RETRY_DELAY_SECONDS)
+            return
+        finally:
+            done.set()
+            heartbeat.join()
+        self.broker.ack(lease)
+        logger.info("Finished job %s", lease.job_id)
+
+    def _heartbeat(self, lease: Lease, done: threading.Event) -> None:
+        while not done.wait(self.visibility_timeout / 3):
+            if not self.broker.heartbeat(lease, self.visibility_timeout):
+                # Another worker may already be running it; stop here and leave the outcome to that one
+                logger.warning("Lost lease on job %s; stopping it", lease.job_id)
+                self.registry.abandon(lease.job_id)
+                return
+            if self.registry.cancel_requested(lease.job_id):
+                self.registry.cancel(lease.job_id)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help="Job database shared with the web tier")
+    parser.add_argument("--queue", type=Path, help=f"SQLite queue file (default: $PORTAL_JOB_QUEUE or {DEFAULT_QUEUE_PATH})")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--visibility-timeout", type=float, default=DEFAULT_VISIBILITY_TIMEOUT)
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    parser.add_argument("--out-dir", type=Path, help="Run directory for the CLI backend")
+    parser.add_argument("--timeout", type=float, help="Wall-clock limit per CLI job, in seconds")
+    parser.add_argument("--cli-slots", type=int, help=f"CLI processes run at once (default: {DEFAULT_SLOTS})")
+    parser.add_argument("--api-key-env", default="RDF3_API_KEY", help="Environment variable holding the API key")
+    parser.add_argument("--metrics-port", type=int, help="Serve /metrics on this port")
+    args = parser.parse_args(argv)
+
+    if args.cli_slots:
+        set_slot_count(args.cli_slots)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    broker = SQLiteBroker(args.queue) if args.queue else (broker_from_env() or SQLiteBroker())
+    options = {"out_dir": args.out_dir, "timeout": args.timeout, "api_key": os.environ.get(args.api_key_env)}
+    worker = Worker(
+        JobRegistry(args.db, recover_orphans=False),
+        broker,
+        concurrency=args.concurrency,
+        visibility_timeout=args.visibility_timeout,
+        max_attempts=args.max_attempts,
+        options={k: v for k, v in options.items() if v is not None},
+    )
+    if args.metrics_port:
+        start_exporter(port=args.metrics_port, host="0.0.0.0")
+
+    def stop(signum, frame) -> None:
+        if worker.stop_event.is_set():
+            sys.exit(1)
+        logger.info("Stopping; waiting for running jobs (signal again to exit now)")
+        worker.stop_event.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    logger.info("Worker %s consuming %s", worker.worker_id, getattr(broker, "path", broker))
+    worker.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
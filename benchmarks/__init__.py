@@ -0,0 +1,6 @@
+"""
+Micro-benchmarks for the portal's hot paths.
+
+Run headless with `python -m benchmarks`; see benchmarks/__main__.py for
+options, including JSON output and comparison against a stored baseline.
+"""
@@ -0,0 +1,71 @@
+"""
+Run the benchmark suite headless.
+
+Usage:
+    python -m benchmarks [--quick] [--filter NAME] [--repeat N]
+                         [--out results.json] [--compare baseline.json] [--threshold 0.2]
+
+Writes results as JSON with --out. With --compare, median times are
+checked against a stored results file and the exit status is 1 if any
+case is slower by more than --threshold with no overlap between its
+min/max range and the baseline's; slower medians within that noise are
+listed as "noisy".
+"""
+import argparse
+import json
+import logging
+import shutil
+import sys
+from pathlib import Path
+
+from benchmarks import cases
+from benchmarks.harness import DEFAULT_REPEAT, DEFAULT_THRESHOLD, REGISTRY, compare, run_case, write_results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Smallest sizes only")
+    parser.add_argument("--filter", default="", help="Only cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed samples per case")
+    parser.add_argument("--out", type=Path, help="Write results JSON here")
+    parser.add_argument("--compare", type=Path, help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Regression threshold (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    # Components run in Streamlit bare mode; silence its missing-context warnings
+    logging.disable(logging.WARNING)
+
+    results = []
+    try:
+        for bench in REGISTRY:
+            if args.filter not in bench.name:
+                continue
+            params = (bench.quick_params or bench.params[:1]) if args.quick else bench.params
+            for param in params:
+                result = run_case(bench, param, args.repeat)
+                case = result.to_dict()
+                print(
+                    f"{result.key:36} median {case['median_s'] * 1000:10.2f} ms"
+                    f"  min {case['min_s'] * 1000:10.2f} ms  {case['per_item_us']:10.2f} us/item",
+                    flush=True,
+                )
+                results.append(result)
+    finally:
+        shutil.rmtree(cases.WORK_DIR, ignore_errors=True)
+
+    if args.out:
+        write_results(results, args.out)
+    if not args.compare:
+        return 0
+
+    current = {"results": {r.key: r.to_dict() for r in results}}
+    rows = compare(current, json.loads(args.compare.read_text()), args.threshold)
+    print(f"\nCompared with {args.compare} (threshold +{args.threshold:.0%}):")
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else "noisy" if row["noisy"] else "ok"
+        print(f"{flag:10} {row['case']:36} {row['baseline_s'] * 1000:10.2f} -> {row['current_s'] * 1000:10.2f} ms ({row['ratio']:.2f}x)")
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
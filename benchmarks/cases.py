@@ -0,0 +1,155 @@
+"""
+Benchmark cases. Inputs are synthesized in setup, so no fixtures are needed.
+"""
+import io
+import tempfile
+from pathlib import Path
+
+from benchmarks.harness import benchmark
+
+WORK_DIR = Path(tempfile.mkdtemp(prefix="portal_bench_"))
+
+
+class _Upload(io.BytesIO):
+    """Stand-in for a Streamlit UploadedFile."""
+
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+
+
+def synthetic_pdb(n_atoms: int) -> str:
+    """Backbone-only PDB text with n_atoms atoms (N, CA, C, O per residue)."""
+    names = ("N", "CA", "C", "O")
+    lines = []
+    for i in range(n_atoms):
+        res = i // 4
+        chain = "ABCDEFGHIJ"[(res // 9999) % 10]
+        x, y, z = (res * 3.8) % 999, (i % 4) * 1.2, (res // 250) * 1.5
+        lines.append(
+            f"ATOM  {(i + 1) % 100000:5d} {names[i % 4]:^4} ALA {chain}{res % 9999 + 1:4d}    "
+            f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00           {names[i % 4][0]:>2}"
+        )
+    return "\n".join(lines) + "\nEND\n"
+
+
+def _batch_frame(rows: int):
+    import pandas as pd
+
+    return pd.DataFrame(
+        {
+            "id": [f"row_{i}" for i in range(rows)],
+            "output_prefix": [f"design_{i}" for i in range(rows)],
+            "num_designs": [1 + i % 4 for i in range(rows)],
+            "sequence": ["MKVLWAALLVTFLAGCQA"] * rows,
+        }
+    )
+
+
+def _batch_file(rows: int, fmt: str) -> Path:
+    path = WORK_DIR / f"batch_{rows}.{fmt}"
+    if not path.exists():
+        df = _batch_frame(rows)
+        if fmt == "csv":
+            df.to_csv(path, index=False)
+        else:
+            df.to_excel(path, index=False)
+    return path
+
+
+# --------------------------------------------------------------------- zip
+
+
+@benchmark("build_zip", params=[100, 1_000, 10_000], quick_params=[100], items=lambda n: n)
+def bench_build_zip(n: int):
+    from utils.helpers import build_zip
+
+    pdb = synthetic_pdb(400)
+    entries = [(f"design_{i}.pdb", pdb) for i in range(n)]
+    return lambda: build_zip(entries)
+
+
+# ------------------------------------------------------------ batch input
+
+
+@benchmark("parse_batch_csv.csv", params=[1_000, 10_000, 100_000], quick_params=[1_000], items=lambda n: n)
+def bench_parse_batch_csv(rows: int):
+    from utils.helpers import parse_batch_csv
+
+    path = _batch_file(rows, "csv")
+    return lambda: parse_batch_csv(path)
+
+
+@benchmark("parse_batch_csv.xlsx", params=[1_000, 10_000], quick_params=[1_000], items=lambda n: n)
+def bench_parse_batch_excel(rows: int):
+    from utils.helpers import parse_batch_csv
+
+    path = _batch_file(rows, "xlsx")
+    return lambda: parse_batch_csv(path)
+
+
+@benchmark("parse_batch_file.csv", params=[1_000, 10_000, 100_000], quick_params=[1_000], items=lambda n: n)
+def bench_parse_batch_file_csv(rows: int):
+    from components.batch_panel import parse_batch_file
+
+    data = _batch_file(rows, "csv").read_bytes()
+    return lambda: parse_batch_file(_Upload(data, "batch.csv"))
+
+
+@benchmark("parse_batch_file.xlsx", params=[1_000, 10_000], quick_params=[1_000], items=lambda n: n)
+def bench_parse_batch_file_excel(rows: int):
+    from components.batch_panel import parse_batch_file
+
+    data = _batch_file(rows, "xlsx").read_bytes()
+    return lambda: parse_batch_file(_Upload(data, "batch.xlsx"))
+
+
+# ----------------------------------------------------------- batch panel
+
+
+def _noop_row(row: dict) -> dict:
+    return {"status": "done", "output": None}
+
+
+@benchmark("batch_panel_noop", params=[100, 1_000, 10_000], quick_params=[100], items=lambda n: n)
+def bench_batch_panel(rows: int):
+    from components.batch_panel import batch_panel
+
+    df = _batch_frame(rows)
+    mapping = {"id": "id", "output_prefix": "output_prefix"}
+    return lambda: batch_panel(df, mapping, _noop_row, key_prefix="bench")
+
+
+# ------------------------------------------------------------ rdf3.run
+
+
+@benchmark("rdf3_run_stub", params=["no_cache", "cache_hit"], quick_params=["no_cache", "cache_hit"], items=lambda p: 1_000)
+def bench_rdf3_run(mode: str):
+    from backends.cache import DiskCache, ResultCache
+    from backends.rdf3 import RDF3Config, run
+
+    config = RDF3Config(output_prefix="bench", num_designs=1, seed=7)
+    cache = ResultCache(DiskCache(WORK_DIR / "cache")) if mode == "cache_hit" else None
+    run(config, backend="stub", cache=cache)
+
+    def calls():
+        for _ in range(1_000):
+            run(config, backend="stub", cache=cache)
+
+    return calls
+
+
+# ------------------------------------------------------- structure viewer
+
+
+@benchmark("viewer_payload", params=[1_000, 20_000, 120_000], quick_params=[1_000], items=lambda n: n)
+def bench_viewer_payload(n_atoms: int):
+    import hashlib
+
+    from components.structure_viewer import LOD_ATOM_THRESHOLD, _viewer_html
+
+    text = synthetic_pdb(n_atoms)
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    # Uncached build: parse, level of detail, slim PDB and viewer HTML
+    build = _viewer_html.__wrapped__
+    return lambda: build(digest, text, "cartoon", 800, 500, False, LOD_ATOM_THRESHOLD)
@@ -0,0 +1,159 @@
+"""
+Benchmark registry, timing and baseline comparison.
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+# Median slowdown (fraction) above which a case counts as a regression
+DEFAULT_THRESHOLD = 0.20
+# Timed samples per case; enough for a stable median and a meaningful min/max range
+DEFAULT_REPEAT = 15
+
+
+@dataclass
+class Benchmark:
+    """
+    One benchmark case family.
+
+    Args:
+        name: Case name; each param produces "<name>[<param>]"
+        setup: Called once per param (untimed); returns the zero-argument callable to time
+        params: Sizes (or other labels) to run
+        quick_params: Subset used with --quick (defaults to the first param)
+        items: Maps a param to the number of items one call processes, for per-item times
+    """
+
+    name: str
+    setup: Callable[[Any], Callable[[], Any]]
+    params: list
+    quick_params: Optional[list] = None
+    items: Callable[[Any], int] = lambda param: 1
+
+
+REGISTRY: list[Benchmark] = []
+
+
+def benchmark(name: str, params: list, quick_params: Optional[list] = None, items=None):
+    """Register a setup function as a benchmark (see Benchmark)."""
+
+    def decorator(setup: Callable[[Any], Callable[[], Any]]):
+        REGISTRY.append(Benchmark(name, setup, params, quick_params, items or (lambda param: 1)))
+        return setup
+
+    return decorator
+
+
+@dataclass
+class CaseResult:
+    name: str
+    param: Any
+    items: int
+    samples: list[float] = field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.param}]"
+
+    def to_dict(self) -> dict:
+        median = statistics.median(self.samples)
+        return {
+            "name": self.name,
+            "param": self.param,
+            "items": self.items,
+            "repeat": len(self.samples),
+            "min_s": min(self.samples),
+            "max_s": max(self.samples),
+            "median_s": median,
+            "mean_s": statistics.fmean(self.samples),
+            "stdev_s": statistics.stdev(self.samples) if len(self.samples) > 1 else 0.0,
+            "per_item_us": median / max(self.items, 1) * 1e6,
+        }
+
+
+def run_case(bench: Benchmark, param: Any, repeat: int, warmup: int = 1) -> CaseResult:
+    """Time one param: warmup calls, then repeat samples with GC disabled while timing."""
+    fn = bench.setup(param)
+    result = CaseResult(bench.name, param, bench.items(param))
+    for _ in range(warmup):
+        fn()
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            result.samples.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return result
+
+
+def environment() -> dict:
+    """Machine and revision info recorded with every result file."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def write_results(results: list[CaseResult], path: Path) -> None:
+    payload = {"environment": environment(), "results": {r.key: r.to_dict() for r in results}}
+    Path(path).write_text(json.dumps(payload, indent=2) + "\n")
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list[dict]:
+    """
+    Compare median times per case.
+
+    A case regresses only if its median is more than threshold slower and its
+    fastest sample is slower than the baseline's slowest, so a slowdown within
+    run-to-run noise (overlapping min/max ranges) is not reported as one.
+    Baselines written before max_s was recorded are compared by median only.
+
+    Args:
+        current: {"results": {key: case dict}} as written by write_results
+        baseline: Same shape, from an earlier run
+        threshold: Fractional slowdown that counts as a regression
+
+    Returns:
+        One row per case present in both, with ratio, a regression flag and
+        a noisy flag (slower median, overlapping ranges)
+    """
+    rows = []
+    for key, case in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        ratio = case["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        slower = ratio > 1 + threshold
+        separated = base.get("max_s") is None or case["min_s"] > base["max_s"]
+        rows.append(
+            {
+                "case": key,
+                "baseline_s": base["median_s"],
+                "current_s": case["median_s"],
+                "ratio": ratio,
+                "regression": slower and separated,
+                "noisy": slower and not separated,
+            }
+        )
+    return rows
@@ -1,15 +1,26 @@
-"""Reusable Streamlit components."""
+"""Reusable Streamlit components.
 
-from . import batch_panel
-from . import file_upload
-from . import result_download
-from . import structure_viewer
-from . import tool_card
+Submodules are imported on first attribute access (PEP 562), so
+`from components import tool_card` does not pull in the heavy
+dependencies of the other components.
+"""
+import importlib
 
 __all__ = [
     "batch_panel",
     "file_upload",
     "result_download",
     "structure_viewer",
+    "timings_panel",
     "tool_card",
 ]
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
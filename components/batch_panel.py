@@ -1,17 +1,25 @@
 """
 Batch workflow panel with progress and per-row status.
 """
-from typing import Callable, Optional
+from typing import TYPE_CHECKING, Callable, Iterator, Optional, Union
 
-import pandas as pd
 import streamlit as st
 
+from utils.batch_engine import DEFAULT_MAX_WORKERS, ExecutorKind, run_batch
+from utils.batch_reader import BatchSource
 
-def parse_batch_file(uploaded_file) -> tuple[Optional[pd.DataFrame], Optional[str]]:
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def parse_batch_file(uploaded_file) -> tuple[Optional["pd.DataFrame"], Optional[str]]:
     """
     Parse uploaded CSV or Excel file.
     Returns (DataFrame, error_message). error_message is None on success.
+    Loads the whole file; use utils.batch_reader.open_batch_upload for large batches.
     """
+    import pandas as pd
+
     if uploaded_file is None:
         return None, None
 
@@ -31,44 +39,79 @@ def parse_batch_file(uploaded_file) -> tuple[Optional[pd.DataFrame], Optional[st
     return df, None
 
 
+def _mapped_chunks(
+    data: Union["pd.DataFrame", BatchSource],
+    column_mapping: dict[str, str],
+) -> Iterator[list[dict]]:
+    chunks = data.iter_chunks() if isinstance(data, BatchSource) else [data]
+    for chunk in chunks:
+        rows = []
+        for _, row in chunk.iterrows():
+            row_dict = {}
+            for batch_col, expected_key in column_mapping.items():
+                if batch_col in chunk.columns:
+                    row_dict[expected_key] = row[batch_col]
+                else:
+                    row_dict[expected_key] = None
+            rows.append(row_dict)
+        yield rows
+
+
 def batch_panel(
-    df: pd.DataFrame,
+    df: Union["pd.DataFrame", BatchSource],
     column_mapping: dict[str, str],
     process_row: Callable[[dict], dict],
     key_prefix: str = "batch",
+    executor: ExecutorKind = "thread",
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: Optional[float] = None,
+    retries: int = 0,
 ) -> list[dict]:
     """
     Run batch processing with progress bar and per-row status.
 
     Args:
-        df: DataFrame from batch file
+        df: DataFrame from batch file, or a BatchSource streamed chunk by chunk
         column_mapping: Map batch columns to expected keys, e.g. {'sequence': 'seq', 'id': 'name'}
         process_row: Function that takes a row dict, returns {'status': 'done'|'failed', 'output': ...}
         key_prefix: Unique prefix for session state keys
+        executor: "thread" for I/O-bound backends, "process" for CPU-bound ones
+            (process_row must then be a picklable module-level function)
+        max_workers: Maximum number of rows processed concurrently
+        timeout: Per-row timeout in seconds (None for no limit)
+        retries: Extra attempts for rows that fail or time out
 
     Returns:
-        List of result dicts, one per row
+        List of result dicts, one per row, in row order
     """
-    results = []
-    total = len(df)
+    import pandas as pd
+
     progress_bar = st.progress(0.0, text="Processing...")
     status_container = st.container()
-
-    for i, row in df.iterrows():
-        row_dict = {}
-        for batch_col, expected_key in column_mapping.items():
-            if batch_col in df.columns:
-                row_dict[expected_key] = row[batch_col]
-            else:
-                row_dict[expected_key] = None
-
-        try:
-            result = process_row(row_dict)
-            results.append(result)
-        except Exception as e:
-            results.append({"status": "failed", "error": str(e), "row": i})
-
-        progress_bar.progress((i + 1) / total, text=f"Processed {i + 1} / {total}")
+    total = df.num_rows if isinstance(df, BatchSource) else len(df)
+
+    results: list[dict] = []
+    for rows in _mapped_chunks(df, column_mapping):
+        offset = len(results)
+
+        def on_progress(done: int, _chunk_total: int) -> None:
+            done += offset
+            progress_bar.progress(min(done / max(total, 1), 1.0), text=f"Processed {done} / {total}")
+
+        chunk_results = run_batch(
+            rows,
+            process_row,
+            executor=executor,
+            max_workers=max_workers,
+            timeout=timeout,
+            retries=retries,
+            on_progress=on_progress,
+        )
+        # Copied, not updated in place: process_row may return shared dicts
+        results.extend(
+            {**r, "row": r["row"] + offset} if r.get("status") == "failed" and "row" in r else r
+            for r in chunk_results
+        )
 
     progress_bar.empty()
 
@@ -1,11 +1,15 @@
 """
 Download helpers for single files and zip archives.
 """
-from typing import Optional
+from pathlib import Path
+from typing import Any, Iterable, Optional, Union
 
 import streamlit as st
 
-from utils.helpers import build_zip
+from utils.archive import build_zip_file
+from utils.session_store import get_session_store
+
+_UNSET = object()
 
 
 def download_button(
@@ -48,25 +52,41 @@ def download_button(
 
 
 def download_zip(
-    entries: list[tuple[str, bytes | str]],
+    entries: Iterable[tuple[str, Union[bytes, str, Path]]],
     zip_filename: str = "results.zip",
     label: str = "Download all (ZIP)",
     key: Optional[str] = None,
+    version: Any = None,
 ) -> None:
     """
-    Create a zip archive and offer it for download.
+    Offer a zip archive for download, built only when the user asks for it.
+
+    A "Prepare ZIP" button builds the archive into the session's directory
+    (deleted with the session); later reruns offer that file until version
+    changes. Pass entries as a generator so nothing is loaded until then;
+    contents may also be paths to files on disk.
 
     Args:
-        entries: List of (filename, content) tuples
+        entries: Iterable of (filename, content) tuples
         zip_filename: Name of the zip file
         label: Button label
         key: Unique Streamlit key
+        version: Identifies the archive's contents; a new value discards the prepared archive
     """
-    zip_bytes = build_zip(entries)
-    st.download_button(
-        label=label,
-        data=zip_bytes,
-        file_name=zip_filename,
-        mime="application/zip",
-        key=key,
-    )
+    key = key or zip_filename
+    path = get_session_store().file_path(f"download_zip/{key}", ".zip")
+    version_key = f"{key}_zip_version"
+    if st.session_state.get(version_key, _UNSET) != version or not path.exists():
+        if not st.button("Prepare ZIP", key=f"{key}_prepare"):
+            return
+        with st.spinner("Building ZIP..."):
+            build_zip_file(entries, path=path)
+        st.session_state[version_key] = version
+    with open(path, "rb") as f:
+        st.download_button(
+            label=label,
+            data=f,
+            file_name=zip_filename,
+            mime="application/zip",
+            key=key,
+        )
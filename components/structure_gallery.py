@@ -0,0 +1,94 @@
+"""
+Paginated gallery of structure thumbnails.
+
+Designs are shown as small PNGs of their CA trace, rendered on the server
+and memoized by content hash, instead of one WebGL viewer per design. Only
+the current page's structures are loaded, and the interactive 3D viewer is
+left to the caller for the one design the user selects.
+"""
+import hashlib
+from typing import Callable, Optional, Union
+
+import streamlit as st
+
+from utils.metrics import span
+
+THUMBNAIL_SIZE = 160
+THUMBNAIL_CACHE_ENTRIES = 1024
+
+
+@st.cache_data(max_entries=THUMBNAIL_CACHE_ENTRIES, show_spinner=False)
+def _thumbnail(digest: str, _data: Union[str, bytes], size: int) -> bytes:
+    """PNG for the structure with this content digest; _data is not hashed by st.cache_data."""
+    from utils.structure import Structure, detect_format
+    from utils.structure_pack import is_packed, unpack
+    from utils.thumbnails import trace_png
+
+    with span("gallery.thumbnail"):
+        if isinstance(_data, bytes) and is_packed(_data):
+            structure = unpack(_data)
+        else:
+            try:
+                structure = Structure.parse(_data, detect_format(_data))
+            except ValueError:  # malformed records: draw an empty thumbnail
+                structure = Structure.parse("END\n")
+        return trace_png(structure, size)
+
+
+def thumbnail(data: Union[str, bytes], size: int = THUMBNAIL_SIZE) -> bytes:
+    """Cached PNG thumbnail of a PDB/mmCIF structure, as text or packed bytes (utils.structure_pack)."""
+    raw = data.encode("utf-8") if isinstance(data, str) else data
+    return _thumbnail(hashlib.sha256(raw).hexdigest(), data, size)
+
+
+def _select(state_key: str, index: int) -> None:
+    st.session_state[state_key] = index
+
+
+def structure_gallery(
+    count: int,
+    load: Callable[[int], tuple[str, Union[str, bytes]]],
+    key: str,
+    page_size: int = 12,
+    columns: int = 4,
+    size: int = THUMBNAIL_SIZE,
+) -> Optional[int]:
+    """
+    Show designs as a paginated grid of thumbnails, each with a View button.
+
+    Args:
+        count: Number of designs
+        load: Returns (label, structure text or packed bytes) for design i; called only for the shown page
+        key: Unique Streamlit key prefix
+        page_size: Thumbnails per page
+        columns: Thumbnails per row
+        size: Thumbnail edge in pixels
+
+    Returns:
+        Index of the selected design (the first one until the user picks another), or None if count is 0
+    """
+    if count == 0:
+        return None
+    selected_key = f"{key}_selected"
+    selected = min(st.session_state.get(selected_key, 0), count - 1)
+    pages = -(-count // page_size)
+    page = 1
+    if pages > 1:
+        page = st.number_input(
+            f"Page (of {pages})", min_value=1, max_value=pages, value=selected // page_size + 1, key=f"{key}_page"
+        )
+    lo = (page - 1) * page_size
+    for row_start in range(lo, min(lo + page_size, count), columns):
+        cells = st.columns(columns)
+        for cell, i in zip(cells, range(row_start, min(row_start + columns, lo + page_size, count))):
+            label, text = load(i)
+            with cell:
+                st.image(thumbnail(text, size), caption=label, width=size)
+                st.button(
+                    "Viewing" if i == selected else "View",
+                    key=f"{key}_view_{i}",
+                    disabled=i == selected,
+                    on_click=_select,
+                    args=(selected_key, i),
+                )
+    return selected
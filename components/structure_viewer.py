@@ -1,45 +1,116 @@
 """
-3D structure viewer using stmol + py3Dmol.
+3D structure viewer using py3Dmol.
+
+Large structures are shown at reduced level of detail (CA trace, or an
+evenly decimated atom set when there are no CA atoms) with full detail on
+demand. Viewer HTML is memoized by content hash, and payloads are reduced
+to the atom fields the renderer uses.
 """
+import hashlib
 from pathlib import Path
-from typing import Literal, Optional, Union
+from typing import TYPE_CHECKING, Literal, Optional, Union
 
-import py3Dmol
 import streamlit as st
-import stmol
+import streamlit.components.v1 as components
+
+from utils.metrics import span
+
+if TYPE_CHECKING:
+    from utils.structure import Structure
 
 Style = Literal["cartoon", "stick", "sphere", "surface"]
 
+LOD_ATOM_THRESHOLD = 20_000
+VIEWER_CACHE_ENTRIES = 64
+
+
+def lod_structure(structure: "Structure", max_atoms: int = LOD_ATOM_THRESHOLD) -> "Structure":
+    """Reduce a structure to its CA trace, or to every k-th atom if it has no CA atoms."""
+    ca = structure[structure.ca_mask]
+    if len(ca):
+        return ca
+    step = -(-len(structure) // max_atoms)
+    return structure[::step]
+
+
+@st.cache_data(max_entries=VIEWER_CACHE_ENTRIES, show_spinner=False)
+def _viewer_html(
+    digest: str,
+    _text: str,
+    style: Style,
+    width: int,
+    height: int,
+    spin: bool,
+    lod_threshold: Optional[int],
+) -> tuple[str, int, int]:
+    """
+    Build viewer HTML for the structure with this content digest.
+
+    Returns (html, total_atoms, shown_atoms). _text is not hashed by
+    st.cache_data; digest identifies it.
+    """
+    import py3Dmol
+
+    from utils.structure import Structure, detect_format
+
+    structure = Structure.parse(_text, detect_format(_text))
+    total = len(structure)
+    style_spec: dict = {style: {}}
+    if lod_threshold is not None and total > lod_threshold:
+        structure = lod_structure(structure, lod_threshold)
+        style_spec = {"cartoon": {"style": "trace"}} if structure.ca_mask.any() else {"sphere": {"scale": 0.5}}
+
+    view = py3Dmol.view(width=width, height=height)
+    view.addModel(structure.to_pdb(slim=True), "pdb")
+    view.setStyle(style_spec)
+    if style != "stick" and structure.record.isin(["HETATM"]).any():
+        view.addStyle({"hetflag": True, "not": {"resn": ["HOH", "WAT"]}}, {"stick": {}})
+    view.zoomTo()
+    if spin:
+        view.spin(True)
+    return view.write_html(), total, len(structure)
+
 
 def structure_viewer(
-    pdb_data: Union[str, bytes, Path],
+    pdb_data: Union[str, bytes, Path, "Structure"],
     style: Style = "cartoon",
     width: int = 800,
     height: int = 500,
     spin: bool = False,
+    lod_threshold: int = LOD_ATOM_THRESHOLD,
+    *,
+    key: str,
 ) -> None:
     """
     Display an interactive 3D molecular structure.
 
     Args:
-        pdb_data: PDB content as string, bytes, or path to file
+        pdb_data: PDB or mmCIF content as string, bytes, path to file, or a Structure
         style: Visualization style - cartoon (protein), stick, sphere, or surface
         width: Viewer width in pixels
         height: Viewer height in pixels
         spin: Whether to auto-rotate the structure
+        lod_threshold: Above this many atoms, show reduced detail until the user asks for more
+        key: Key prefix, unique per viewer on the page, for its Streamlit widgets
     """
-    if isinstance(pdb_data, Path):
+    if isinstance(pdb_data, str):
+        pdb_str = pdb_data
+    elif isinstance(pdb_data, Path):
         pdb_str = pdb_data.read_text()
     elif isinstance(pdb_data, bytes):
         pdb_str = pdb_data.decode("utf-8", errors="replace")
     else:
-        pdb_str = pdb_data
+        pdb_str = pdb_data.to_pdb()
 
-    view = py3Dmol.view(width=width, height=height)
-    view.addModel(pdb_str, "pdb")
-    view.setStyle({style: {}})
-    view.zoomTo()
-    if spin:
-        view.spin(True)
+    digest = hashlib.sha256(pdb_str.encode("utf-8")).hexdigest()
+    toggle_key = f"{key}_full_{digest[:16]}"
+    full_detail = st.session_state.get(toggle_key, False)
 
-    stmol.showmol(view, height=height, width=width)
+    with span("viewer.render"):
+        html, total, shown = _viewer_html(
+            digest, pdb_str, style, width, height, spin, None if full_detail else lod_threshold
+        )
+    components.html(html, height=height, width=width)
+    if shown < total or full_detail:
+        st.caption(f"Showing {shown:,} of {total:,} atoms.")
+        st.toggle("Full detail", key=toggle_key)
@@ -0,0 +1,23 @@
+"""
+Sidebar panel with this session's recent stage timings.
+"""
+import streamlit as st
+
+from utils.metrics import current_session_id, format_seconds, get_metrics
+
+
+def timings_panel(limit: int = 20) -> None:
+    """Show the latest timed stages (upload, run, zip, viewer, ...) of the current session."""
+    spans = get_metrics().recent_spans(session_id=current_session_id(), limit=limit)
+    with st.sidebar.expander("Timings"):
+        if not spans:
+            st.caption("No timed stages yet in this session.")
+            return
+        st.dataframe(
+            [
+                {"stage": s.stage, "time": format_seconds(s.seconds), "ok": s.ok}
+                for s in spans
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
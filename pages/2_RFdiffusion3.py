@@ -1,12 +1,25 @@
 """
 RFdiffusion3 - all-atom protein design (flagship tool).
 """
+import csv
+import io
+import itertools
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Callable, Optional, Union
+
 import streamlit as st
 
-from backends.rdf3 import RDF3Config, RDF3Result, run
-from components import file_upload, result_download, structure_viewer
-from components.batch_panel import parse_batch_file
-from utils.helpers import init_page
+from backends.cache import get_result_cache
+from backends.clustering import DEFAULT_RMSD_THRESHOLD, cluster_results
+from backends.jobs import get_registry
+from backends.rdf3 import RDF3Backend, RDF3Config, RDF3Result, run
+from components import file_upload, result_download, structure_gallery, structure_viewer
+from utils.batch_engine import run_batch
+from utils.batch_reader import BatchSchema, BatchSchemaError, ColumnSpec, open_batch_upload
+from utils.helpers import init_page, save_uploaded_file
+from utils.session_store import get_session_store
+from utils.structure_pack import pack, to_text
 
 st.set_page_config(page_title="RFdiffusion3", page_icon="🧬", layout="wide")
 init_page()
@@ -19,6 +32,233 @@ st.markdown(
 )
 st.divider()
 
+try:
+    RDF3_BACKEND = st.secrets.get("rdf3_backend", "stub")
+    BACKEND_OPTIONS = (
+        {"api_url": st.secrets.get("rdf3_api_url", ""), "api_key": st.secrets.get("rdf3_api_key")}
+        if RDF3_BACKEND == "api"
+        else {}
+    )
+except (FileNotFoundError, AttributeError):
+    RDF3_BACKEND = "stub"
+    BACKEND_OPTIONS = {}
+
+cache_stats = get_result_cache().stats()
+st.sidebar.caption(f"Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+if get_registry().broker is not None:
+    queue_depth = get_registry().broker.depth()
+    st.sidebar.caption(f"Job queue: {queue_depth['ready']} waiting / {queue_depth['leased']} running")
+
+JOB_POLL_SECONDS = 2
+BATCH_MAX_WORKERS = 8
+CLUSTER_TABLE_ROWS = 50
+BATCH_SCHEMA = BatchSchema(
+    [
+        ColumnSpec("output_prefix", "str", required=False),
+        ColumnSpec("id", "str", required=False),
+        ColumnSpec("num_designs", "int", required=False),
+        ColumnSpec("seed", "int", required=False),
+    ]
+)
+
+
+def batch_prefix(row, i: int) -> str:
+    """Output prefix for a batch row: output_prefix, else id, else design_<row>."""
+    import pandas as pd
+
+    for column in ("output_prefix", "id"):
+        value = row.get(column)
+        if value is not None and not pd.isna(value):
+            return str(value)
+    return f"design_{i}"
+
+
+def batch_seed(row, i: int, base_seed: int) -> int:
+    """
+    Seed for a batch row: its seed column, else base_seed + row number. Rows
+    get distinct designs, and resubmitting the batch hits the result cache.
+    """
+    import pandas as pd
+
+    value = row.get("seed")
+    return int(value) if value is not None and not pd.isna(value) else base_seed + i
+
+
+def design_row(row: dict) -> dict:
+    """Run one batch row; returns {'status', 'output': (filename, pdb)} or a failure."""
+    prefix = row["output_prefix"]
+    res_list = run(
+        RDF3Config(output_prefix=prefix, num_designs=1, seed=row["seed"]),
+        backend=RDF3_BACKEND,
+        cache=get_result_cache(),
+        **BACKEND_OPTIONS,
+    )
+    return row_result(prefix, res_list)
+
+
+def row_result(prefix: str, res_list: list[RDF3Result], i: Optional[int] = None) -> dict:
+    """Batch result dict for one row's designs."""
+    pdb_content = res_list[0].read_pdb() if res_list else None
+    if res_list and res_list[0].status == "done" and pdb_content:
+        return {"status": "done", "output": (f"{prefix}.pdb", pdb_content)}
+    error = res_list[0].error if res_list else None
+    failed = {"status": "failed", "error": error or "No structure returned"}
+    return failed if i is None else {**failed, "row": i}
+
+
+def pack_design(text: str) -> Union[str, bytes]:
+    """
+    Packed form of a design for the session store. Text that fails to parse,
+    or parses to no atoms, is kept verbatim (as in results_to_archive).
+    """
+    from utils.structure import Structure
+
+    try:
+        structure = Structure.parse(text)
+    except ValueError:
+        return text
+    return pack(structure) if len(structure) else text
+
+
+def design_rows_api(rows: list[dict], on_progress) -> list[dict]:
+    """
+    Run all batch rows on the process-wide provider client, which every
+    session shares (one connection pool, job limit and rate-limit pause).
+    """
+    backend = RDF3Backend("api", cache=get_result_cache(), **BACKEND_OPTIONS)
+    futures = [
+        backend.submit(RDF3Config(output_prefix=row["output_prefix"], num_designs=1, seed=row["seed"]))
+        for row in rows
+    ]
+    for done, _ in enumerate(as_completed(futures), start=1):
+        on_progress(done, len(rows))
+    batch_results = []
+    for i, (row, future) in enumerate(zip(rows, futures)):
+        try:
+            batch_results.append(row_result(row["output_prefix"], future.result(), i))
+        except Exception as e:
+            batch_results.append({"status": "failed", "error": str(e) or type(e).__name__, "row": i})
+    return batch_results
+
+
+def design_name(res: RDF3Result, i: int) -> str:
+    return res.output_path.name if res.output_path else f"design_{i}.pdb"
+
+
+def cluster_designs(key: str, count: int, load: Callable[[], list[RDF3Result]]) -> Optional[tuple[list[int], str]]:
+    """
+    Optionally reduce designs to one per structural cluster before download.
+
+    Args:
+        key: Unique Streamlit key prefix
+        count: Number of designs
+        load: Returns all designs; called only when clustering is on and not already done for this threshold
+
+    Returns:
+        (indices of the designs to keep, CSV of every design's cluster) when the user turned clustering on, else None
+    """
+    if count < 2 or not st.checkbox(
+        "Keep one design per structural cluster",
+        key=f"{key}_on",
+        help="Designs within the CA RMSD threshold after superposition are grouped; "
+        "the design with the most neighbors represents each group.",
+    ):
+        return None
+    threshold = st.number_input(
+        "Cluster RMSD threshold (Å)",
+        value=DEFAULT_RMSD_THRESHOLD,
+        min_value=0.1,
+        max_value=20.0,
+        step=0.5,
+        key=f"{key}_rmsd",
+    )
+    memo_key = f"{key}_clusters"
+    memo = st.session_state.get(memo_key)
+    if memo is None or memo[:2] != (threshold, count):
+        with st.spinner(f"Clustering {count:,} designs by CA RMSD..."):
+            results = load()
+            names = [design_name(res, i) for i, res in enumerate(results)]
+            clusters = cluster_results(results, threshold)
+        clustered = {i for cluster in clusters for i in cluster.members}
+        # Designs that could not be compared (no CA atoms) are kept as they are
+        keep = sorted([cluster.representative for cluster in clusters] + [i for i in range(count) if i not in clustered])
+        manifest = io.StringIO()
+        writer = csv.writer(manifest)
+        writer.writerow(["design", "representative", "cluster_size"])
+        for cluster in clusters:
+            for i in cluster.members:
+                writer.writerow([names[i], names[cluster.representative], cluster.size])
+        table = [{"representative": names[c.representative], "designs": c.size} for c in clusters[:CLUSTER_TABLE_ROWS]]
+        memo = (threshold, count, keep, manifest.getvalue(), table, len(clusters))
+        st.session_state[memo_key] = memo
+    _, _, keep, manifest, table, n_clusters = memo
+    st.caption(f"{n_clusters:,} cluster(s) at {threshold:g} Å; the ZIP holds {len(keep):,} of {count:,} designs.")
+    st.dataframe(table, use_container_width=True, hide_index=True)
+    return keep, manifest
+
+
+def render_job(job_id: str, poll: bool) -> None:
+    """Show job status and results; re-polls itself while the job is active."""
+
+    @st.fragment(run_every=JOB_POLL_SECONDS if poll else None)
+    def _job_panel() -> None:
+        job = get_registry().get(job_id)
+        if job is None:
+            return
+        if job.active:
+            with st.status(f"Running RFdiffusion3... ({job.status})", expanded=True):
+                st.caption(f"Job ID: {job.job_id}. You can leave or refresh this page.")
+                if job.progress is not None:
+                    st.progress(job.progress, text=f"{job.progress:.0%}")
+                if job.log:
+                    st.code("\n".join(job.log.splitlines()[-20:]), language="text")
+                if st.button("Cancel", key="rdf3_cancel"):
+                    get_registry().cancel(job.job_id)
+            return
+        if poll:
+            # Job just finished: rerun the whole page so polling stops
+            st.rerun()
+        if job.status == "failed":
+            st.error(job.error or "Job failed.")
+            return
+
+        st.subheader("Results")
+        designs = [res for res in job.results if res.status == "done" and res.has_structure()]
+
+        def filename(i: int) -> str:
+            return design_name(designs[i], i)
+
+        selected = structure_gallery.structure_gallery(
+            len(designs),
+            lambda i: (f"Design {i + 1}", designs[i].packed or designs[i].read_pdb()),
+            key=f"rdf3_gallery_{job.job_id}",
+        )
+        if selected is None:
+            return
+        st.markdown(f"**Design {selected + 1}**")
+        structure_viewer.structure_viewer(
+            designs[selected].read_pdb(), style="cartoon", width=700, height=400, key=f"rdf3_viewer_{job.job_id}"
+        )
+        result_download.download_button(
+            data=designs[selected].read_pdb(),
+            label="Download PDB",
+            filename=filename(selected),
+            key=f"rdf3_dl_{selected}",
+        )
+        if len(designs) > 1:
+            reduced = cluster_designs(f"rdf3_cluster_{job.job_id}", len(designs), lambda: designs)
+            keep, manifest = reduced or (range(len(designs)), None)
+            entries = ((filename(i), designs[i].read_pdb()) for i in keep)
+            result_download.download_zip(
+                itertools.chain(entries, [("clusters.csv", manifest)] if manifest else []),
+                zip_filename="rdf3_designs.zip",
+                key="rdf3_zip",
+                version=(job.job_id, tuple(keep)),
+            )
+
+    _job_panel()
+
+
 tab1, tab2 = st.tabs(["Single Design", "Batch Design"])
 
 with tab1:
@@ -42,6 +282,13 @@ with tab1:
     with col_params:
         num_designs = st.number_input("Number of designs", min_value=1, max_value=20, value=1)
         output_prefix = st.text_input("Output prefix", value="design")
+        seed = st.number_input(
+            "Seed (optional)",
+            min_value=0,
+            value=None,
+            placeholder="random",
+            help="Seeded runs are reproducible and reuse cached results; without a seed every run is a new sample.",
+        )
 
     constraints_json = st.text_area(
         "Constraints JSON (optional)",
@@ -52,72 +299,134 @@ with tab1:
 
     if st.button("Run design", type="primary", key="rdf3_run_single"):
         config = RDF3Config(
-            scaffold_pdb=scaffold_file.read() if scaffold_file else None,
-            ligand_sdf=ligand_file.read() if ligand_file else None,
+            scaffold_path=save_uploaded_file(scaffold_file) if scaffold_file else None,
+            ligand_path=save_uploaded_file(ligand_file) if ligand_file else None,
             constraints_json=constraints_json or "{}",
             num_designs=num_designs,
             output_prefix=output_prefix,
+            seed=None if seed is None else int(seed),
         )
-        with st.status("Running RFdiffusion3...", expanded=True) as status:
-            try:
-                results = run(config, backend="stub")
-                status.update(label="Done!", state="complete")
-            except Exception as e:
-                st.error(str(e))
-                results = []
-
-        if results:
-            st.subheader("Results")
-            for i, res in enumerate(results):
-                if res.status == "done" and res.pdb_content:
-                    with st.expander(f"Design {i + 1}"):
-                        structure_viewer.structure_viewer(
-                            res.pdb_content,
-                            style="cartoon",
-                            width=700,
-                            height=400,
-                        )
-                        result_download.download_button(
-                            data=res.pdb_content,
-                            label="Download PDB",
-                            filename=f"{output_prefix}_{i}.pdb",
-                            key=f"rdf3_dl_{i}",
-                        )
+        job_id = get_registry().submit(config, backend=RDF3_BACKEND, **BACKEND_OPTIONS)
+        st.session_state.rdf3_job_id = job_id
+        st.query_params["job"] = job_id
+
+    # Reattach to the last job after reruns, refreshes and reconnects
+    job_id = st.session_state.get("rdf3_job_id") or st.query_params.get("job")
+    job = get_registry().get(job_id)
+    if job is not None:
+        st.session_state.rdf3_job_id = job.job_id
+        render_job(job.job_id, poll=job.active)
 
 with tab2:
     st.subheader("Batch design")
     batch_file = file_upload.batch_file_upload(
         key="rdf3_batch",
         label="Upload CSV or Excel",
-        help_text="Columns: scaffold_pdb (path or inline), output_prefix, num_designs. Or use a template.",
+        help_text="Columns: scaffold_pdb (path or inline), output_prefix, num_designs, seed. Or use a template.",
+    )
+    base_seed = st.number_input(
+        "Base seed",
+        min_value=0,
+        value=0,
+        key="rdf3_batch_seed",
+        help="Rows without a seed column value use base seed + row number; change it for new samples.",
     )
 
     if batch_file:
-        df, err = parse_batch_file(batch_file)
+        source, err = open_batch_upload(batch_file, schema=BATCH_SCHEMA)
         if err:
             st.error(err)
-        elif df is not None:
-            st.dataframe(df.head(10), use_container_width=True, hide_index=True)
-            st.caption(f"Total rows: {len(df)}")
+        elif source is not None:
+            st.dataframe(source.preview(10), use_container_width=True, hide_index=True)
+            st.caption(f"Total rows: {source.num_rows}")
 
             if st.button("Run batch", type="primary", key="rdf3_run_batch"):
-                # Use stub for each row; in real impl, call run() per row
-                entries = []
+                # Designs go to the session store, which spills cold ones to disk
+                store = get_session_store()
+                store.delete_prefix("rdf3_batch/")
+                st.session_state.pop("rdf3_batch_cluster_clusters", None)
+                st.session_state.rdf3_batch_run = st.session_state.get("rdf3_batch_run", 0) + 1
                 progress = st.progress(0.0)
-                for i, row in df.iterrows():
-                    prefix = str(row.get("output_prefix", row.get("id", f"design_{i}")))
-                    config = RDF3Config(output_prefix=prefix, num_designs=1)
-                    res_list = run(config, backend="stub")
-                    if res_list and res_list[0].pdb_content:
-                        entries.append((f"{prefix}.pdb", res_list[0].pdb_content))
-                    progress.progress((i + 1) / len(df), text=f"Processed {i + 1} / {len(df)}")
+                total_rows = source.num_rows
+                processed = failed = 0
+                st.session_state.pop("rdf3_batch_error", None)
+                try:
+                    for chunk in source.iter_chunks():
+                        rows = [
+                            {"output_prefix": batch_prefix(row, i), "seed": batch_seed(row, i, int(base_seed))}
+                            for i, row in chunk.iterrows()
+                        ]
+                        offset = processed
+
+                        def on_progress(done: int, _total: int) -> None:
+                            done += offset
+                            progress.progress(min(done / total_rows, 1.0), text=f"Processed {done} / {total_rows}")
+
+                        if RDF3_BACKEND == "api":
+                            chunk_results = design_rows_api(rows, on_progress)
+                        else:
+                            # Rows in flight are bounded further by the CLI slot count (cli_slots)
+                            chunk_results = run_batch(
+                                rows,
+                                design_row,
+                                max_workers=BATCH_MAX_WORKERS,
+                                retries=1,
+                                on_progress=on_progress,
+                            )
+                        for i, result in enumerate(chunk_results, start=processed):
+                            if result.get("status") == "done":
+                                # Kept packed; converted back to text only for viewing and download
+                                name, text = result["output"]
+                                store.put(f"rdf3_batch/{i:08d}", (name, pack_design(text)))
+                            else:
+                                failed += 1
+                        processed += len(chunk_results)
+                except BatchSchemaError as e:
+                    # Later chunks are only checked when read; keep the designs made so far
+                    st.session_state.rdf3_batch_error = f"Batch stopped after {processed} rows: {e}"
                 progress.empty()
+                st.session_state.rdf3_batch_failed = failed
 
-                if entries:
-                    st.success(f"Generated {len(entries)} designs.")
-                    result_download.download_zip(
-                        entries,
-                        zip_filename="rdf3_batch_results.zip",
-                        label="Download all (ZIP)",
-                        key="rdf3_batch_zip",
-                    )
+    store = get_session_store()
+    entry_keys = sorted(store.keys("rdf3_batch/"))
+
+    def batch_design(key: str) -> tuple[str, str]:
+        name, data = store.get(key)
+        if isinstance(data, str):
+            return name, data
+        return name, to_text(data, "cif" if name.endswith(".cif") else "pdb", name.rsplit(".", 1)[0])
+
+    def batch_result(name: str, data: Union[str, bytes]) -> RDF3Result:
+        if isinstance(data, str):
+            return RDF3Result("done", output_path=Path(name), pdb_content=data)
+        return RDF3Result("done", output_path=Path(name), packed=data)
+
+    if st.session_state.get("rdf3_batch_error"):
+        st.error(st.session_state.rdf3_batch_error)
+    if st.session_state.get("rdf3_batch_failed"):
+        st.warning(f"{st.session_state.rdf3_batch_failed} rows failed.")
+    if entry_keys:
+        st.success(f"Generated {len(entry_keys)} designs.")
+        selected = structure_gallery.structure_gallery(
+            len(entry_keys), lambda i: store.get(entry_keys[i]), key="rdf3_batch_gallery"
+        )
+        if selected is not None:
+            name, pdb_content = batch_design(entry_keys[selected])
+            st.markdown(f"**{name}**")
+            structure_viewer.structure_viewer(
+                pdb_content, style="cartoon", width=700, height=400, key="rdf3_batch_viewer"
+            )
+        reduced = cluster_designs(
+            "rdf3_batch_cluster",
+            len(entry_keys),
+            lambda: [batch_result(*store.get(key)) for key in entry_keys],
+        )
+        keep, manifest = reduced or (range(len(entry_keys)), None)
+        entries = (batch_design(entry_keys[i]) for i in keep)
+        result_download.download_zip(
+            itertools.chain(entries, [("clusters.csv", manifest)] if manifest else []),
+            zip_filename="rdf3_batch_results.zip",
+            label="Download all (ZIP)",
+            key="rdf3_batch_zip",
+            version=(st.session_state.get("rdf3_batch_run"), tuple(keep)),
+        )
@@ -1,10 +1,15 @@
 """
-AlphaFold-like - structure prediction (coming soon).
+AlphaFold-like - structure prediction with cached MSAs and features.
 """
 import streamlit as st
 
-from components import file_upload
+from backends.alphafold import HHblitsSearch, StandInSearch, get_feature_cache, predict
+from components import file_upload, result_download, structure_viewer
 from utils.helpers import init_page
+from utils.record_index import open_record_upload, parse_fasta_record
+from utils.session_store import get_session_store
+
+PREVIEW_PAGE_SIZE = 20
 
 st.set_page_config(page_title="AlphaFold-like", page_icon="📐", layout="wide")
 init_page()
@@ -17,16 +22,106 @@ st.markdown(
 )
 st.divider()
 
-st.warning("🚧 Coming soon — Structure prediction will be available in a future release.")
+try:
+    AF_SEARCH = st.secrets.get("alphafold_search", "stand-in")
+    AF_DATABASE = st.secrets.get("alphafold_database", "")
+    AF_CACHE_GB = float(st.secrets.get("alphafold_cache_gb", 20))
+except (FileNotFoundError, AttributeError):
+    AF_SEARCH, AF_DATABASE, AF_CACHE_GB = "stand-in", "", 20.0
+
+if AF_SEARCH != "hhblits":
+    st.info("Using the stand-in MSA search and structure module (no databases configured).")
+try:
+    search = HHblitsSearch(AF_DATABASE) if AF_SEARCH == "hhblits" else StandInSearch()
+    feature_cache = get_feature_cache(search, max_bytes=int(AF_CACHE_GB * 1024**3))
+except FileNotFoundError as e:
+    st.error(str(e))
+    st.stop()
+
+st.sidebar.subheader("Parameters")
+model = st.sidebar.selectbox("Model", ["monomer", "multimer"], key="af_model")
+recycles = st.sidebar.number_input("Number of recycles", value=3, min_value=1, max_value=20)
 
-with st.expander("Preview: Upload and parameters"):
+input_mode = st.radio("Input", ["Paste", "FASTA file"], horizontal=True, key="af_mode")
+records: list[tuple[str, str]] = []
+fasta = None
+if input_mode == "Paste":
+    text = st.text_area(
+        "Sequence or FASTA",
+        placeholder=">chain_A\nMKTAYIAKQRQISFVKSHFSRQ...",
+        height=120,
+        key="af_text",
+    )
+    if text.strip():
+        if text.lstrip().startswith(">"):
+            records = [parse_fasta_record(">" + part) for part in text.lstrip()[1:].split("\n>")]
+        else:
+            records = [("query", text)]
+else:
     seq_file = file_upload.file_upload(
         key="af_seq",
         label="Sequence (FASTA)",
         types=["fasta", "fa", "faa", "fna", "txt"],
-        help_text="Upload FASTA or paste sequence.",
+        help_text="One record per chain (multimer) or per prediction (monomer).",
     )
-    st.sidebar.subheader("Parameters")
-    st.sidebar.selectbox("Model", ["monomer", "multimer"], key="af_model")
-    st.sidebar.number_input("Number of recycles", value=3, min_value=1, max_value=20)
-    st.sidebar.button("Run prediction", disabled=True, help="Coming soon")
+    if seq_file is not None:
+        fasta = open_record_upload(seq_file, "fasta")
+        pages = max(1, -(-len(fasta) // PREVIEW_PAGE_SIZE))
+        st.caption(f"{len(fasta):,} sequences")
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, key="af_seq_page") if pages > 1 else 1
+        lo = (page - 1) * PREVIEW_PAGE_SIZE
+        rows = [parse_fasta_record(record) for record in fasta[lo : lo + PREVIEW_PAGE_SIZE]]
+        st.dataframe(
+            [{"#": lo + i + 1, "header": header, "length": len(seq)} for i, (header, seq) in enumerate(rows)],
+            use_container_width=True,
+            hide_index=True,
+        )
+
+if st.button("Run prediction", type="primary", key="af_run", disabled=not (records or fasta)):
+    with st.status("Running prediction...", expanded=True) as status:
+        try:
+            if fasta is not None:
+                # Parsed only when a prediction runs, not on every rerun of the preview
+                records = [parse_fasta_record(record) for record in fasta]
+            unique = len({"".join(seq.split()).upper() for _, seq in records})
+            st.write(f"Features for {unique} unique sequence(s) of {len(records)} (cached ones are reused)...")
+            predictions = predict(records, feature_cache, multimer=model == "multimer", recycles=int(recycles))
+            get_session_store().put("alphafold/results", predictions)
+            status.update(label=f"Done: {len(predictions)} structure(s)", state="complete")
+        except Exception as e:
+            status.update(label="Failed", state="error")
+            st.error(str(e))
+            get_session_store().delete("alphafold/results")
+
+predictions = get_session_store().get("alphafold/results")
+if predictions:
+    shown = 0
+    if len(predictions) > 1:
+        shown = st.selectbox(
+            "Structure", range(len(predictions)), format_func=lambda i: predictions[i].name, key="af_shown"
+        )
+    structure_viewer.structure_viewer(
+        predictions[shown].pdb, style="cartoon", width=700, height=400, key="af_viewer"
+    )
+    for i, prediction in enumerate(predictions):
+        with st.expander(f"{prediction.name}: mean pLDDT {prediction.plddt:.1f}", expanded=len(predictions) == 1):
+            st.dataframe(
+                [
+                    {"chain": c.chain_id, "length": c.length, "MSA depth": c.msa_depth, "features": c.source}
+                    for c in prediction.chains
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+            result_download.download_button(
+                data=prediction.pdb,
+                label="Download PDB",
+                filename=f"{prediction.name}.pdb",
+                key=f"af_dl_{i}",
+            )
+
+cache_stats = feature_cache.stats()
+st.sidebar.caption(
+    f"Feature cache: {cache_stats['entries']} chains, {cache_stats['bytes'] / 1024**2:.0f} MB, "
+    f"{cache_stats['hits']} hits / {cache_stats['misses']} misses"
+)
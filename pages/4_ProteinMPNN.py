@@ -3,8 +3,10 @@ ProteinMPNN - sequence design for fixed backbones.
 """
 import streamlit as st
 
+from backends.proteinmpnn import MPNNRequest, get_mpnn_client, to_fasta
 from components import file_upload, result_download, structure_viewer
 from utils.helpers import init_page
+from utils.session_store import get_session_store
 
 st.set_page_config(page_title="ProteinMPNN", page_icon="🧪", layout="wide")
 init_page()
@@ -21,6 +23,22 @@ st.sidebar.subheader("Parameters")
 num_seqs = st.sidebar.number_input("Number of sequences", value=8, min_value=1, max_value=64)
 temperature = st.sidebar.slider("Sampling temperature", 0.01, 1.0, 0.1)
 
+try:
+    MPNN_MODEL = st.secrets.get("mpnn_model", "stand-in")
+except (FileNotFoundError, AttributeError):
+    MPNN_MODEL = "stand-in"
+
+# The model lives in a shared server process; this starts it on first use
+mpnn = get_mpnn_client(MPNN_MODEL)
+try:
+    health = mpnn.ensure_running()
+except RuntimeError as e:
+    health = None
+    st.sidebar.error(str(e))
+if health is not None:
+    state = "ready" if health["ready"] else ("failed" if health["error"] else "loading")
+    st.sidebar.caption(f"Model: {health['model']} ({state}), {health['served']} requests served")
+
 pdb_file = file_upload.file_upload(
     key="mpnn_pdb",
     label="Backbone PDB",
@@ -31,26 +49,33 @@ pdb_file = file_upload.file_upload(
 if pdb_file:
     pdb_bytes = pdb_file.read()
     with st.expander("Structure preview"):
-        structure_viewer.structure_viewer(pdb_bytes, style="cartoon", width=700, height=400)
+        structure_viewer.structure_viewer(pdb_bytes, style="cartoon", width=700, height=400, key="mpnn_viewer")
 
     if st.button("Run ProteinMPNN", type="primary", key="mpnn_run"):
         with st.status("Running ProteinMPNN...", expanded=True) as status:
-            st.write("Loading model...")
-            st.write("Designing sequences...")
-            # Placeholder: no backend yet
-            status.update(label="Backend not configured", state="complete")
-
-        st.info(
-            "ProteinMPNN backend not yet integrated. "
-            "Configure the backend in `backends/proteinmpnn.py` to enable."
-        )
-
-        # Example output for UI demo
-        with st.expander("Example output (placeholder)"):
-            st.code(">design_1\nMKVLWAALLVTFLAGCQAKVEQAVETEPEPELRQQTEWQSG", language="text")
-            result_download.download_button(
-                data=">design_1\nMKVLWAALLVTFLAGCQAKVEQAVETEPEPELRQQTEWQSG\n",
-                label="Download FASTA",
-                filename="mpnn_designs.fasta",
-                key="mpnn_dl",
-            )
+            try:
+                if health is None or not health["ready"]:
+                    st.write("Waiting for the model server...")
+                    mpnn.wait_ready()
+                st.write("Designing sequences...")
+                designs = mpnn.design(MPNNRequest(pdb_bytes, num_seqs=int(num_seqs), temperature=float(temperature)))
+                get_session_store().put("mpnn/results", designs)
+                status.update(label=f"Done: {len(designs)} sequences", state="complete")
+            except Exception as e:
+                status.update(label="Failed", state="error")
+                st.error(str(e))
+                get_session_store().delete("mpnn/results")
+
+designs = get_session_store().get("mpnn/results")
+if designs:
+    st.dataframe(
+        [{"name": d.name, "score": d.score, "recovery": d.recovery, "sequence": d.sequence} for d in designs],
+        use_container_width=True,
+        hide_index=True,
+    )
+    result_download.download_button(
+        data=to_fasta(designs),
+        label="Download FASTA",
+        filename="mpnn_designs.fasta",
+        key="mpnn_dl",
+    )
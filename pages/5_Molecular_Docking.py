@@ -1,10 +1,30 @@
 """
-Molecular Docking - protein–ligand or AF2BIND-style docking.
+Molecular Docking - protein–ligand docking with cached receptor grids.
 """
+import os
+
 import streamlit as st
 
+from backends.docking import (
+    Box,
+    DockingResult,
+    complex_pdb,
+    default_box,
+    dock,
+    get_engine,
+    get_grid_cache,
+    ligand_molblock,
+    poses_to_sdf,
+    shard_plan,
+)
+from backends.screening import DEFAULT_TOP_K, DEFAULT_TOP_N, get_screen, open_screen
 from components import file_upload, result_download, structure_viewer
 from utils.helpers import init_page
+from utils.record_index import open_record_upload, sdf_title
+from utils.session_store import get_session_store
+
+SCREEN_POLL_SECONDS = 2
+SCREEN_TABLE_ROWS = 100
 
 st.set_page_config(page_title="Molecular Docking", page_icon="⚗️", layout="wide")
 init_page()
@@ -17,13 +37,43 @@ st.markdown(
 )
 st.divider()
 
+try:
+    DOCK_ENGINE = st.secrets.get("docking_engine", "auto")
+    DOCK_CACHE_GB = float(st.secrets.get("docking_cache_gb", 10))
+except (FileNotFoundError, AttributeError):
+    DOCK_ENGINE, DOCK_CACHE_GB = "auto", 10.0
+
+try:
+    engine = get_engine(DOCK_ENGINE)
+except (RuntimeError, ValueError) as e:
+    st.error(str(e))
+    st.stop()
+if engine.name == "stand-in":
+    st.info("Using the stand-in rigid-body docking engine (install vina and meeko for AutoDock Vina).")
+grid_cache = get_grid_cache(max_bytes=int(DOCK_CACHE_GB * 1024**3))
+
 st.sidebar.subheader("Parameters")
 docking_mode = st.sidebar.selectbox(
     "Mode",
-    ["Protein–ligand", "Protein–protein (AF2BIND)"],
+    ["Protein–ligand", "Virtual screening", "Protein–protein (AF2BIND)"],
     key="dock_mode",
 )
+screening = docking_mode == "Virtual screening"
 exhaustiveness = st.sidebar.number_input("Search exhaustiveness", value=8, min_value=1, max_value=64)
+if screening:
+    top_k = st.sidebar.number_input(
+        "Poses kept per ligand", value=DEFAULT_TOP_K, min_value=1, max_value=9, key="dock_top_k"
+    )
+    top_n = st.sidebar.number_input("Hits kept", value=DEFAULT_TOP_N, min_value=1, max_value=10_000, key="dock_top_n")
+else:
+    n_poses = st.sidebar.number_input("Poses", value=9, min_value=1, max_value=20, key="dock_n_poses")
+seed = st.sidebar.number_input("Seed", value=0, min_value=0, key="dock_seed")
+# Library conformers have arbitrary coordinates, so a screen's box is always set explicitly
+manual_box = screening or st.sidebar.checkbox(
+    "Set search box manually",
+    key="dock_box_manual",
+    help="By default the box surrounds the ligand's input coordinates, or the whole protein.",
+)
 
 protein_file = file_upload.file_upload(
     key="dock_protein",
@@ -33,26 +83,203 @@ protein_file = file_upload.file_upload(
 )
 ligand_file = file_upload.file_upload(
     key="dock_ligand",
-    label="Ligand (SDF/MOL)",
-    types=["sdf", "mol", "mol2", "pdb"],
-    help_text="Small molecule to dock.",
+    label="Ligand library (SDF)" if screening else "Ligand (SDF/MOL)",
+    types=["sdf"] if screening else ["sdf", "mol", "mol2", "pdb"],
+    help_text="Multi-molecule SDF to screen against the protein." if screening else "Small molecule to dock.",
 )
 
 if protein_file:
     with st.expander("Protein structure preview"):
-        structure_viewer.structure_viewer(protein_file.read(), style="cartoon", width=700, height=400)
+        structure_viewer.structure_viewer(
+            protein_file.read(), style="cartoon", width=700, height=400, key="dock_protein_viewer"
+        )
     protein_file.seek(0)
 
-if st.button("Run docking", type="primary", key="dock_run"):
+ligand = ligands = None
+if ligand_file:
+    ligand_format = ligand_file.name.lower().rsplit(".", 1)[-1]
+    try:
+        if ligand_format in ("sdf", "mol"):
+            ligands = open_record_upload(ligand_file, "sdf")
+            titles = [sdf_title(record) or "(untitled)" for record in ligands[:5]]
+            st.caption(f"{len(ligands):,} ligands: {', '.join(titles)}{' ...' if len(ligands) > 5 else ''}")
+            index = 1
+            if len(ligands) > 1 and not screening:
+                index = st.number_input(
+                    "Ligand to dock (record #)", min_value=1, max_value=len(ligands), key="dock_ligand_index"
+                )
+            ligand = ligand_molblock(ligands[index - 1].encode(), "sdf")
+        else:
+            ligand = ligand_molblock(ligand_file.getvalue(), ligand_format)
+    except ValueError as e:
+        st.error(str(e))
+
+box = None
+if protein_file and ligand:
+    try:
+        auto = default_box(protein_file.getvalue(), None if screening else ligand)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+    if screening:
+        st.sidebar.caption("Set the search box on the binding site; it starts around the whole protein.")
+    if manual_box:
+        center = [
+            st.sidebar.number_input(f"Center {axis}", value=round(v, 2), key=f"dock_center_{axis}", format="%.2f")
+            for axis, v in zip("xyz", auto.center)
+        ]
+        size = [
+            st.sidebar.number_input(
+                f"Size {axis}", value=round(v, 1), min_value=5.0, max_value=40.0, key=f"dock_size_{axis}", format="%.1f"
+            )
+            for axis, v in zip("xyz", auto.size)
+        ]
+        box = Box(tuple(center), tuple(size))
+    else:
+        box = auto
+    st.caption(
+        "Search box: center " + ", ".join(f"{v:.1f}" for v in box.center)
+        + " Å, size " + " × ".join(f"{v:.1f}" for v in box.size) + " Å"
+    )
+
+
+
+def render_screen(key: str, poll: bool) -> None:
+    """Show a screen's progress and ranked hits; re-polls itself while it runs."""
+
+    @st.fragment(run_every=SCREEN_POLL_SECONDS if poll else None)
+    def _screen_panel() -> None:
+        screen = get_screen(key)
+        if screen is None:
+            return
+        progress = screen.progress()
+        running = progress.status in ("running", "stopping")
+        if not running and poll:
+            # Screen just finished or stopped: rerun the whole page so polling stops
+            st.rerun()
+        total = progress.total or 1
+        text = f"{progress.screened:,} / {progress.total:,} ligands screened ({progress.status})"
+        if progress.rate:
+            text += f", {progress.rate:.1f}/s"
+        st.progress(min(progress.screened / total, 1.0), text=text)
+        if progress.failed:
+            st.caption(f"{progress.failed:,} ligand(s) failed; last: {progress.last_failure}")
+        if progress.error:
+            st.error(progress.error)
+        if progress.status == "running" and st.button("Stop", key="dock_screen_stop"):
+            screen.stop()
+        elif progress.status in ("stopped", "failed") and st.button("Resume", key="dock_screen_resume"):
+            screen.start()
+            st.rerun()
+
+        hits = progress.hits
+        if not hits:
+            return
+        st.dataframe(
+            [
+                {"rank": rank, "record": hit.index + 1, "ligand": hit.name, "best score": round(hit.score, 3)}
+                for rank, hit in enumerate(hits[:SCREEN_TABLE_ROWS], start=1)
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+        if len(hits) > SCREEN_TABLE_ROWS:
+            st.caption(f"Showing the top {SCREEN_TABLE_ROWS} of {len(hits)} hits; the download has all of them.")
+        if running:
+            return
+        shown = st.selectbox(
+            "Hit",
+            range(len(hits)),
+            format_func=lambda i: f"#{i + 1} {hits[i].name} ({hits[i].score:.2f})",
+            key="dock_hit",
+        )
+        structure_viewer.structure_viewer(
+            complex_pdb(screen.prepared.receptor_pdb, hits[shown].poses[0]),
+            width=700,
+            height=400,
+            key="dock_hit_viewer",
+        )
+        result_download.download_button(
+            data="".join(poses_to_sdf(hit.poses, hit.name) for hit in hits),
+            label="Download hits (SDF)",
+            filename="screen_hits.sdf",
+            key="dock_screen_dl",
+        )
+
+    _screen_panel()
+
+
+if docking_mode == "Protein–protein (AF2BIND)":
+    st.warning("Protein–protein (AF2BIND) prediction is not available yet.")
+
+elif screening:
+    if st.button("Start screening", type="primary", key="dock_screen_run"):
+        if not protein_file or not ligands:
+            st.warning("Please upload a protein and a ligand library.")
+        elif box is not None:
+            with st.spinner("Preparing receptor and scoring grids..."):
+                prepared, cached = grid_cache.get_or_prepare(protein_file.getvalue(), box, engine)
+            screen = open_screen(prepared, ligands.path, engine, int(exhaustiveness), int(top_k), int(top_n), int(seed))
+            if 0 < screen.progress().screened < len(ligands):
+                st.info(f"Resuming from the checkpoint at {screen.progress().screened:,} ligands.")
+            screen.start()
+            st.session_state.dock_screen_key = screen.key
+
+    # Reattach to this session's screen after reruns
+    screen = get_screen(st.session_state.get("dock_screen_key", ""))
+    if screen is not None:
+        render_screen(screen.key, poll=screen.progress().status in ("running", "stopping"))
+
+elif st.button("Run docking", type="primary", key="dock_run"):
     if not protein_file or not ligand_file:
         st.warning("Please upload both protein and ligand files.")
-    else:
+    elif box is not None:
         with st.status("Running docking...", expanded=True) as status:
-            st.write("Preparing structures...")
-            st.write("Searching binding poses...")
-            status.update(label="Backend not configured", state="complete")
+            try:
+                st.write("Preparing receptor and scoring grids...")
+                prepared, cached = grid_cache.get_or_prepare(protein_file.getvalue(), box, engine)
+                st.write("Reused cached receptor grids." if cached else "Receptor grids computed and cached.")
+                shards = len(shard_plan(int(exhaustiveness), int(seed), os.cpu_count() or 1))
+                st.write(f"Searching binding poses ({shards} parallel shard(s))...")
+                poses = dock(prepared, ligand, engine, int(exhaustiveness), int(n_poses), int(seed))
+                name = ligand.split("\n", 1)[0].strip() or "ligand"
+                result = DockingResult(name, poses, prepared.receptor_pdb, box, engine.name, cached)
+                get_session_store().put("docking/result", result)
+                status.update(label=f"Done: {len(poses)} pose(s)", state="complete")
+            except Exception as e:
+                status.update(label="Failed", state="error")
+                st.error(str(e))
+                get_session_store().delete("docking/result")
 
-        st.info(
-            "Docking backend not yet integrated. "
-            "Configure in `backends/docking.py` to enable."
-        )
+result = get_session_store().get("docking/result")
+if result and result.poses and docking_mode == "Protein–ligand":
+    unit = "kcal/mol" if result.engine == "vina" else "stand-in units"
+    st.dataframe(
+        [
+            {"rank": rank, f"score ({unit})": round(pose.score, 3), "shard seed": pose.seed}
+            for rank, pose in enumerate(result.poses, start=1)
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+    shown = st.selectbox(
+        "Pose",
+        range(len(result.poses)),
+        format_func=lambda i: f"#{i + 1} ({result.poses[i].score:.2f})",
+        key="dock_shown",
+    )
+    structure_viewer.structure_viewer(
+        complex_pdb(result.receptor_pdb, result.poses[shown]), width=700, height=400, key="dock_pose_viewer"
+    )
+    result_download.download_button(
+        data=poses_to_sdf(result.poses, result.name),
+        label="Download poses (SDF)",
+        filename=f"{result.name}_poses.sdf",
+        key="dock_dl",
+    )
+
+cache_stats = grid_cache.stats()
+st.sidebar.caption(
+    f"Receptor grid cache: {cache_stats['entries']} grids, {cache_stats['bytes'] / 1024**2:.0f} MB, "
+    f"{cache_stats['hits']} hits / {cache_stats['misses']} misses"
+)
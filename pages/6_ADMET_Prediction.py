@@ -3,8 +3,23 @@ ADMET Prediction - physicochemical and drug-likeness properties.
 """
 import streamlit as st
 
+from backends.admet import (
+    DEFAULT_CHUNK_SIZE,
+    PROPERTY_GROUPS,
+    ADMETBackend,
+    csv_inputs,
+    predict,
+    predict_sdf,
+    smiles_inputs,
+)
+from backends.dispatcher import get_batcher
 from components import file_upload, result_download
+from utils.batch_reader import spool_batch_upload
 from utils.helpers import init_page
+from utils.record_index import open_record_upload, sdf_title
+from utils.session_store import get_session_store
+
+RESULT_PAGE_ROWS = 1000
 
 st.set_page_config(page_title="ADMET Prediction", page_icon="💊", layout="wide")
 init_page()
@@ -19,14 +34,18 @@ st.divider()
 st.sidebar.subheader("Parameters")
 properties = st.sidebar.multiselect(
     "Properties to predict",
-    ["Lipinski Rule of 5", "Solubility", "Permeability", "Toxicity", "Drug-likeness"],
+    list(PROPERTY_GROUPS),
     default=["Lipinski Rule of 5", "Drug-likeness"],
 )
 
 input_mode = st.radio("Input mode", ["SMILES", "File upload"], horizontal=True, key="admet_mode")
 
 if input_mode == "SMILES":
-    smiles = st.text_input("SMILES string", placeholder="CC(=O)OC1=CC=CC=C1C(=O)O")
+    smiles = st.text_area(
+        "SMILES (one per line)",
+        placeholder="CC(=O)OC1=CC=CC=C1C(=O)O",
+        height=100,
+    )
     mol_input = smiles
 else:
     mol_file = file_upload.file_upload(
@@ -36,36 +55,68 @@ else:
         help_text="Upload a file with molecular structures.",
     )
     mol_input = mol_file
+    sdf_index = None
+    if mol_file is not None and not mol_file.name.lower().endswith(".csv"):
+        sdf_index = open_record_upload(mol_file, "sdf")
+        titles = [sdf_title(record) or "(untitled)" for record in sdf_index[:5]]
+        st.caption(f"{len(sdf_index):,} molecules: {', '.join(titles)}{' ...' if len(sdf_index) > 5 else ''}")
 
 if st.button("Run ADMET prediction", type="primary", key="admet_run"):
     if not mol_input or (input_mode == "SMILES" and not mol_input.strip()):
         st.warning("Please provide a SMILES string or upload a file.")
+    elif not properties:
+        st.warning("Select at least one property group.")
     else:
         with st.status("Running ADMET prediction...", expanded=True) as status:
             st.write("Parsing input...")
-            st.write("Computing descriptors...")
-            status.update(label="Backend not configured", state="complete")
+            try:
+                if input_mode == "SMILES":
+                    molecules = list(smiles_inputs(mol_input.splitlines()))
+                elif mol_input.name.lower().endswith(".csv"):
+                    molecules = csv_inputs(spool_batch_upload(mol_input))
+                else:
+                    molecules = None  # read by the workers straight from the indexed file
+                st.write("Computing descriptors...")
+                progress = st.progress(0.0)
 
-        st.info(
-            "ADMET backend not yet integrated. "
-            "Configure in `backends/admet.py` to enable."
-        )
+                def on_progress(done: int, total: int) -> None:
+                    progress.progress(done / total, text=f"Chunk {done} / {total}")
 
-        # Placeholder table for UI demo
-        with st.expander("Example output (placeholder)"):
-            import pandas as pd
+                if molecules is None:
+                    df = predict_sdf(sdf_index, properties, on_progress=on_progress)
+                elif input_mode == "SMILES" and len(molecules) <= DEFAULT_CHUNK_SIZE:
+                    # Small interactive requests are batched with other sessions' into one call
+                    df = get_batcher(ADMETBackend()).call((molecules, tuple(properties)))
+                else:
+                    df = predict(molecules, properties, on_progress=on_progress)
+                progress.empty()
+                get_session_store().put("admet/results", df)
+                # Built once here rather than on every rerun of the results view
+                get_session_store().put("admet/results_csv", df.to_csv(index=False).encode("utf-8"))
+                st.session_state.pop("admet_page", None)
+                status.update(label=f"Done: {len(df)} molecules", state="complete")
+            except Exception as e:
+                status.update(label="Failed", state="error")
+                st.error(str(e))
+                get_session_store().delete_prefix("admet/results")
 
-            df = pd.DataFrame(
-                {
-                    "Property": ["MW", "LogP", "HBD", "HBA", "Lipinski pass"],
-                    "Value": [180.2, 1.4, 0, 4, "Yes"],
-                }
-            )
-            st.dataframe(df, use_container_width=True, hide_index=True)
-            csv = df.to_csv(index=False)
-            result_download.download_button(
-                data=csv,
-                label="Download CSV",
-                filename="admet_results.csv",
-                key="admet_dl",
-            )
+# Kept in the session store so results survive reruns (e.g. after downloading)
+df = get_session_store().get("admet/results")
+if df is not None:
+    invalid = int((~df["valid"]).sum())
+    if invalid:
+        st.warning(f"{invalid} molecules could not be processed; see the error column.")
+    pages = max(1, -(-len(df) // RESULT_PAGE_ROWS))
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key="admet_page")
+    lo = (page - 1) * RESULT_PAGE_ROWS
+    st.dataframe(df.iloc[lo : lo + RESULT_PAGE_ROWS], use_container_width=True, hide_index=True)
+    if pages > 1:
+        st.caption(f"Rows {lo + 1:,}–{min(lo + RESULT_PAGE_ROWS, len(df)):,} of {len(df):,}")
+    result_download.download_button(
+        data=get_session_store().get("admet/results_csv") or df.to_csv(index=False),
+        label="Download CSV",
+        filename="admet_results.csv",
+        key="admet_dl",
+    )
@@ -0,0 +1,94 @@
+"""
+Import-time budget check for the Streamlit entry points.
+
+Each page's top-level import statements are run in a fresh interpreter
+(repeated, median taken) and timed against a bare `import streamlit`
+baseline. A page fails if its extra import time exceeds its budget or if
+it loads a heavy dependency that should only be imported on use.
+
+Usage:
+    python scripts/check_import_time.py [--repeat 5] [--budget-ms 300] [--json]
+"""
+import argparse
+import ast
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+ENTRY_POINTS = [ROOT / "home.py", *sorted((ROOT / "pages").glob("*.py"))]
+
+DEFAULT_BUDGET_MS = 300.0
+# Extra milliseconds over `import streamlit` allowed per entry point
+BUDGETS_MS = {
+    "home.py": 100.0,
+    "1_Home.py": 100.0,
+}
+# Must not be imported until a function needs them
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "py3Dmol", "stmol", "rdkit", "aiohttp", "openpyxl", "Bio")
+
+_PROBE = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def page_imports(path: Path) -> str:
+    """Top-level import statements of a page, as source."""
+    tree = ast.parse(path.read_text())
+    nodes = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(node) for node in nodes) or "pass"
+
+
+def measure(imports: str, repeat: int) -> tuple[float, list[str]]:
+    """Median import seconds over fresh interpreters, and heavy modules loaded."""
+    probe = _PROBE.format(root=str(ROOT), imports=imports, heavy=HEAVY_MODULES)
+    samples, modules = [], []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        modules = result["modules"]
+    return statistics.median(samples), modules
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per entry point")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Default per-page budget")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    baseline, _ = measure("import streamlit", args.repeat)
+    rows, failed = [], False
+    for path in ENTRY_POINTS:
+        seconds, modules = measure(page_imports(path), args.repeat)
+        extra_ms = max(seconds - baseline, 0.0) * 1000
+        budget_ms = BUDGETS_MS.get(path.name, args.budget_ms)
+        ok = extra_ms <= budget_ms and not modules
+        failed |= not ok
+        rows.append(
+            {"page": path.name, "extra_ms": round(extra_ms, 1), "budget_ms": budget_ms, "heavy_modules": modules, "ok": ok}
+        )
+
+    if args.json:
+        print(json.dumps({"baseline_ms": round(baseline * 1000, 1), "pages": rows}, indent=2))
+    else:
+        print(f"import streamlit baseline: {baseline * 1000:.0f} ms")
+        for row in rows:
+            status = "ok" if row["ok"] else "FAIL"
+            heavy = f"  heavy: {', '.join(row['heavy_modules'])}" if row["heavy_modules"] else ""
+            print(f"{status:4}  {row['page']:28} +{row['extra_ms']:6.0f} ms (budget {row['budget_ms']:.0f}){heavy}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+benchmarks.harness.compare: regressions need a slower median outside the
+baseline's min/max range; slowdowns within run-to-run noise are only
+marked noisy. Result files round-trip through write_results.
+
+    python -m unittest discover tests
+"""
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.harness import CaseResult, compare, write_results
+
+
+def results(**cases: list[float]) -> dict:
+    """Results dict as written by write_results, from samples per case key."""
+    return {"results": {key: CaseResult(key, None, 1, samples).to_dict() for key, samples in cases.items()}}
+
+
+class CompareTest(unittest.TestCase):
+    def row(self, current: dict, baseline: dict, threshold: float = 0.2) -> dict:
+        (row,) = compare(current, baseline, threshold)
+        return row
+
+    def test_separated_slowdown_is_a_regression(self):
+        row = self.row(results(case=[1.5, 1.6, 1.7]), results(case=[1.0, 1.1, 1.2]))
+        self.assertAlmostEqual(row["ratio"], 1.6 / 1.1)
+        self.assertEqual((row["regression"], row["noisy"]), (True, False))
+        self.assertEqual((row["baseline_s"], row["current_s"]), (1.1, 1.6))
+
+    def test_overlapping_slowdown_is_only_noisy(self):
+        row = self.row(results(case=[1.1, 1.5, 1.6]), results(case=[1.0, 1.1, 1.3]))
+        self.assertGreater(row["ratio"], 1.2)
+        self.assertEqual((row["regression"], row["noisy"]), (False, True))
+
+    def test_slowdown_within_threshold_is_neither(self):
+        row = self.row(results(case=[1.25, 1.3, 1.35]), results(case=[1.0, 1.1, 1.2]), threshold=0.3)
+        self.assertEqual((row["regression"], row["noisy"]), (False, False))
+
+    def test_speedup_is_neither(self):
+        row = self.row(results(case=[0.4, 0.5, 0.6]), results(case=[1.0, 1.1, 1.2]))
+        self.assertLess(row["ratio"], 1)
+        self.assertEqual((row["regression"], row["noisy"]), (False, False))
+
+    def test_baseline_without_max_compares_medians_only(self):
+        baseline = results(case=[1.0, 1.1, 1.2])
+        del baseline["results"]["case"]["max_s"]
+        row = self.row(results(case=[1.1, 1.5, 1.6]), baseline)
+        self.assertEqual((row["regression"], row["noisy"]), (True, False))
+
+    def test_zero_baseline_median_counts_as_infinitely_slower(self):
+        row = self.row(results(case=[0.1]), results(case=[0.0]))
+        self.assertEqual(row["ratio"], float("inf"))
+        self.assertTrue(row["regression"])
+
+    def test_only_cases_in_both_are_compared(self):
+        rows = compare(results(shared=[1.0], new=[1.0]), results(shared=[1.0], removed=[1.0]))
+        self.assertEqual([row["case"] for row in rows], ["shared"])
+        self.assertEqual(compare(results(case=[1.0]), {}), [])
+
+    def test_compares_written_result_files(self):
+        tmp = Path(tempfile.mkdtemp())
+        write_results([CaseResult("zip", 10, 10, [1.0, 1.1, 1.2])], tmp / "baseline.json")
+        write_results([CaseResult("zip", 10, 10, [2.0, 2.1, 2.2])], tmp / "current.json")
+        baseline, current = (json.loads((tmp / name).read_text()) for name in ("baseline.json", "current.json"))
+        row = self.row(current, baseline)
+        self.assertEqual(row["case"], "zip[10]")
+        self.assertTrue(row["regression"])
+
+
+if __name__ == "__main__":
+    unittest.main()
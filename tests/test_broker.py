@@ -0,0 +1,169 @@
+"""
+SQLiteBroker leases and the worker's handling of them: racing claims,
+heartbeats and acks from a worker whose lease was re-claimed, and jobs
+given up after too many deliveries.
+
+    python -m unittest discover tests
+"""
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from backends.broker import SQLiteBroker
+from backends.jobs import JobRegistry
+from backends.rdf3 import RDF3Config, run_stub
+from backends.worker import Worker
+
+
+class SQLiteBrokerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.broker = SQLiteBroker(self.tmp / "queue.sqlite3")
+
+    def expire(self, job_id: str) -> None:
+        """Make a leased message visible again, as if its worker had stopped heartbeating."""
+        with sqlite3.connect(self.broker.path) as conn:
+            conn.execute("UPDATE messages SET visible_at = ? WHERE job_id = ?", (time.time() - 1, job_id))
+
+    def test_racing_claims_never_share_a_message(self):
+        for i in range(20):
+            self.broker.enqueue(f"job{i}", b"payload")
+        claimed, lock = [], threading.Lock()
+        barrier = threading.Barrier(8)
+
+        def claim_all(worker_id: str) -> None:
+            barrier.wait()
+            while (lease := self.broker.claim(worker_id)) is not None:
+                with lock:
+                    claimed.append(lease.job_id)
+
+        threads = [threading.Thread(target=claim_all, args=(f"w{i}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), sorted(f"job{i}" for i in range(20)))
+        self.assertEqual(self.broker.depth(), {"ready": 0, "leased": 20})
+
+    def test_claims_oldest_visible_message_and_hides_it(self):
+        self.broker.enqueue("first", b"1")
+        time.sleep(0.01)
+        self.broker.enqueue("second", b"2")
+        lease = self.broker.claim("w1")
+        self.assertEqual((lease.job_id, lease.payload, lease.attempts), ("first", b"1", 1))
+        self.assertEqual(self.broker.claim("w2").job_id, "second")
+        self.assertIsNone(self.broker.claim("w3"))
+
+    def test_heartbeat_after_expiry_and_reclaim_is_rejected(self):
+        self.broker.enqueue("job", b"payload")
+        stale = self.broker.claim("w1", visibility_timeout=30)
+        self.expire("job")
+        current = self.broker.claim("w2", visibility_timeout=30)
+        self.assertEqual((current.job_id, current.attempts), ("job", 2))
+
+        expires_at = stale.expires_at
+        self.assertFalse(self.broker.heartbeat(stale, visibility_timeout=30))
+        self.assertEqual(stale.expires_at, expires_at)
+        self.assertTrue(self.broker.heartbeat(current, visibility_timeout=30))
+        self.assertIsNone(self.broker.claim("w3"))
+
+    def test_heartbeat_after_expiry_without_reclaim_extends_the_lease(self):
+        self.broker.enqueue("job", b"payload")
+        lease = self.broker.claim("w1", visibility_timeout=30)
+        self.expire("job")
+        self.assertTrue(self.broker.heartbeat(lease, visibility_timeout=30))
+        self.assertIsNone(self.broker.claim("w2"))
+
+    def test_ack_and_release_with_a_stale_token_are_ignored(self):
+        self.broker.enqueue("job", b"payload")
+        stale = self.broker.claim("w1")
+        self.expire("job")
+        current = self.broker.claim("w2")
+
+        self.broker.ack(stale)
+        self.broker.release(stale)
+        self.assertEqual(self.broker.depth(), {"ready": 0, "leased": 1})
+        self.assertTrue(self.broker.heartbeat(current))
+
+        self.broker.ack(current)
+        self.assertEqual(self.broker.depth(), {"ready": 0, "leased": 0})
+
+    def test_release_redelivers_after_delay(self):
+        self.broker.enqueue("job", b"payload")
+        self.broker.release(self.broker.claim("w1"), delay=0.2)
+        self.assertIsNone(self.broker.claim("w2"))
+        time.sleep(0.25)
+        lease = self.broker.claim("w2")
+        self.assertEqual((lease.job_id, lease.attempts), ("job", 2))
+
+
+class WorkerLeaseTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.broker = SQLiteBroker(self.tmp / "queue.sqlite3")
+        self.registry = JobRegistry(self.tmp / "jobs.sqlite3", broker=self.broker)
+
+    def worker(self, **kwargs) -> Worker:
+        return Worker(JobRegistry(self.tmp / "jobs.sqlite3", recover_orphans=False), self.broker, **kwargs)
+
+    def test_runs_a_job_and_acks_it(self):
+        job_id = self.registry.submit(RDF3Config(num_designs=2, seed=1), backend="stub")
+        self.assertTrue(self.worker().run_once())
+        job = self.registry.get(job_id)
+        self.assertEqual((job.status, len(job.results)), ("done", 2))
+        self.assertEqual(self.broker.depth(), {"ready": 0, "leased": 0})
+        self.assertFalse(self.worker().run_once())
+
+    def test_gives_up_after_max_attempts(self):
+        job_id = self.registry.submit(RDF3Config(num_designs=1), backend="stub")
+        for _ in range(2):
+            # Workers that died mid-job: claimed, never acked, lease lapses
+            self.broker.claim("dead", visibility_timeout=0)
+        worker = self.worker(max_attempts=2)
+        with mock.patch("backends.jobs.run") as run:
+            self.assertTrue(worker.run_once())
+        run.assert_not_called()
+        job = self.registry.get(job_id)
+        self.assertEqual((job.status, job.error), ("failed", "Worker lost 2 times; giving up."))
+        self.assertEqual(self.broker.depth(), {"ready": 0, "leased": 0})
+
+    def test_lost_lease_stops_the_run_and_leaves_the_job_to_the_new_holder(self):
+        job_id = self.registry.submit(RDF3Config(num_designs=1), backend="stub")
+        stolen = []
+
+        def slow_run(config, backend, cancel_event=None, **kwargs):
+            # Lease lapses (e.g. a stalled heartbeat) and another worker claims the job
+            with sqlite3.connect(self.broker.path) as conn:
+                conn.execute("UPDATE messages SET visible_at = ?", (time.time() - 1,))
+            stolen.append(self.broker.claim("other", visibility_timeout=30))
+            if not cancel_event.wait(10):
+                return run_stub(config)
+            raise RuntimeError("Cancelled.")
+
+        started = time.monotonic()
+        with mock.patch("backends.jobs.run", side_effect=slow_run):
+            self.worker(visibility_timeout=0.3).run_once()
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(stolen[0].job_id, job_id)
+        # Neither a failure nor an ack from the stale worker
+        self.assertEqual(self.registry.get(job_id).status, "running")
+        self.assertEqual(self.broker.depth(), {"ready": 0, "leased": 1})
+        self.assertTrue(self.broker.heartbeat(stolen[0]))
+
+    def test_invalid_payload_fails_without_redelivery(self):
+        job_id = self.registry.submit(RDF3Config(num_designs=1), backend="stub")
+        with sqlite3.connect(self.broker.path) as conn:
+            conn.execute("UPDATE messages SET payload = ?", (b"\x80garbage",))
+        self.assertTrue(self.worker().run_once())
+        job = self.registry.get(job_id)
+        self.assertEqual(job.status, "failed")
+        self.assertIn("Invalid job payload", job.error)
+        self.assertFalse(self.worker().run_once())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+run_cli against a fake `rfd3` on PATH: output collection, log and progress
+streaming, failures, timeouts, cancellation and the process slot limit.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from backends import subprocess_runner
+from backends.rdf3 import RDF3Config, run_cli
+
+# Writes n_designs PDBs to out_dir, reporting "design i of n"; FAKE_RFD3_MODE
+# makes it fail, hang, or record its start/end times to FAKE_RFD3_SPANS.
+FAKE_RFD3 = textwrap.dedent(
+    """\
+    import os, sys, time
+    args = dict(arg.split("=", 1) for arg in sys.argv[2:])
+    mode = os.environ.get("FAKE_RFD3_MODE", "ok")
+    if mode == "fail":
+        print("loading weights")
+        print("CUDA out of memory", file=sys.stderr)
+        sys.exit(3)
+    if mode == "hang":
+        print("1 of 2", flush=True)
+        time.sleep(60)
+    spans = os.environ.get("FAKE_RFD3_SPANS")
+    start = time.time()
+    if spans:
+        time.sleep(0.3)
+    out_dir = args["out_dir"]
+    os.makedirs(out_dir, exist_ok=True)
+    n = int(args["n_designs"])
+    for i in range(n):
+        with open(os.path.join(out_dir, f"design_{i}.pdb"), "w") as f:
+            f.write("ATOM      1  CA  ALA A   1       0.000   0.000   0.000  1.00  0.00           C\\nEND\\n")
+        print(f"design {i + 1} of {n}", flush=True)
+    if spans:
+        with open(spans, "a") as f:
+            f.write(f"{start} {time.time()}\\n")
+    """
+)
+
+
+class RunCliTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        bin_dir = self.tmp / "bin"
+        bin_dir.mkdir()
+        fake = bin_dir / "rfd3"
+        fake.write_text(f"#!{sys.executable}\n{FAKE_RFD3}")
+        fake.chmod(0o755)
+        self.environ = dict(os.environ)
+        os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+        os.environ.pop("FAKE_RFD3_MODE", None)
+        os.environ.pop("FAKE_RFD3_SPANS", None)
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        subprocess_runner.set_slot_count(subprocess_runner.DEFAULT_SLOTS)
+
+    def test_collects_outputs_by_path_and_streams_progress(self):
+        lines, fractions = [], []
+        results = run_cli(
+            RDF3Config(num_designs=3, seed=1), self.tmp / "out", on_log=lines.append, on_progress=fractions.append
+        )
+        self.assertEqual([r.status for r in results], ["done"] * 3)
+        self.assertTrue(all(r.pdb_content is None and r.output_path.exists() for r in results))
+        self.assertIn("CA  ALA", results[0].read_pdb())
+        self.assertEqual(lines, ["design 1 of 3", "design 2 of 3", "design 3 of 3"])
+        self.assertEqual(fractions[-1], 1.0)
+
+    def test_failure_reports_exit_code_and_log_tail(self):
+        os.environ["FAKE_RFD3_MODE"] = "fail"
+        with self.assertRaisesRegex(RuntimeError, "(?s)code 3.*CUDA out of memory"):
+            run_cli(RDF3Config(), self.tmp / "out")
+
+    def test_timeout_kills_the_process(self):
+        os.environ["FAKE_RFD3_MODE"] = "hang"
+        started = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            run_cli(RDF3Config(), self.tmp / "out", timeout=1.0)
+        self.assertLess(time.monotonic() - started, 10)
+
+    def test_cancel_kills_the_process(self):
+        os.environ["FAKE_RFD3_MODE"] = "hang"
+        cancel = threading.Event()
+        threading.Timer(0.5, cancel.set).start()
+        started = time.monotonic()
+        with self.assertRaisesRegex(RuntimeError, "Cancelled"):
+            run_cli(RDF3Config(), self.tmp / "out", cancel_event=cancel)
+        self.assertLess(time.monotonic() - started, 10)
+
+    def test_slot_count_bounds_concurrent_processes(self):
+        spans_path = self.tmp / "spans.txt"
+        os.environ["FAKE_RFD3_SPANS"] = str(spans_path)
+        subprocess_runner.set_slot_count(1)
+        threads = [threading.Thread(target=run_cli, args=(RDF3Config(), self.tmp / "out")) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        spans = sorted(tuple(map(float, line.split())) for line in spans_path.read_text().splitlines())
+        self.assertEqual(len(spans), 3)
+        for (_, end), (start, _) in zip(spans, spans[1:]):
+            self.assertLessEqual(end, start)
+
+
+if __name__ == "__main__":
+    unittest.main()
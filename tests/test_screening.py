@@ -0,0 +1,188 @@
+"""
+Virtual screening bookkeeping: the top-N HitHeap, and screens that stop or
+fail part-way and resume from their checkpoint with the same hits as an
+uninterrupted run. Ligands are "docked" by a fake engine on a thread pool.
+
+    python -m unittest discover tests
+"""
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from backends import screening
+from backends.docking import Box, Pose, PreparedReceptor
+from backends.screening import Hit, HitHeap, Screen
+
+LIBRARY_SIZE = 40
+
+
+def ligand_score(index: int) -> float:
+    return -float((index * 7) % 23)
+
+
+class FakeEngine:
+    """Scores ligand_i as ligand_score(i); optionally fails or waits on chosen ligands."""
+
+    name = "fake"
+    version = "1"
+
+    def __init__(self, fail: tuple[int, ...] = (), broken: bool = False, delay: float = 0.0):
+        self.fail = fail
+        self.broken = broken
+        self.delay = delay
+        self.searched: list[int] = []
+        self._lock = threading.Lock()
+
+    def search(self, grid_dir: Path, ligand: str, exhaustiveness: int, seed: int, n_poses: int) -> list[Pose]:
+        index = int(ligand.splitlines()[0].rsplit("_", 1)[1])
+        with self._lock:
+            self.searched.append(index)
+        time.sleep(self.delay)
+        if self.broken:
+            raise FileNotFoundError(f"{grid_dir}/grid.npz")
+        if index in self.fail:
+            raise RuntimeError("no poses")
+        return [Pose(ligand_score(index), ligand, seed)]
+
+
+def hit(index: int, score: float) -> Hit:
+    return Hit(index, f"ligand_{index}", score)
+
+
+class HitHeapTest(unittest.TestCase):
+    def test_keeps_the_best_hits_ranked(self):
+        heap = HitHeap(3)
+        for index, score in enumerate([-1.0, -5.0, -3.0, -4.0, -2.0]):
+            heap.push(hit(index, score))
+        self.assertEqual([(h.index, h.score) for h in heap.ranked()], [(1, -5.0), (3, -4.0), (2, -3.0)])
+        self.assertEqual(len(heap), 3)
+
+    def test_push_reports_whether_the_hit_was_kept(self):
+        heap = HitHeap(2)
+        self.assertTrue(heap.push(hit(0, -2.0)))
+        self.assertTrue(heap.push(hit(1, -1.0)))
+        self.assertFalse(heap.push(hit(2, -0.5)))
+        self.assertTrue(heap.push(hit(3, -3.0)))
+        self.assertEqual([h.index for h in heap.ranked()], [3, 0])
+
+    def test_ignores_a_ligand_it_already_holds(self):
+        heap = HitHeap(3)
+        heap.push(hit(0, -1.0))
+        self.assertFalse(heap.push(hit(0, -9.0)))
+        self.assertEqual([(h.index, h.score) for h in heap.ranked()], [(0, -1.0)])
+
+    def test_dropped_ligand_can_be_pushed_again(self):
+        heap = HitHeap(1)
+        heap.push(hit(0, -1.0))
+        heap.push(hit(1, -2.0))
+        self.assertTrue(heap.push(hit(0, -3.0)))
+        self.assertEqual([h.index for h in heap.ranked()], [0])
+
+    def test_ties_keep_the_earlier_record(self):
+        heap = HitHeap(2)
+        for index in (3, 1, 2, 0):
+            heap.push(hit(index, -1.0))
+        self.assertEqual([h.index for h in heap.ranked()], [0, 1])
+
+
+class ScreenResumeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from rdkit import Chem
+
+        cls.tmp = Path(tempfile.mkdtemp())
+        cls.library = cls.tmp / "library.sdf"
+        with Chem.SDWriter(str(cls.library)) as writer:
+            for i in range(LIBRARY_SIZE):
+                mol = Chem.MolFromSmiles("C" * (i % 5 + 1) + "O")
+                mol.SetProp("_Name", f"ligand_{i}")
+                writer.write(mol)
+
+    def setUp(self):
+        self.screen_dir = Path(tempfile.mkdtemp())
+        self.pool = ThreadPoolExecutor(max_workers=4)
+        patches = [
+            mock.patch.object(screening, "SCREEN_DIR", self.screen_dir),
+            mock.patch.object(screening, "get_search_pool", return_value=self.pool),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.pool.shutdown)
+        self.prepared = PreparedReceptor("receptor", Box((0.0, 0.0, 0.0), (20.0, 20.0, 20.0)), self.tmp, "")
+
+    def screen(self, engine: FakeEngine, key: str = "screen", top_n: int = 5) -> Screen:
+        return Screen(key, self.prepared, self.library, engine, top_n=top_n, workers=2)
+
+    def run_until_idle(self, screen: Screen):
+        screen.start()
+        deadline = time.monotonic() + 30
+        while screen.progress().status in ("running", "stopping"):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.02)
+        return screen.progress()
+
+    def expected_hits(self, top_n: int = 5, failed: tuple[int, ...] = ()) -> list[tuple[int, float]]:
+        heap = HitHeap(top_n)
+        for i in range(LIBRARY_SIZE):
+            if i not in failed:
+                heap.push(hit(i, ligand_score(i)))
+        return [(h.index, h.score) for h in heap.ranked()]
+
+    def test_completes_and_counts_failures(self):
+        progress = self.run_until_idle(self.screen(FakeEngine(fail=(4, 11))))
+        self.assertEqual((progress.status, progress.screened, progress.total, progress.failed), ("done", 40, 40, 2))
+        self.assertEqual([(h.index, h.score) for h in progress.hits], self.expected_hits(failed=(4, 11)))
+        self.assertIn("ligand_", progress.last_failure)
+
+    def test_stopped_screen_resumes_from_its_checkpoint(self):
+        first = self.screen(FakeEngine(delay=0.01))
+        first.start()
+        while first.progress().screened < 10:
+            time.sleep(0.01)
+        first.stop()
+        stopped = self.run_until_idle(first)
+        self.assertEqual(stopped.status, "stopped")
+        self.assertLess(stopped.screened, LIBRARY_SIZE)
+
+        engine = FakeEngine()
+        resumed = self.screen(engine)
+        loaded = resumed.progress()
+        self.assertEqual((loaded.screened, loaded.hits), (stopped.screened, stopped.hits))
+        progress = self.run_until_idle(resumed)
+        self.assertEqual((progress.status, progress.screened, progress.failed), ("done", 40, 0))
+        self.assertEqual(sorted(engine.searched), list(range(stopped.screened, LIBRARY_SIZE)))
+        self.assertEqual([(h.index, h.score) for h in progress.hits], self.expected_hits())
+
+    def test_infrastructure_error_fails_the_screen_and_resume_finishes_it(self):
+        failed = self.run_until_idle(self.screen(FakeEngine(broken=True)))
+        self.assertEqual(failed.status, "failed")
+        self.assertIn("FileNotFoundError", failed.error)
+        self.assertEqual(failed.failed, 0)
+
+        progress = self.run_until_idle(self.screen(FakeEngine()))
+        self.assertEqual((progress.status, progress.screened, progress.failed), ("done", 40, 0))
+        self.assertEqual([(h.index, h.score) for h in progress.hits], self.expected_hits())
+
+    def test_finished_screen_loads_as_done(self):
+        self.run_until_idle(self.screen(FakeEngine()))
+        engine = FakeEngine()
+        again = self.screen(engine)
+        again.start()
+        progress = again.progress()
+        self.assertEqual((progress.status, progress.screened), ("done", 40))
+        self.assertEqual(engine.searched, [])
+
+    def test_checkpoint_of_another_version_is_ignored(self):
+        self.run_until_idle(self.screen(FakeEngine()))
+        with mock.patch.object(screening, "CHECKPOINT_VERSION", screening.CHECKPOINT_VERSION + 1):
+            progress = self.screen(FakeEngine()).progress()
+        self.assertEqual((progress.status, progress.screened, progress.hits), ("stopped", 0, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
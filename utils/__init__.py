@@ -1,5 +1,17 @@
-"""Utility modules."""
-from . import helpers
-from . import auth
+"""Utility modules.
+
+Submodules are imported on first attribute access (PEP 562).
+"""
+import importlib
 
 __all__ = ["helpers", "auth"]
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
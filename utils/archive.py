@@ -0,0 +1,181 @@
+"""
+Streaming ZIP writer with parallel compression.
+
+Entries are compressed on a thread pool (zlib releases the GIL) and written
+to the output file in order as they complete, so memory stays bounded by
+the in-flight window no matter how many entries the archive holds. Members
+that are already compressed are stored as-is. Zip64 records are written
+when the archive outgrows the classic 4 GiB / 65,535-entry limits.
+"""
+import os
+import struct
+import tempfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Union
+
+from utils.metrics import count, span
+
+Content = Union[bytes, str, Path]
+
+# Suffixes of formats that do not benefit from another deflate pass
+COMPRESSED_SUFFIXES = (
+    ".gz", ".tgz", ".bz2", ".xz", ".zst", ".zip", ".7z",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".parquet", ".npz",
+)
+
+_ZIP_STORED = 0
+_ZIP_DEFLATED = 8
+_FLAG_UTF8 = 0x800
+_MAX_32 = 0xFFFFFFFF
+_MAX_16 = 0xFFFF
+
+
+def _dos_datetime(timestamp: float) -> tuple[int, int]:
+    t = time.localtime(timestamp)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((max(t.tm_year, 1980) - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def _compress(name: str, content: Content, level: int) -> tuple[bytes, int, int, int]:
+    """Return (payload, method, crc, uncompressed_size) for one entry."""
+    if isinstance(content, Path):
+        content = content.read_bytes()
+    elif isinstance(content, str):
+        content = content.encode("utf-8")
+    crc = zlib.crc32(content)
+    if name.lower().endswith(COMPRESSED_SUFFIXES):
+        return content, _ZIP_STORED, crc, len(content)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    payload = compressor.compress(content) + compressor.flush()
+    if len(payload) >= len(content):
+        return content, _ZIP_STORED, crc, len(content)
+    return payload, _ZIP_DEFLATED, crc, len(content)
+
+
+class StreamingZipWriter:
+    """
+    Write a ZIP archive to a seekable-or-not binary file, entry by entry.
+
+    Args:
+        fileobj: Open binary file to write to
+        level: zlib compression level (1-9)
+        max_workers: Compression threads (defaults to the CPU count)
+    """
+
+    def __init__(self, fileobj: BinaryIO, level: int = 6, max_workers: Optional[int] = None):
+        self.fileobj = fileobj
+        self.level = level
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._offset = 0
+        self._central: list[bytes] = []
+        self._dos_time, self._dos_date = _dos_datetime(time.time())
+
+    def _write(self, data: bytes) -> None:
+        self.fileobj.write(data)
+        self._offset += len(data)
+
+    def _write_entry(self, name: str, payload: bytes, method: int, crc: int, size: int) -> None:
+        encoded = name.encode("utf-8")
+        flags = 0 if encoded.isascii() else _FLAG_UTF8
+        if len(payload) > _MAX_32 or size > _MAX_32:
+            raise ValueError(f"Entry too large for this writer: {name}")
+        header_offset = self._offset
+        self._write(
+            struct.pack(
+                "<4s2B4HL2L2H", b"PK\x03\x04", 20, 0, flags, method,
+                self._dos_time, self._dos_date, crc, len(payload), size, len(encoded), 0,
+            )
+        )
+        self._write(encoded)
+        self._write(payload)
+
+        extra = b""
+        version = 20
+        if header_offset > _MAX_32:
+            extra = struct.pack("<2HQ", 0x0001, 8, header_offset)
+            header_offset = _MAX_32
+            version = 45
+        self._central.append(
+            struct.pack(
+                "<4s4B4HL2L5H2L", b"PK\x01\x02", version, 3, version, 0, flags, method,
+                self._dos_time, self._dos_date, crc, len(payload), size, len(encoded), len(extra),
+                0, 0, 0, 0o100644 << 16, header_offset,
+            )
+            + encoded
+            + extra
+        )
+
+    def write_entries(self, entries: Iterable[tuple[str, Content]]) -> None:
+        """Compress entries in parallel and append them in input order."""
+        window = 2 * self.max_workers
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="zip") as pool:
+            in_flight: deque = deque()
+            for name, content in entries:
+                in_flight.append((name, pool.submit(_compress, name, content, self.level)))
+                if len(in_flight) >= window:
+                    entry_name, future = in_flight.popleft()
+                    self._write_entry(entry_name, *future.result())
+            while in_flight:
+                entry_name, future = in_flight.popleft()
+                self._write_entry(entry_name, *future.result())
+
+    def close(self) -> None:
+        """Write the central directory (and Zip64 records when needed)."""
+        cd_offset = self._offset
+        for record in self._central:
+            self._write(record)
+        cd_size = self._offset - cd_offset
+        count = len(self._central)
+
+        if count >= _MAX_16 or cd_offset >= _MAX_32 or cd_size >= _MAX_32:
+            zip64_offset = self._offset
+            self._write(
+                struct.pack("<4sQ2H2L4Q", b"PK\x06\x06", 44, 45, 45, 0, 0, count, count, cd_size, cd_offset)
+            )
+            self._write(struct.pack("<4sLQL", b"PK\x06\x07", 0, zip64_offset, 1))
+            count = min(count, _MAX_16)
+            cd_size = min(cd_size, _MAX_32)
+            cd_offset = min(cd_offset, _MAX_32)
+        self._write(struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, count, count, cd_size, cd_offset, 0))
+        self.fileobj.flush()
+
+    def __enter__(self) -> "StreamingZipWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+
+
+def build_zip_file(
+    entries: Iterable[tuple[str, Content]],
+    path: Optional[Path] = None,
+    level: int = 6,
+    max_workers: Optional[int] = None,
+) -> Path:
+    """
+    Write a zip archive of (filename, content) pairs to disk.
+
+    Args:
+        entries: Iterable of (filename, content); content may be bytes, str or a Path
+        path: Output file; defaults to a new temporary file (caller deletes it)
+        level: zlib compression level
+        max_workers: Compression threads
+
+    Returns:
+        Path of the written archive
+    """
+    if path is None:
+        fd, name = tempfile.mkstemp(prefix="portal_", suffix=".zip")
+        os.close(fd)
+        path = Path(name)
+    with span("zip.build"):
+        with open(path, "wb") as f, StreamingZipWriter(f, level=level, max_workers=max_workers) as writer:
+            writer.write_entries(entries)
+    count("portal_bytes_total", path.stat().st_size, stage="zip.build")
+    return path
@@ -0,0 +1,135 @@
+"""
+Bounded-concurrency batch execution with per-row timeouts and retries.
+
+Rows are fanned out to a thread pool (I/O-bound API backends) or a process
+pool (CPU-bound backends). Results come back in the original row order and
+follow the batch contract: whatever `process_row` returns on success, or
+{'status': 'failed', 'error': ..., 'row': index} on failure.
+"""
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Any, Callable, Literal, Optional, Sequence, Union
+
+from utils.metrics import count, record
+
+ExecutorKind = Literal["thread", "process"]
+ProgressCallback = Callable[[int, int], None]
+
+DEFAULT_MAX_WORKERS = 8
+
+
+def make_executor(kind: ExecutorKind, max_workers: int) -> Executor:
+    """Create a pool for the given executor kind."""
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch")
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"Unknown executor: {kind}")
+
+
+def _failed(index: int, error: str) -> dict:
+    return {"status": "failed", "error": error, "row": index}
+
+
+def run_batch(
+    rows: Sequence[Any],
+    process_row: Callable[[Any], dict],
+    executor: Union[ExecutorKind, Executor] = "thread",
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timeout: Optional[float] = None,
+    retries: int = 0,
+    on_progress: Optional[ProgressCallback] = None,
+) -> list[dict]:
+    """
+    Run `process_row` over all rows with at most `max_workers` in flight.
+
+    Args:
+        rows: Row payloads (dicts for batch_panel); must be picklable for "process"
+        process_row: Function that takes a row, returns a result dict
+        executor: "thread", "process", or an existing Executor to reuse
+        max_workers: Maximum number of rows in flight at once
+        timeout: Per-row wall-clock limit in seconds (None for no limit)
+        retries: Extra attempts for rows that raise or time out
+        on_progress: Called as on_progress(completed, total) on the calling thread
+
+    Returns:
+        List of result dicts, in row order
+
+    A timed-out row is reported as failed, but its worker cannot be
+    interrupted; it keeps its concurrency slot until it actually returns.
+    """
+    total = len(rows)
+    results: list[Optional[dict]] = [None] * total
+    if total == 0:
+        return []
+
+    owns_pool = not isinstance(executor, Executor)
+    pool = make_executor(executor, max_workers) if owns_pool else executor
+    started = time.perf_counter()
+
+    todo = deque((i, 0) for i in range(total))
+    pending: dict[Future, tuple[int, int, Optional[float]]] = {}
+    abandoned: set[Future] = set()
+    completed = 0
+
+    def fail(index: int, attempt: int, error: str) -> None:
+        nonlocal completed
+        if attempt < retries:
+            todo.append((index, attempt + 1))
+            return
+        results[index] = _failed(index, error)
+        completed += 1
+
+    try:
+        while todo or pending:
+            abandoned = {f for f in abandoned if not f.done()}
+            while todo and len(pending) + len(abandoned) < max_workers:
+                index, attempt = todo.popleft()
+                deadline = time.monotonic() + timeout if timeout else None
+                pending[pool.submit(process_row, rows[index])] = (index, attempt, deadline)
+
+            deadlines = [d for _, _, d in pending.values() if d is not None]
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            if not pending:
+                # Every slot is held by a timed-out row; wait for one to free up
+                wait(abandoned, return_when=FIRST_COMPLETED)
+                continue
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            before = completed
+            for future in done:
+                index, attempt, _ = pending.pop(future)
+                try:
+                    results[index] = future.result()
+                    completed += 1
+                except Exception as e:
+                    fail(index, attempt, str(e))
+
+            now = time.monotonic()
+            for future, (index, attempt, deadline) in list(pending.items()):
+                if deadline is not None and now >= deadline:
+                    del pending[future]
+                    if not future.cancel():
+                        abandoned.add(future)
+                    fail(index, attempt, f"Timed out after {timeout:g}s")
+
+            if on_progress and completed != before:
+                on_progress(completed, total)
+    finally:
+        if owns_pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    kind = executor if owns_pool else type(executor).__name__
+    record("batch.run", time.perf_counter() - started, executor=kind)
+    failed = sum(1 for r in results if isinstance(r, dict) and r.get("status") == "failed")
+    count("portal_batch_rows_total", total - failed, status="done")
+    count("portal_batch_rows_total", failed, status="failed")
+    return results  # type: ignore[return-value]
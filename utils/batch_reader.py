@@ -0,0 +1,218 @@
+"""
+Chunked, schema-validated reader for batch CSV/Excel inputs.
+
+Uploads are spooled once into the shared upload store. Excel workbooks
+are converted a single time to Parquet (CSV if pyarrow is unavailable),
+so reruns never re-parse them with openpyxl. BatchSource offers a preview
+that reads only the first rows, an up-front schema check, and iteration
+in fixed-size DataFrame chunks for the batch engine.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from utils.upload_store import UploadStore, get_upload_store
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 10_000
+PREVIEW_ROWS = 10
+SCHEMA_SAMPLE_ROWS = 1_000
+_COPY_CHUNK_BYTES = 1024 * 1024
+
+_DTYPES = {"str": "string", "int": "Int64", "float": "Float64", "bool": "boolean"}
+
+
+class BatchSchemaError(ValueError):
+    """Batch file does not match the expected columns or types."""
+
+
+@dataclass
+class ColumnSpec:
+    """One expected batch column."""
+
+    name: str
+    dtype: str = "str"  # "str" | "int" | "float" | "bool"
+    required: bool = True
+
+
+@dataclass
+class BatchSchema:
+    """Expected batch columns; unknown extra columns are allowed."""
+
+    columns: list[ColumnSpec] = field(default_factory=list)
+
+    def coerce(self, df: "pd.DataFrame", first_row: int = 0) -> "pd.DataFrame":
+        """Check columns and convert types; raises BatchSchemaError naming the bad rows."""
+        import pandas as pd
+
+        missing = [c.name for c in self.columns if c.required and c.name not in df.columns]
+        if missing:
+            raise BatchSchemaError(f"Missing required columns: {', '.join(missing)}")
+        for spec in self.columns:
+            if spec.name not in df.columns:
+                continue
+            column = df[spec.name]
+            if spec.dtype in ("int", "float"):
+                converted = pd.to_numeric(column, errors="coerce")
+                bad = converted.isna() & column.notna()
+                if spec.dtype == "int":
+                    bad |= converted.notna() & (converted % 1 != 0)
+                if bad.any():
+                    rows = ", ".join(str(first_row + i + 2) for i in bad.to_numpy().nonzero()[0][:5])
+                    raise BatchSchemaError(f"Column '{spec.name}' expects {spec.dtype} values (rows {rows}).")
+                column = converted
+            df[spec.name] = column.astype(_DTYPES[spec.dtype])
+        return df
+
+
+def _suffix(name: str) -> str:
+    return Path(name).suffix.lower()
+
+
+def spool_batch_upload(uploaded_file, store: Optional[UploadStore] = None) -> Path:
+    """
+    Put an uploaded CSV/Excel file in the upload store (deduplicated by content).
+    Excel is converted once to a Parquet (or CSV) file stored beside it.
+    """
+    import pandas as pd
+
+    suffix = _suffix(uploaded_file.name)
+    if suffix not in (".csv", ".xlsx", ".xls"):
+        raise BatchSchemaError("Unsupported format. Use CSV or Excel.")
+    path = (store or get_upload_store()).put_upload(uploaded_file)
+    if suffix == ".csv":
+        return path
+
+    for existing in (path.with_name(path.name + ".parquet"), path.with_name(path.name + ".csv")):
+        if existing.exists():
+            return existing
+    df = pd.read_excel(path)
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        converted = path.with_name(path.name + ".parquet")
+        df.to_parquet(tmp, index=False)
+    except ImportError:
+        converted = path.with_name(path.name + ".csv")
+        df.to_csv(tmp, index=False)
+    tmp.replace(converted)
+    return converted
+
+
+class BatchSource:
+    """
+    Batch rows stored on disk as CSV or Parquet.
+
+    Args:
+        path: CSV, Parquet or Excel file (Excel is read whole; spool it first)
+        schema: Expected columns, checked by validate() and applied to every chunk
+        chunk_rows: Rows per chunk yielded by iter_chunks()
+    """
+
+    def __init__(self, path: Path, schema: Optional[BatchSchema] = None, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        self.path = Path(path)
+        self.schema = schema
+        self.chunk_rows = chunk_rows
+        self._num_rows: Optional[int] = None
+
+    @property
+    def format(self) -> str:
+        return {".parquet": "parquet", ".xlsx": "excel", ".xls": "excel"}.get(_suffix(self.path.name), "csv")
+
+    def _read_head(self, n: int) -> "pd.DataFrame":
+        import pandas as pd
+
+        if self.format == "csv":
+            return pd.read_csv(self.path, nrows=n)
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+
+            batch = next(pq.ParquetFile(self.path).iter_batches(batch_size=n), None)
+            return batch.to_pandas() if batch is not None else pd.DataFrame()
+        return pd.read_excel(self.path, nrows=n)
+
+    def preview(self, n: int = PREVIEW_ROWS) -> "pd.DataFrame":
+        """First n rows, reading no more of the file than needed."""
+        return self._read_head(n)
+
+    def validate(self) -> None:
+        """Check the schema against a sample of rows; raises BatchSchemaError."""
+        sample = self._read_head(SCHEMA_SAMPLE_ROWS)
+        if sample.empty:
+            raise BatchSchemaError("File is empty.")
+        if self.schema is not None:
+            self.schema.coerce(sample)
+
+    @property
+    def num_rows(self) -> int:
+        """Row count (CSV: newline count, so quoted multi-line cells are over-counted)."""
+        import pandas as pd
+
+        if self._num_rows is None:
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+
+                self._num_rows = pq.ParquetFile(self.path).metadata.num_rows
+            elif self.format == "excel":
+                self._num_rows = len(pd.read_excel(self.path))
+            else:
+                lines = 0
+                last = b"\n"
+                with open(self.path, "rb") as f:
+                    while chunk := f.read(_COPY_CHUNK_BYTES):
+                        lines += chunk.count(b"\n")
+                        last = chunk[-1:]
+                self._num_rows = max(lines + (last != b"\n") - 1, 0)
+        return self._num_rows
+
+    def iter_chunks(self) -> Iterator["pd.DataFrame"]:
+        """Yield DataFrames of up to chunk_rows rows, schema-coerced, with a global RangeIndex."""
+        import pandas as pd
+
+        first_row = 0
+        for chunk in self._raw_chunks():
+            chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+            if self.schema is not None:
+                chunk = self.schema.coerce(chunk, first_row)
+            first_row += len(chunk)
+            yield chunk
+
+    def _raw_chunks(self) -> Iterator["pd.DataFrame"]:
+        import pandas as pd
+
+        if self.format == "csv":
+            yield from pd.read_csv(self.path, chunksize=self.chunk_rows)
+        elif self.format == "parquet":
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(self.path).iter_batches(batch_size=self.chunk_rows):
+                yield batch.to_pandas()
+        else:
+            df = pd.read_excel(self.path)
+            for lo in range(0, len(df), self.chunk_rows):
+                yield df.iloc[lo : lo + self.chunk_rows]
+
+    def iter_rows(self) -> Iterator[dict]:
+        """Yield row dicts, one chunk in memory at a time."""
+        for chunk in self.iter_chunks():
+            yield from chunk.to_dict(orient="records")
+
+
+def open_batch_upload(
+    uploaded_file,
+    schema: Optional[BatchSchema] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> tuple[Optional[BatchSource], Optional[str]]:
+    """
+    Spool and validate an uploaded batch file.
+    Returns (BatchSource, error_message). error_message is None on success.
+    """
+    if uploaded_file is None:
+        return None, None
+    try:
+        source = BatchSource(spool_batch_upload(uploaded_file), schema=schema, chunk_rows=chunk_rows)
+        source.validate()
+    except Exception as e:
+        return None, str(e)
+    return source, None
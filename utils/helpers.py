@@ -1,15 +1,14 @@
 """
 Common helper functions for file handling, visualization, etc.
 """
-import io
-import tempfile
-import zipfile
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
 
-import pandas as pd
 import streamlit as st
 
+from utils.archive import build_zip_file
+from utils.upload_store import UploadStore, get_upload_store
+
 
 def inject_theme() -> None:
     """Inject custom CSS from .streamlit/styles.css."""
@@ -22,23 +21,36 @@ def inject_theme() -> None:
 
 
 def init_page() -> None:
-    """Initialize page: theme, optional auth, sidebar logout."""
+    """Initialize page: theme, optional auth, sidebar logout, metrics export, CLI slots and timings panel."""
     inject_theme()
+    from backends.subprocess_runner import set_slot_count
     from utils.auth import render_sidebar_auth, require_auth
+    from utils.metrics import start_exporter_from_secrets
 
     if not require_auth():
         st.stop()
     render_sidebar_auth()
+    start_exporter_from_secrets()
+    try:
+        show_timings = st.secrets.get("show_timings", False)
+        cli_slots = st.secrets.get("cli_slots")
+    except (FileNotFoundError, AttributeError):
+        show_timings, cli_slots = False, None
+    if cli_slots:
+        set_slot_count(int(cli_slots))
+    if show_timings:
+        from components.timings_panel import timings_panel
+
+        timings_panel()
 
 
 def save_uploaded_file(uploaded_file, directory: Optional[Path] = None) -> Path:
-    """Save an uploaded Streamlit file to disk. Returns the path."""
-    if directory is None:
-        directory = Path(tempfile.gettempdir())
-    path = directory / uploaded_file.name
-    with open(path, "wb") as f:
-        f.write(uploaded_file.getvalue())
-    return path
+    """
+    Save an uploaded Streamlit file to the content-addressed upload store.
+    Returns a stable path shared by identical uploads (the name keeps only the suffix).
+    """
+    store = get_upload_store() if directory is None else UploadStore(directory)
+    return store.put_upload(uploaded_file)
 
 
 def st_file_uploader(
@@ -64,36 +76,30 @@ def display_pdb(preview_lines: int = 50) -> None:
 
 def parse_batch_csv(path: str | Path) -> list[dict[str, Any]]:
     """
-    Parse batch input CSV or Excel. Returns list of row dicts.
+    Parse batch input CSV, Excel or Parquet. Returns list of row dicts.
+    For large files, iterate utils.batch_reader.BatchSource(path).iter_rows() instead.
     """
     path = Path(path)
-    if path.suffix == ".csv":
-        df = pd.read_csv(path)
-    elif path.suffix in (".xlsx", ".xls"):
-        df = pd.read_excel(path)
-    else:
-        raise ValueError("Unsupported format. Use CSV or Excel.")
-    return df.to_dict(orient="records")
-
-
-def build_zip(entries: list[tuple[str, bytes | str]]) -> bytes:
-    """Create a zip archive from (filename, content) pairs. Returns zip bytes."""
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        for name, content in entries:
-            if isinstance(content, str):
-                content = content.encode("utf-8")
-            zf.writestr(name, content)
-    buffer.seek(0)
-    return buffer.getvalue()
+    if path.suffix not in (".csv", ".xlsx", ".xls", ".parquet"):
+        raise ValueError("Unsupported format. Use CSV, Excel or Parquet.")
+    from utils.batch_reader import BatchSource
+
+    return list(BatchSource(path).iter_rows())
+
+
+def build_zip(entries: Iterable[tuple[str, bytes | str]]) -> bytes:
+    """Create a zip archive from (filename, content) pairs. Returns zip bytes.
+
+    Prefer utils.archive.build_zip_file for large archives; this reads the
+    finished archive back into memory once.
+    """
+    path = build_zip_file(entries)
+    try:
+        return path.read_bytes()
+    finally:
+        path.unlink(missing_ok=True)
 
 
 def save_session_file(data: bytes | str, name: str) -> Path:
-    """Save data to a temp file for use by tools. Returns the path."""
-    directory = Path(tempfile.gettempdir())
-    path = directory / name
-    if isinstance(data, str):
-        data = data.encode("utf-8")
-    with open(path, "wb") as f:
-        f.write(data)
-    return path
+    """Save data to the upload store for use by tools. Returns the path (suffix taken from name)."""
+    return get_upload_store().put_bytes(data, Path(name).suffix.lower())
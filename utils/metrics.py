@@ -0,0 +1,294 @@
+"""
+Stage timing and counters with OpenMetrics export.
+
+Code marks a stage with `with span("zip.build"):`; the duration goes into
+the portal_stage_duration_seconds histogram labeled by stage, and the
+span is kept in a short in-memory history tagged with the Streamlit
+session that ran it, for the sidebar timings panel. count() increments
+counters such as jobs, failures, bytes and cache hits.
+
+Everything is process-local and stdlib-only. render_openmetrics() returns
+the text exposition format; start_exporter() periodically writes it to a
+scrape file or serves it at http://<host>:<port>/metrics.
+"""
+import contextvars
+import http.server
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+# Seconds; spans range from sub-millisecond cache hits to hour-long runs
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+RECENT_SPANS = 2_000
+SCRAPE_INTERVAL_SECONDS = 15
+
+LabelKey = tuple[tuple[str, str], ...]
+
+_HELP = {
+    "portal_stage_duration_seconds": "Time spent per stage",
+    "portal_jobs_total": "Backend runs by tool, backend and final status",
+    "portal_batch_rows_total": "Batch rows processed by status",
+    "portal_bytes_total": "Bytes handled per stage",
+    "portal_cache_requests_total": "Result cache lookups by result",
+    "portal_dispatch_batches_total": "Batched backend invocations by backend",
+    "portal_dispatch_requests_total": "Requests served by batched backend invocations",
+}
+
+
+def _labels(labels: dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+@dataclass
+class SpanRecord:
+    """One finished span."""
+
+    stage: str
+    seconds: float
+    ended_at: float
+    session_id: Optional[str]
+    ok: bool
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms for one process."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[LabelKey, float]] = {}
+        self._histograms: dict[str, dict[LabelKey, _Histogram]] = {}
+        self._recent: deque[SpanRecord] = deque(maxlen=RECENT_SPANS)
+        self.started_at = time.time()
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        """Add value to counter name (exported as name; use a _total suffix)."""
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record value in histogram name."""
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = _Histogram(self.buckets)
+            series[key].observe(value)
+
+    def record_span(self, record: SpanRecord, **labels) -> None:
+        self.observe("portal_stage_duration_seconds", record.seconds, stage=record.stage, **labels)
+        with self._lock:
+            self._recent.append(record)
+
+    def recent_spans(self, session_id: Optional[str] = None, limit: int = 50) -> list[SpanRecord]:
+        """Latest spans, newest first, optionally only those of one session."""
+        with self._lock:
+            spans = [s for s in reversed(self._recent) if session_id is None or s.session_id == session_id]
+        return spans[:limit]
+
+    def render_openmetrics(self) -> str:
+        """All metrics in OpenMetrics text format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                family = name[: -len("_total")] if name.endswith("_total") else name
+                lines.append(f"# TYPE {family} counter")
+                lines.append(f"# HELP {family} {_HELP.get(name, name)}")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{family}_total{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+                for key, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(hist.buckets, hist.counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {hist.total}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {hist.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist.total}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_scrape_file(self, path: Path) -> None:
+        """Atomically write the current metrics to path."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.render_openmetrics())
+        tmp.replace(path)
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide metrics registry."""
+    return _registry
+
+
+_bound_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("metrics_session", default=None)
+
+
+@contextmanager
+def bind_session(session_id: Optional[str]) -> Iterator[None]:
+    """Attribute spans in this block to session_id (for work done on background threads)."""
+    token = _bound_session.set(session_id)
+    try:
+        yield
+    finally:
+        _bound_session.reset(token)
+
+
+def current_session_id() -> Optional[str]:
+    """Current Streamlit session ID, or None outside a script run (e.g. worker threads)."""
+    if _bound_session.get() is not None:
+        return _bound_session.get()
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return None
+    return ctx.session_id if ctx is not None else None
+
+
+@contextmanager
+def span(stage: str, **labels) -> Iterator[None]:
+    """
+    Time a block as one stage.
+
+    Args:
+        stage: Dotted stage name, e.g. "rdf3.run" or "zip.build"
+        **labels: Extra histogram labels (keep cardinality low)
+    """
+    session_id = current_session_id()
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        seconds = time.perf_counter() - start
+        _registry.record_span(SpanRecord(stage, seconds, time.time(), session_id, ok), **labels)
+
+
+def record(stage: str, seconds: float, **labels) -> None:
+    """Record a stage duration measured elsewhere (e.g. time spent waiting in a queue)."""
+    _registry.record_span(SpanRecord(stage, seconds, time.time(), current_session_id(), True), **labels)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """Increment a counter on the process-wide registry."""
+    _registry.count(name, value, **labels)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = _registry.render_openmetrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+_exporter_lock = threading.Lock()
+_exporter_started = False
+
+
+def start_exporter(
+    scrape_file: Optional[Path] = None,
+    port: Optional[int] = None,
+    host: str = "127.0.0.1",
+    interval: float = SCRAPE_INTERVAL_SECONDS,
+) -> None:
+    """
+    Start exporting metrics once per process: rewrite scrape_file every
+    interval seconds and/or serve /metrics on host:port. Later calls are no-ops.
+    """
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started or (scrape_file is None and port is None):
+            return
+        _exporter_started = True
+
+    if scrape_file is not None:
+
+        def write_loop() -> None:
+            while True:
+                try:
+                    _registry.write_scrape_file(Path(scrape_file))
+                except OSError:
+                    pass
+                time.sleep(interval)
+
+        threading.Thread(target=write_loop, name="metrics-file", daemon=True).start()
+
+    if port is not None:
+        server = http.server.ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+
+
+def start_exporter_from_secrets() -> None:
+    """Start the exporter if metrics_file or metrics_port is set in Streamlit secrets."""
+    import streamlit as st
+
+    try:
+        scrape_file = st.secrets.get("metrics_file")
+        port = st.secrets.get("metrics_port")
+        host = st.secrets.get("metrics_host", "127.0.0.1")
+    except (FileNotFoundError, AttributeError):
+        return
+    try:
+        start_exporter(Path(scrape_file) if scrape_file else None, int(port) if port else None, host)
+    except OSError:
+        pass  # port taken, e.g. by another server process on this host
+
+
+def format_seconds(seconds: float) -> str:
+    """Human-readable duration for the timings panel."""
+    if seconds < 1:
+        return f"{seconds * 1000:.0f} ms"
+    if seconds < 120:
+        return f"{seconds:.1f} s"
+    return f"{math.floor(seconds / 60)} min {seconds % 60:.0f} s"
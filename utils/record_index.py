@@ -0,0 +1,171 @@
+"""
+Indexed random access to multi-record SDF and FASTA files.
+
+One pass over the memory-mapped file finds every record boundary; the
+offsets are saved next to the file as "<name>.idx" and reused while the
+file is unchanged. Records are then read by index or slice straight from
+the mapping, and shards() splits the index into ranges that worker
+processes can read on their own, so previews, paging and fan-out cost
+the same regardless of file size.
+"""
+import mmap
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional, Union
+
+from utils.upload_store import get_upload_store
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_SCAN_BLOCK_BYTES = 64 * 1024**2
+_FORMATS = {".sdf": "sdf", ".mol": "sdf", ".fasta": "fasta", ".fa": "fasta", ".faa": "fasta", ".fna": "fasta"}
+
+
+def _line_start_hits(buf: "np.ndarray", base: int, pattern: bytes, at_file_start: bool) -> "np.ndarray":
+    """Absolute offsets where pattern starts a line, within one scanned block."""
+    import numpy as np
+
+    hits = np.flatnonzero(buf[: len(buf) - len(pattern) + 1] == pattern[0]) if len(buf) >= len(pattern) else np.array([], int)
+    for k in range(1, len(pattern)):
+        hits = hits[buf[hits + k] == pattern[k]]
+    line_start = np.zeros(len(hits), dtype=bool)
+    inner = hits > 0
+    line_start[inner] = buf[hits[inner] - 1] == 10
+    line_start[~inner] = at_file_start
+    return hits[line_start] + base
+
+
+class RecordIndex:
+    """
+    Record-offset index over an SDF or FASTA file.
+
+    Args:
+        path: File to index
+        fmt: "sdf" or "fasta" (inferred from the suffix when omitted)
+    """
+
+    def __init__(self, path: Union[str, Path], fmt: Optional[str] = None):
+        self.path = Path(path)
+        self.fmt = fmt or _FORMATS.get(self.path.suffix.lower())
+        if self.fmt not in ("sdf", "fasta"):
+            raise ValueError(f"Cannot index {self.path.name}: use SDF or FASTA.")
+        self.index_path = self.path.with_name(self.path.name + ".idx")
+        self._file = open(self.path, "rb")
+        size = self.path.stat().st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        offsets = self._load()
+        self.offsets = offsets if offsets is not None else self._build()
+
+    # ------------------------------------------------------------ index file
+
+    def _stamp(self) -> list[int]:
+        stat = self.path.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _load(self) -> Optional["np.ndarray"]:
+        """Saved offsets, or None if there is no index or the file changed since."""
+        import numpy as np
+
+        if not self.index_path.exists():
+            return None
+        with open(self.index_path, "rb") as f:
+            saved = np.load(f)
+        return saved[2:] if saved[:2].tolist() == self._stamp() else None
+
+    def _build(self) -> "np.ndarray":
+        """Scan the file once; offsets has len(records) + 1 entries (last = end)."""
+        import numpy as np
+
+        size = len(self._mm)
+        marker = b">" if self.fmt == "fasta" else b"$$$$"
+        hits = []
+        for lo in range(0, size, _SCAN_BLOCK_BYTES):
+            hi = min(size, lo + _SCAN_BLOCK_BYTES + len(marker) - 1)
+            buf = np.frombuffer(self._mm[max(lo - 1, 0) : hi], dtype=np.uint8)
+            base = max(lo - 1, 0)
+            found = _line_start_hits(buf, base, marker, at_file_start=lo == 0)
+            hits.append(found[(found >= lo) & (found < lo + _SCAN_BLOCK_BYTES)])
+        hits = np.concatenate(hits) if hits else np.array([], dtype=np.int64)
+
+        if self.fmt == "fasta":
+            offsets = np.append(hits, size)
+        else:
+            # Each record ends after its "$$$$" line; a trailing record without one still counts
+            hits = [int(h) for h in hits if self._mm[h + 4 : h + 5] in (b"\n", b"\r", b"")]
+            ends = [self._mm.find(b"\n", h) for h in hits]
+            ends = np.array([size if e < 0 else e + 1 for e in ends], dtype=np.int64)
+            offsets = np.concatenate(([0], ends))
+            if size > offsets[-1] and self._mm[int(offsets[-1]) :].strip():
+                offsets = np.append(offsets, size)
+        offsets = offsets.astype(np.int64)
+
+        tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.concatenate((self._stamp(), offsets)))
+        tmp.replace(self.index_path)
+        return offsets
+
+    # --------------------------------------------------------------- access
+
+    def __len__(self) -> int:
+        return max(len(self.offsets) - 1, 0)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[str, list[str]]:
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        start, end = int(self.offsets[key]), int(self.offsets[key + 1])
+        return self._mm[start:end].decode("utf-8", errors="replace")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def records(self, start: int, stop: int) -> Iterator[str]:
+        """Records start..stop-1."""
+        for i in range(max(start, 0), min(stop, len(self))):
+            yield self[i]
+
+    def shards(self, n: int) -> list[tuple[int, int]]:
+        """Split records into at most n contiguous (start, stop) ranges of similar byte size."""
+        import numpy as np
+
+        total = len(self)
+        if total == 0:
+            return []
+        n = max(1, min(n, total))
+        targets = np.linspace(self.offsets[0], self.offsets[-1], n + 1)[1:-1]
+        cuts = np.unique(np.searchsorted(self.offsets[:-1], targets).clip(1, total - 1)) if n > 1 else []
+        bounds = [0, *[int(c) for c in cuts], total]
+        return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+    def close(self) -> None:
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "RecordIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def parse_fasta_record(record: str) -> tuple[str, str]:
+    """Return (header, sequence) for one FASTA record."""
+    lines = record.splitlines()
+    header = lines[0][1:].strip() if lines and lines[0].startswith(">") else ""
+    return header, "".join(line.strip() for line in lines[1:])
+
+
+def sdf_title(record: str) -> str:
+    """Title (first) line of an SDF record."""
+    return record.split("\n", 1)[0].strip()
+
+
+def open_record_upload(uploaded_file, fmt: Optional[str] = None) -> RecordIndex:
+    """Put an uploaded SDF/FASTA file in the upload store and return its (persisted) record index."""
+    return RecordIndex(get_upload_store().put_upload(uploaded_file), fmt)
@@ -0,0 +1,236 @@
+"""
+Per-session object store with a memory budget.
+
+Large per-session objects (structure text, result lists, DataFrames) are
+put here instead of directly in st.session_state. Once a session holds
+more than its budget, its least-recently-used entries are pickled to disk
+and dropped from memory; get() loads them back on demand, and handles let
+pages pass results around without loading them. Everything is deleted
+when the session's state is garbage collected, and spill directories left
+behind by a crashed server are swept by age.
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import streamlit as st
+
+DEFAULT_SPILL_DIR = Path(tempfile.gettempdir()) / "portal_sessions"
+DEFAULT_BUDGET_BYTES = 256 * 1024**2
+ORPHAN_MAX_AGE_SECONDS = 24 * 3600
+SWEEP_INTERVAL_SECONDS = 600
+_STATE_KEY = "_session_store"
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate in-memory size of value in bytes."""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if hasattr(value, "memory_usage"):  # pandas DataFrame / Series
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if hasattr(value, "nbytes"):  # NumPy arrays
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+@dataclass
+class _Entry:
+    size: int
+    value: Any = None
+    spilled: bool = False
+
+
+@dataclass(frozen=True)
+class Handle:
+    """Lazy reference to a stored value; load() fetches it (from disk if spilled)."""
+
+    store: "SessionStore"
+    key: str
+
+    def load(self) -> Any:
+        return self.store.get(self.key)
+
+
+class SessionStore:
+    """
+    Memory-budgeted key/value store that spills cold entries to disk.
+
+    Args:
+        budget_bytes: In-memory size above which least-recently-used entries spill
+        spill_dir: Parent directory for this store's spill files
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES, spill_dir: Path = DEFAULT_SPILL_DIR):
+        self.budget_bytes = budget_bytes
+        self.directory = Path(spill_dir) / uuid.uuid4().hex
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_bytes = 0
+        # Release spill files even if clear() is never called
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def _spill_path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.pkl"
+
+    def put(self, key: str, value: Any) -> Handle:
+        """Store value under key (replacing any previous value) and return a handle."""
+        with self._lock:
+            self._discard(key)
+            entry = _Entry(size=estimate_size(value), value=value)
+            self._entries[key] = entry
+            self._memory_bytes += entry.size
+            self._enforce_budget()
+        return Handle(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value for key, loading it back from disk if it was spilled."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            if not entry.spilled:
+                return entry.value
+            try:
+                with open(self._spill_path(key), "rb") as f:
+                    value = pickle.load(f)
+            except FileNotFoundError:
+                # Swept as an orphan while the session sat idle
+                del self._entries[key]
+                return default
+            # Keep it in memory again if that fits; otherwise hand it out without caching
+            if entry.size <= self.budget_bytes:
+                self._spill_path(key).unlink(missing_ok=True)
+                entry.value, entry.spilled = value, False
+                self._memory_bytes += entry.size
+                self._enforce_budget(keep=key)
+            return value
+
+    def file_path(self, name: str, suffix: str = "") -> Path:
+        """Path for a file owned by this session (e.g. a prepared download); deleted with the store."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        os.utime(self.directory)
+        return self.directory / f"{hashlib.sha1(name.encode('utf-8')).hexdigest()}{suffix}"
+
+    def handle(self, key: str) -> Optional[Handle]:
+        """Handle for key without loading it, or None if absent."""
+        return Handle(self, key) if key in self._entries else None
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        """Stored keys starting with prefix, least recently used first."""
+        with self._lock:
+            return iter([k for k in self._entries if k.startswith(prefix)])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._discard(key)
+
+    def delete_prefix(self, prefix: str) -> None:
+        """Delete every key starting with prefix."""
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._discard(key)
+
+    def clear(self) -> None:
+        """Drop every entry and its spill file."""
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry.spilled:
+            self._spill_path(key).unlink(missing_ok=True)
+        else:
+            self._memory_bytes -= entry.size
+
+    def _enforce_budget(self, keep: Optional[str] = None) -> None:
+        if self._memory_bytes <= self.budget_bytes:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        os.utime(self.directory)  # marks the session as alive for the orphan sweep
+        for key, entry in self._entries.items():
+            if self._memory_bytes <= self.budget_bytes:
+                break
+            if entry.spilled or key == keep:
+                continue
+            with open(self._spill_path(key), "wb") as f:
+                pickle.dump(entry.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            entry.value, entry.spilled = None, True
+            self._memory_bytes -= entry.size
+
+    def stats(self) -> dict[str, int]:
+        """Return entry counts and in-memory bytes."""
+        spilled = sum(e.spilled for e in self._entries.values())
+        return {
+            "entries": len(self._entries),
+            "spilled": spilled,
+            "memory_bytes": self._memory_bytes,
+            "budget_bytes": self.budget_bytes,
+        }
+
+
+def sweep_orphans(spill_dir: Path = DEFAULT_SPILL_DIR, max_age_seconds: float = ORPHAN_MAX_AGE_SECONDS) -> None:
+    """Remove spill directories of sessions that have not spilled for max_age_seconds."""
+    if not spill_dir.exists():
+        return
+    cutoff = time.time() - max_age_seconds
+    for directory in spill_dir.iterdir():
+        try:
+            if directory.is_dir() and directory.stat().st_mtime < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
+def _budget_from_secrets() -> int:
+    try:
+        return int(float(st.secrets.get("session_memory_mb", DEFAULT_BUDGET_BYTES / 1024**2)) * 1024**2)
+    except (FileNotFoundError, AttributeError, ValueError):
+        return DEFAULT_BUDGET_BYTES
+
+
+def get_session_store() -> SessionStore:
+    """
+    Return this Streamlit session's store, creating it on first use.
+
+    The store lives in st.session_state, so it (and its spill files) is
+    released when Streamlit drops the session.
+    """
+    global _last_sweep
+    store = st.session_state.get(_STATE_KEY)
+    if store is None:
+        store = SessionStore(budget_bytes=_budget_from_secrets())
+        st.session_state[_STATE_KEY] = store
+        with _sweep_lock:
+            if time.time() - _last_sweep >= SWEEP_INTERVAL_SECONDS:
+                _last_sweep = time.time()
+                sweep_orphans()
+    return store
@@ -0,0 +1,478 @@
+"""
+Columnar, NumPy-backed structure model with fast PDB/mmCIF I/O.
+
+A Structure holds one row per atom: coordinates as a float32 (N, 3) array,
+numeric fields as NumPy arrays, and repetitive string fields (atom, residue
+and chain names, elements, ...) interned as integer codes into a small
+vocabulary. PDB files are parsed by slicing fixed-width columns out of the
+raw byte buffer with array operations; large files are memory-mapped.
+Atom records round-trip through to_pdb()/to_mmcif(); other records
+(HEADER, REMARK, CONECT, ...) are not kept.
+"""
+import mmap
+import re
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+MMAP_THRESHOLD_BYTES = 16 * 1024**2
+_PARSE_CHUNK_LINES = 65536
+_LINE_WIDTH = 80
+
+# (field, start, stop) in 0-based PDB columns
+_PDB_TEXT_COLUMNS = (
+    ("record", 0, 6),
+    ("atom_name", 12, 16),
+    ("alt_loc", 16, 17),
+    ("res_name", 17, 21),
+    ("chain_id", 21, 22),
+    ("icode", 26, 27),
+    ("element", 76, 78),
+    ("charge", 78, 80),
+)
+_PDB_INT_COLUMNS = (("serial", 6, 11), ("res_seq", 22, 26))
+_PDB_FLOAT_COLUMNS = (("x", 30, 38), ("y", 38, 46), ("z", 46, 54), ("occupancy", 54, 60), ("b_factor", 60, 66))
+
+_TWO_LETTER_ELEMENTS = {"FE", "ZN", "MG", "MN", "CA", "CL", "BR", "NA", "CU", "CO", "NI", "SE", "CD", "HG", "LI"}
+
+
+@dataclass
+class Interned:
+    """String column stored as integer codes into a vocabulary."""
+
+    codes: np.ndarray  # uint32, one per atom
+    vocab: np.ndarray  # str, unique values
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> "Interned":
+        vocab, codes = np.unique(values, return_inverse=True)
+        if vocab.dtype.kind == "S":
+            vocab = np.char.strip(np.char.decode(vocab, "ascii", "replace"))
+        return cls(codes.astype(np.uint32).ravel(), vocab.astype(str))
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.vocab[self.codes]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index) -> "Interned":
+        return Interned(self.codes[index], self.vocab)
+
+    def isin(self, names) -> np.ndarray:
+        """Boolean mask of atoms whose value is in names."""
+        return np.isin(self.codes, np.flatnonzero(np.isin(self.vocab, list(names))))
+
+    @classmethod
+    def concat(cls, parts: list["Interned"]) -> "Interned":
+        vocab = np.unique(np.concatenate([p.vocab for p in parts]))
+        codes = [np.searchsorted(vocab, p.vocab)[p.codes] for p in parts]
+        return cls(np.concatenate(codes).astype(np.uint32), vocab)
+
+
+@dataclass
+class Structure:
+    """Atoms of a (possibly multi-model) structure in columnar form."""
+
+    coords: np.ndarray  # float32 (N, 3)
+    serial: np.ndarray  # int32
+    res_seq: np.ndarray  # int32
+    occupancy: np.ndarray  # float32
+    b_factor: np.ndarray  # float32
+    model: np.ndarray  # int32, 1-based model number
+    record: Interned  # "ATOM" | "HETATM"
+    atom_name: Interned
+    alt_loc: Interned
+    res_name: Interned
+    chain_id: Interned
+    icode: Interned
+    element: Interned
+    charge: Interned
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def __getitem__(self, index) -> "Structure":
+        """Select atoms by boolean mask, index array or slice."""
+        return Structure(**{f.name: getattr(self, f.name)[index] for f in fields(self)})
+
+    @classmethod
+    def concat(cls, parts: list["Structure"]) -> "Structure":
+        values = {}
+        for f in fields(cls):
+            columns = [getattr(p, f.name) for p in parts]
+            values[f.name] = Interned.concat(columns) if isinstance(columns[0], Interned) else np.concatenate(columns)
+        return cls(**values)
+
+    @property
+    def ca_mask(self) -> np.ndarray:
+        """Alpha carbons of standard ATOM records."""
+        return self.atom_name.isin(["CA"]) & self.record.isin(["ATOM"]) & ~self.element.isin(["CA"])
+
+    # ------------------------------------------------------------------ parsing
+
+    @classmethod
+    def parse(cls, data: Union[str, bytes], fmt: Optional[str] = None) -> "Structure":
+        """Parse PDB or mmCIF text; the format is sniffed when not given."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        fmt = fmt or detect_format(data)
+        return cls.from_mmcif(data) if fmt == "cif" else cls.from_pdb(data)
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], fmt: Optional[str] = None) -> "Structure":
+        """Parse a file, memory-mapping it when it is large."""
+        path = Path(path)
+        if fmt is None and path.suffix.lower() in (".cif", ".mmcif"):
+            fmt = "cif"
+        with open(path, "rb") as f:
+            size = path.stat().st_size
+            if size < MMAP_THRESHOLD_BYTES or size == 0:
+                return cls.parse(f.read(), fmt)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                fmt = fmt or detect_format(mm[:4096])
+                return cls.from_mmcif(mm) if fmt == "cif" else cls.from_pdb(mm)
+
+    @classmethod
+    def from_pdb(cls, data: Union[bytes, mmap.mmap]) -> "Structure":
+        """Vectorized fixed-width parse of ATOM/HETATM records."""
+        buf = np.frombuffer(data, dtype=np.uint8)
+        newlines = np.flatnonzero(buf == 10)
+        starts = np.concatenate(([0], newlines + 1))
+        ends = np.concatenate((newlines, [len(buf)]))
+        keep = starts < len(buf)
+        starts, ends = starts[keep], ends[keep]
+        # Drop \r of CRLF line endings
+        ends = ends - ((ends > starts) & (buf[np.maximum(ends - 1, 0)] == 13))
+
+        head = _gather(buf, starts, ends, 0, 6)
+        is_atom = (head == np.frombuffer(b"ATOM  ", np.uint8)).all(axis=1) | (
+            head == np.frombuffer(b"HETATM", np.uint8)
+        ).all(axis=1)
+        is_model = (head == np.frombuffer(b"MODEL ", np.uint8)).all(axis=1)
+
+        atom_lines = np.flatnonzero(is_atom)
+        model_lines = np.flatnonzero(is_model)
+        if len(model_lines):
+            model_numbers = _parse_int(_gather(buf, starts[model_lines], ends[model_lines], 10, 14))
+            model_numbers = np.concatenate(([1], model_numbers))
+            model = model_numbers[np.searchsorted(model_lines, atom_lines)]
+        else:
+            model = np.ones(len(atom_lines), dtype=np.int32)
+
+        parts = []
+        for lo in range(0, len(atom_lines), _PARSE_CHUNK_LINES) or [0]:
+            lines = atom_lines[lo : lo + _PARSE_CHUNK_LINES]
+            table = _gather(buf, starts[lines], ends[lines], 0, _LINE_WIDTH)
+            parts.append(_structure_from_table(table, model[lo : lo + _PARSE_CHUNK_LINES]))
+        return parts[0] if len(parts) == 1 else cls.concat(parts)
+
+    @classmethod
+    def from_mmcif(cls, data: Union[bytes, mmap.mmap]) -> "Structure":
+        """Parse the _atom_site loop of an mmCIF file (auth_* fields preferred)."""
+        text = bytes(data).decode("utf-8", errors="replace")
+        columns, tokens = _atom_site_loop(text)
+        rows = tokens.reshape(-1, len(columns)) if len(tokens) else np.empty((0, len(columns)), dtype=str)
+        index = {name: i for i, name in enumerate(columns)}
+
+        def col(*names: str, default: str = "") -> np.ndarray:
+            for name in names:
+                if name in index:
+                    values = rows[:, index[name]]
+                    return np.where(np.isin(values, [".", "?"]), default, values)
+            return np.full(len(rows), default)
+
+        def numbers(dtype, *names: str, default: str = "0") -> np.ndarray:
+            return col(*names, default=default).astype(np.float64).astype(dtype)
+
+        coords = np.stack(
+            [numbers(np.float32, f"Cartn_{axis}") for axis in "xyz"], axis=1
+        ) if len(rows) else np.empty((0, 3), dtype=np.float32)
+        return cls(
+            coords=coords,
+            serial=numbers(np.int32, "id"),
+            res_seq=numbers(np.int32, "auth_seq_id", "label_seq_id"),
+            occupancy=numbers(np.float32, "occupancy", default="1"),
+            b_factor=numbers(np.float32, "B_iso_or_equiv"),
+            model=numbers(np.int32, "pdbx_PDB_model_num", default="1"),
+            record=Interned.from_values(col("group_PDB", default="ATOM")),
+            atom_name=Interned.from_values(col("auth_atom_id", "label_atom_id")),
+            alt_loc=Interned.from_values(col("label_alt_id")),
+            res_name=Interned.from_values(col("auth_comp_id", "label_comp_id")),
+            chain_id=Interned.from_values(col("auth_asym_id", "label_asym_id")),
+            icode=Interned.from_values(col("pdbx_PDB_ins_code")),
+            element=Interned.from_values(col("type_symbol")),
+            charge=Interned.from_values(_cif_charge_to_pdb(col("pdbx_formal_charge"))),
+        )
+
+    # ------------------------------------------------------------ serialization
+
+    def to_pdb(self, slim: bool = False) -> str:
+        """
+        Serialize to PDB text (MODEL/ENDMDL records for multi-model structures).
+
+        Args:
+            slim: Stop each line after the coordinates (plus the element when it
+                cannot be inferred from the atom name) for viewer payloads
+        """
+        multi_model = len(np.unique(self.model)) > 1
+        names = [_pdb_atom_name(n, e) for n, e in zip(self.atom_name.values.tolist(), self.element.values.tolist())]
+        columns = zip(
+            self.record.values.tolist(),
+            self.serial.tolist(),
+            names,
+            self.alt_loc.values.tolist(),
+            self.res_name.values.tolist(),
+            self.chain_id.values.tolist(),
+            self.res_seq.tolist(),
+            self.icode.values.tolist(),
+            self.coords.tolist(),
+            self.occupancy.tolist(),
+            self.b_factor.tolist(),
+            self.element.values.tolist(),
+            self.charge.values.tolist(),
+            self.model.tolist(),
+        )
+        out = []
+        current_model = None
+        for rec, serial, name, alt, res, chain, seq, icode, (x, y, z), occ, b, elem, charge, model in columns:
+            if multi_model and model != current_model:
+                if current_model is not None:
+                    out.append("ENDMDL")
+                out.append(f"MODEL     {model:>4}")
+                current_model = model
+            line = (
+                f"{rec:<6}{hy36encode(5, serial)} {name}{alt:1}{res:>3} {chain:1}{hy36encode(4, seq)}{icode:1}   "
+                f"{x:8.3f}{y:8.3f}{z:8.3f}"
+            )
+            if not slim:
+                line += f"{occ:6.2f}{b:6.2f}          {elem:>2}{charge:2}"
+            elif elem and name.lstrip()[:1] != elem:
+                line += f"{'':22}{elem:>2}"
+            out.append(line)
+        if multi_model:
+            out.append("ENDMDL")
+        out.append("END")
+        return "\n".join(out) + "\n"
+
+    def to_mmcif(self, name: str = "structure") -> str:
+        """Serialize to an mmCIF data block with an _atom_site loop."""
+        header = [
+            f"data_{name}",
+            "loop_",
+            *(
+                f"_atom_site.{c}"
+                for c in (
+                    "group_PDB", "id", "type_symbol", "label_atom_id", "label_alt_id", "label_comp_id",
+                    "label_asym_id", "label_seq_id", "pdbx_PDB_ins_code", "Cartn_x", "Cartn_y", "Cartn_z",
+                    "occupancy", "B_iso_or_equiv", "pdbx_formal_charge", "auth_seq_id", "auth_comp_id",
+                    "auth_asym_id", "auth_atom_id", "pdbx_PDB_model_num",
+                )
+            ),
+        ]
+
+        def cif(value: str) -> str:
+            if not value:
+                return "?"
+            if " " in value or "'" in value:
+                return f'"{value}"'
+            return value
+
+        rows = []
+        for rec, serial, elem, atom, alt, res, chain, seq, icode, (x, y, z), occ, b, charge, model in zip(
+            self.record.values.tolist(),
+            self.serial.tolist(),
+            self.element.values.tolist(),
+            self.atom_name.values.tolist(),
+            self.alt_loc.values.tolist(),
+            self.res_name.values.tolist(),
+            self.chain_id.values.tolist(),
+            self.res_seq.tolist(),
+            self.icode.values.tolist(),
+            self.coords.tolist(),
+            self.occupancy.tolist(),
+            self.b_factor.tolist(),
+            self.charge.values.tolist(),
+            self.model.tolist(),
+        ):
+            atom, res, chain, charge = cif(atom), cif(res), cif(chain), _pdb_charge_to_cif(charge)
+            rows.append(
+                f"{rec} {serial} {cif(elem)} {atom} {alt or '.'} {res} {chain} {seq} {icode or '?'} "
+                f"{x:.3f} {y:.3f} {z:.3f} {occ:.2f} {b:.2f} {charge} {seq} {res} {chain} {atom} {model}"
+            )
+        return "\n".join(header + rows) + "\n#\n"
+
+
+def detect_format(data: Union[bytes, str]) -> str:
+    """Return "cif" for mmCIF text, else "pdb"."""
+    head = data[:4096]
+    if isinstance(head, str):
+        head = head.encode("utf-8", errors="replace")
+    stripped = head.lstrip()
+    return "cif" if stripped.startswith(b"data_") or b"_atom_site." in head else "pdb"
+
+
+# ---------------------------------------------------------------------- helpers
+
+
+def _gather(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray, lo: int, hi: int) -> np.ndarray:
+    """Columns [lo, hi) of each line as a uint8 (n, hi - lo) array, space-padded."""
+    index_dtype = np.int32 if len(buf) < 2**31 - hi else np.int64
+    cols = starts.astype(index_dtype)[:, None] + np.arange(lo, hi, dtype=index_dtype)
+    out = buf[np.minimum(cols, max(len(buf) - 1, 0))]
+    # Only columns past the shortest line can fall outside a line
+    shortest = int((ends - starts).min()) if len(starts) else hi
+    if shortest < hi:
+        tail = slice(max(shortest - lo, 0), None)
+        out[:, tail] = np.where(cols[:, tail] < ends[:, None], out[:, tail], 32)
+    return out
+
+
+def _as_bytes(block: np.ndarray) -> np.ndarray:
+    """(n, w) uint8 -> (n,) S{w}."""
+    width = block.shape[1]
+    return np.ascontiguousarray(block).view(f"S{width}").ravel()
+
+
+def _parse_int(block: np.ndarray) -> np.ndarray:
+    blank = (block == 32).all(axis=1)
+    values = _as_bytes(block).copy()
+    values[blank] = b"0"
+    # Hybrid-36 numbers (serials > 99999, residues > 9999) contain letters
+    hybrid = ((block >= 65) & (block <= 90) | (block >= 97) & (block <= 122)).any(axis=1)
+    if not hybrid.any():
+        return values.astype(np.int32)
+    width = block.shape[1]
+    decoded = [hy36decode(width, v.decode("ascii")) for v in values[hybrid].tolist()]
+    values[hybrid] = b"0"
+    out = values.astype(np.int32)
+    out[hybrid] = decoded
+    return out
+
+
+def _parse_float(block: np.ndarray) -> np.ndarray:
+    blank = (block == 32).all(axis=1)
+    values = _as_bytes(block).copy()
+    values[blank] = b"0"
+    return values.astype(np.float32)
+
+
+def _intern_block(block: np.ndarray) -> Interned:
+    """Intern a fixed-width text column by viewing each field as one integer."""
+    width = block.shape[1]
+    padded_width = next(w for w in (1, 2, 4, 8) if w >= width)
+    padded = np.full((len(block), padded_width), 32, dtype=np.uint8)
+    padded[:, :width] = block
+    keys = padded.view(f"<u{padded_width}").ravel()
+    unique, codes = np.unique(keys, return_inverse=True)
+    vocab = unique.view(np.uint8).reshape(-1, padded_width)[:, :width]
+    return Interned(
+        codes.astype(np.uint32).ravel(),
+        np.char.strip(np.char.decode(_as_bytes(vocab), "ascii", "replace")).astype(str),
+    )
+
+
+def _structure_from_table(table: np.ndarray, model: np.ndarray) -> Structure:
+    text = {name: _intern_block(table[:, lo:hi]) for name, lo, hi in _PDB_TEXT_COLUMNS}
+    ints = {name: _parse_int(table[:, lo:hi]) for name, lo, hi in _PDB_INT_COLUMNS}
+    floats = {name: _parse_float(table[:, lo:hi]) for name, lo, hi in _PDB_FLOAT_COLUMNS}
+    return Structure(
+        coords=np.stack([floats.pop("x"), floats.pop("y"), floats.pop("z")], axis=1),
+        model=model.astype(np.int32),
+        **ints,
+        **floats,
+        **text,
+    )
+
+
+def _pdb_atom_name(name: str, element: str) -> str:
+    """Place an atom name in PDB columns 13-16 following the usual alignment rule."""
+    if len(name) >= 4:
+        return name[:4]
+    if len(element) == 2 or (not element and name[:2].upper() in _TWO_LETTER_ELEMENTS):
+        return f"{name:<4}"
+    return f" {name:<3}"
+
+
+def _cif_charge_to_pdb(values: np.ndarray) -> np.ndarray:
+    """mmCIF "-1"/"2" -> PDB "1-"/"2+"; zero and empty charges become blank."""
+    out = []
+    for v in values.tolist():
+        if not v or v in ("0", "+0", "-0"):
+            out.append("")
+        else:
+            out.append(f"{v.lstrip('+-')}{'-' if v.startswith('-') else '+'}")
+    return np.array(out, dtype=str)
+
+
+def _pdb_charge_to_cif(value: str) -> str:
+    if not value:
+        return "?"
+    return f"-{value[:-1]}" if value.endswith("-") else value.rstrip("+")
+
+
+_CIF_TOKEN = re.compile(r"'(?:[^']|'(?=\S))*'|\"(?:[^\"]|\"(?=\S))*\"|\S+")
+
+
+def _atom_site_loop(text: str) -> tuple[list[str], np.ndarray]:
+    """Return (_atom_site column names, flat token array) from an mmCIF data block."""
+    lines = text.splitlines()
+    columns: list[str] = []
+    i = 0
+    while i < len(lines):
+        if lines[i].startswith("_atom_site."):
+            while i < len(lines) and lines[i].startswith("_atom_site."):
+                columns.append(lines[i].split(".", 1)[1].strip())
+                i += 1
+            break
+        i += 1
+    if not columns:
+        return [], np.array([], dtype=str)
+    body = []
+    while i < len(lines) and not lines[i].startswith(("_", "loop_", "#", "data_")):
+        body.append(lines[i])
+        i += 1
+    block = "\n".join(body)
+    if "'" in block or '"' in block:
+        tokens = [t[1:-1] if t[0] in "'\"" else t for t in _CIF_TOKEN.findall(block)]
+    else:
+        tokens = block.split()
+    return columns, np.array(tokens, dtype=str)
+
+
+_HY36_DIGITS_UPPER = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_HY36_DIGITS_LOWER = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def hy36encode(width: int, value: int) -> str:
+    """Encode an integer in hybrid-36, as used for PDB serials and residue numbers."""
+    if -(10 ** (width - 1)) < value < 10**width:
+        return f"{value:>{width}d}"
+    value -= 10**width
+    for digits in (_HY36_DIGITS_UPPER, _HY36_DIGITS_LOWER):
+        span = 26 * 36 ** (width - 1)
+        if value < span:
+            value += 10 * 36 ** (width - 1)
+            out = ""
+            for _ in range(width):
+                value, rem = divmod(value, 36)
+                out = digits[rem] + out
+            return out
+        value -= span
+    raise ValueError(f"Value out of hybrid-36 range for width {width}")
+
+
+def hy36decode(width: int, text: str) -> int:
+    """Inverse of hy36encode."""
+    text = text.strip()
+    if not text:
+        return 0
+    if text.lstrip("-").isdigit():
+        return int(text)
+    span = 26 * 36 ** (width - 1)
+    if text[0].isupper():
+        return int(text, 36) - 10 * 36 ** (width - 1) + 10**width
+    return int(text.upper(), 36) - 10 * 36 ** (width - 1) + 10**width + span
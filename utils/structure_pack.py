@@ -0,0 +1,341 @@
+"""
+Compact binary storage for structures and multi-design archives.
+
+pack() encodes a Structure in a few bytes per atom instead of the ~80 of a
+PDB line:
+
+- Coordinates are quantized to 0.001 Å and occupancy/B-factor to 0.01 (the
+  precision of PDB text, so nothing a PDB file could hold is lost), then
+  delta-encoded along the atom order.
+- Residue topology is deduplicated: each distinct (residue name, atom
+  names, elements) layout is stored once as a template, and residues refer
+  to their template by number.
+- String columns are stored as small integer codes into a vocabulary.
+- Integer arrays are byte-shuffled (all low bytes, then the next ones, ...)
+  before zlib, which puts the near-zero high bytes of deltas together.
+
+An archive holds many packed designs, each compressed on its own, followed
+by an index with names, offsets and per-design metadata. PackedArchive reads
+one design without touching the others; conversion to PDB/mmCIF text
+happens only when a caller asks for it.
+"""
+import json
+import struct
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Iterator, Optional, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from utils.structure import Structure
+
+MAGIC = b"PSTR"
+ARCHIVE_MAGIC = b"PSTA"
+FORMAT_VERSION = 1
+COORD_SCALE = 1000  # 0.001 Å
+ATTR_SCALE = 100  # occupancy and B-factor to 0.01
+COMPRESS_LEVEL = 6
+_FOOTER = struct.Struct("<Q4s")  # index offset, ARCHIVE_MAGIC
+
+# Per-atom string columns stored directly as codes; atom_name, element and
+# res_name come from residue templates, chain_id and icode are per residue
+_ATOM_CODES = ("record", "alt_loc", "charge")
+_RESIDUE_CODES = ("chain_id", "icode")
+
+
+def is_packed(data: bytes) -> bool:
+    """Whether data is a packed structure (as opposed to PDB/mmCIF text)."""
+    return data[:4] == MAGIC
+
+
+def _code_dtype(n: int) -> str:
+    return "u1" if n <= 0xFF else "u2" if n <= 0xFFFF else "u4"
+
+
+def _shuffle(array: "np.ndarray") -> bytes:
+    """Byte planes of a contiguous array, lowest byte of every item first."""
+    import numpy as np
+
+    flat = np.ascontiguousarray(array).reshape(-1)
+    return flat.view(np.uint8).reshape(-1, flat.itemsize).T.tobytes()
+
+
+def _unshuffle(data: bytes, dtype: str, count: int) -> "np.ndarray":
+    import numpy as np
+
+    itemsize = np.dtype(dtype).itemsize
+    planes = np.frombuffer(data, dtype=np.uint8, count=count * itemsize).reshape(itemsize, count)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(-1)
+
+
+def _delta(values: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    values = values.astype(np.int64)
+    return np.diff(values, axis=0, prepend=np.zeros_like(values[:1])).astype(np.int32)
+
+
+def _quantize(values: "np.ndarray", scale: int) -> "np.ndarray":
+    import numpy as np
+
+    return np.round(values.astype(np.float64) * scale).astype(np.int64)
+
+
+def pack(structure: "Structure", level: int = COMPRESS_LEVEL) -> bytes:
+    """Encode a structure; see the module docstring for the layout."""
+    import numpy as np
+
+    n = len(structure)
+    # A residue starts wherever model, chain, number, insertion code or name changes
+    keys = [structure.model, structure.chain_id.codes, structure.res_seq, structure.icode.codes, structure.res_name.codes]
+    change = np.zeros(n, dtype=bool)
+    if n:
+        change[0] = True
+        for key in keys:
+            change[1:] |= key[1:] != key[:-1]
+    starts = np.flatnonzero(change)
+    bounds = np.append(starts, n).tolist()
+
+    atom_names, elements = structure.atom_name.codes, structure.element.codes
+    template_ids: dict[tuple, int] = {}
+    templates: list[list] = []
+    residue_template = np.empty(len(starts), dtype=np.int64)
+    for r, (lo, hi) in enumerate(zip(bounds, bounds[1:])):
+        layout = (int(structure.res_name.codes[lo]), atom_names[lo:hi].tobytes(), elements[lo:hi].tobytes())
+        if layout not in template_ids:
+            template_ids[layout] = len(templates)
+            templates.append([layout[0], atom_names[lo:hi].tolist(), elements[lo:hi].tolist()])
+        residue_template[r] = template_ids[layout]
+
+    arrays: dict[str, "np.ndarray"] = {
+        "coords": _delta(_quantize(structure.coords, COORD_SCALE)).reshape(-1),
+        "occupancy": _delta(_quantize(structure.occupancy, ATTR_SCALE)),
+        "b_factor": _delta(_quantize(structure.b_factor, ATTR_SCALE)),
+        "serial": _delta(structure.serial),
+        "model": _delta(structure.model),
+        "residue_template": residue_template.astype(_code_dtype(len(templates))),
+        "res_seq": _delta(structure.res_seq[starts]),
+    }
+    for name in _ATOM_CODES:
+        column = getattr(structure, name)
+        arrays[name] = column.codes.astype(_code_dtype(len(column.vocab)))
+    for name in _RESIDUE_CODES:
+        column = getattr(structure, name)
+        arrays[name] = column.codes[starts].astype(_code_dtype(len(column.vocab)))
+
+    header = {
+        "atoms": n,
+        "residues": len(starts),
+        "templates": templates,
+        "vocab": {
+            name: getattr(structure, name).vocab.tolist()
+            for name in (*_ATOM_CODES, *_RESIDUE_CODES, "atom_name", "element", "res_name")
+        },
+        "arrays": [[name, array.dtype.str, len(array)] for name, array in arrays.items()],
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    body = b"".join([struct.pack("<I", len(header_bytes)), header_bytes, *(_shuffle(a) for a in arrays.values())])
+    return MAGIC + bytes([FORMAT_VERSION]) + zlib.compress(body, level)
+
+
+def unpack(data: bytes) -> "Structure":
+    """Decode bytes produced by pack()."""
+    import numpy as np
+
+    from utils.structure import Interned, Structure
+
+    if not is_packed(data):
+        raise ValueError("Not a packed structure")
+    if data[4] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported packed structure version {data[4]}")
+    body = zlib.decompress(data[5:])
+    (header_len,) = struct.unpack_from("<I", body)
+    header = json.loads(body[4 : 4 + header_len])
+    offset = 4 + header_len
+    arrays = {}
+    for name, dtype, count in header["arrays"]:
+        size = np.dtype(dtype).itemsize * count
+        arrays[name] = _unshuffle(body[offset : offset + size], dtype, count)
+        offset += size
+
+    vocab = {name: np.array(values, dtype=str) for name, values in header["vocab"].items()}
+    templates = header["templates"]
+    lengths = np.array([len(t[1]) for t in templates], dtype=np.int64)
+    template_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if templates else np.zeros(0, dtype=np.int64)
+    flat_names = np.array([c for t in templates for c in t[1]], dtype=np.uint32)
+    flat_elements = np.array([c for t in templates for c in t[2]], dtype=np.uint32)
+    template_res = np.array([t[0] for t in templates], dtype=np.uint32)
+
+    residue_template = arrays["residue_template"].astype(np.int64)
+    residue_lengths = lengths[residue_template]
+    residue_starts = np.cumsum(residue_lengths) - residue_lengths
+    within = np.arange(header["atoms"]) - np.repeat(residue_starts, residue_lengths)
+    gather = np.repeat(template_starts[residue_template], residue_lengths) + within
+
+    def interned(name: str, codes: "np.ndarray") -> Interned:
+        return Interned(codes.astype(np.uint32), vocab[name])
+
+    def per_atom(values: "np.ndarray") -> "np.ndarray":
+        return np.repeat(values, residue_lengths)
+
+    def undelta(name: str, scale: int = 1, width: int = 1) -> "np.ndarray":
+        values = np.cumsum(arrays[name].astype(np.int64).reshape(-1, width), axis=0)
+        values = values.reshape(-1) if width == 1 else values
+        return (values / scale).astype(np.float32) if scale != 1 else values.astype(np.int32)
+
+    return Structure(
+        coords=undelta("coords", COORD_SCALE, width=3),
+        serial=undelta("serial"),
+        res_seq=per_atom(undelta("res_seq")),
+        occupancy=undelta("occupancy", ATTR_SCALE),
+        b_factor=undelta("b_factor", ATTR_SCALE),
+        model=undelta("model"),
+        record=interned("record", arrays["record"]),
+        atom_name=interned("atom_name", flat_names[gather]),
+        alt_loc=interned("alt_loc", arrays["alt_loc"]),
+        res_name=interned("res_name", per_atom(template_res[residue_template])),
+        chain_id=interned("chain_id", per_atom(arrays["chain_id"])),
+        icode=interned("icode", per_atom(arrays["icode"])),
+        element=interned("element", flat_elements[gather]),
+        charge=interned("charge", arrays["charge"]),
+    )
+
+
+def pack_text(text: Union[str, bytes]) -> bytes:
+    """Parse PDB/mmCIF text and pack it."""
+    from utils.structure import Structure
+
+    return pack(Structure.parse(text))
+
+
+def to_text(data: bytes, fmt: str = "pdb", name: str = "structure") -> str:
+    """PDB ("pdb") or mmCIF ("cif") text of a packed structure."""
+    structure = unpack(data)
+    return structure.to_mmcif(name) if fmt == "cif" else structure.to_pdb()
+
+
+# ------------------------------------------------------------------ archives
+
+
+@dataclass
+class ArchiveEntry:
+    """Index record of one design in an archive."""
+
+    name: str
+    offset: int
+    length: int  # 0 when the entry carries only metadata
+    meta: dict[str, Any] = field(default_factory=dict)
+
+
+class ArchiveWriter:
+    """
+    Stream packed designs into a file object, then write the index on close().
+
+    Args:
+        fileobj: Binary file opened for writing
+    """
+
+    def __init__(self, fileobj: IO[bytes]):
+        self._file = fileobj
+        self._file.write(ARCHIVE_MAGIC + bytes([FORMAT_VERSION]))
+        self._offset = 5
+        self.entries: list[ArchiveEntry] = []
+
+    def add(self, name: str, packed: Optional[bytes] = None, **meta: Any) -> None:
+        """Append a packed design (or a metadata-only entry when packed is None)."""
+        packed = packed or b""
+        self._file.write(packed)
+        self.entries.append(ArchiveEntry(name, self._offset, len(packed), meta))
+        self._offset += len(packed)
+
+    def close(self) -> None:
+        index = zlib.compress(json.dumps([vars(e) for e in self.entries]).encode(), COMPRESS_LEVEL)
+        self._file.write(index)
+        self._file.write(_FOOTER.pack(self._offset, ARCHIVE_MAGIC))
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if exc[0] is None:
+            self.close()
+
+
+def write_archive(entries: list[tuple[str, Optional[bytes], dict]]) -> bytes:
+    """Archive bytes for (name, packed or None, metadata) entries."""
+    import io
+
+    buffer = io.BytesIO()
+    with ArchiveWriter(buffer) as writer:
+        for name, packed, meta in entries:
+            writer.add(name, packed, **meta)
+    return buffer.getvalue()
+
+
+def is_archive(data: bytes) -> bool:
+    return data[:4] == ARCHIVE_MAGIC
+
+
+class PackedArchive:
+    """
+    Random-access reader for an archive in memory or on disk.
+
+    Args:
+        source: Archive bytes, or a path (read with seeks, one design at a time)
+    """
+
+    def __init__(self, source: Union[bytes, str, Path]):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._data: Optional[bytes] = bytes(source)
+            self._path = None
+            size = len(self._data)
+        else:
+            self._data, self._path = None, Path(source)
+            size = self._path.stat().st_size
+        if self._read(0, 4) != ARCHIVE_MAGIC or size < 5 + _FOOTER.size:
+            raise ValueError("Not a packed structure archive")
+        index_offset, magic = _FOOTER.unpack(self._read(size - _FOOTER.size, _FOOTER.size))
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError("Truncated packed structure archive")
+        index = zlib.decompress(self._read(index_offset, size - _FOOTER.size - index_offset))
+        self.entries = [ArchiveEntry(**e) for e in json.loads(index)]
+        self._by_name = {e.name: i for i, e in enumerate(self.entries)}
+
+    def _read(self, offset: int, length: int) -> bytes:
+        if self._data is not None:
+            return self._data[offset : offset + length]
+        with open(self._path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[ArchiveEntry]:
+        return iter(self.entries)
+
+    def names(self) -> list[str]:
+        return [e.name for e in self.entries]
+
+    def _entry(self, key: Union[int, str]) -> ArchiveEntry:
+        return self.entries[self._by_name[key] if isinstance(key, str) else key]
+
+    def packed(self, key: Union[int, str]) -> Optional[bytes]:
+        """Packed bytes of one design (by index or name), or None for metadata-only entries."""
+        entry = self._entry(key)
+        return self._read(entry.offset, entry.length) if entry.length else None
+
+    def structure(self, key: Union[int, str]) -> Optional["Structure"]:
+        packed = self.packed(key)
+        return unpack(packed) if packed else None
+
+    def text(self, key: Union[int, str], fmt: Optional[str] = None) -> Optional[str]:
+        """PDB/mmCIF text of one design; fmt defaults to the format it was stored from."""
+        entry = self._entry(key)
+        packed = self.packed(key)
+        if packed is None:
+            return None
+        fmt = fmt or entry.meta.get("format", "pdb")
+        return to_text(packed, fmt, Path(entry.name).stem)
@@ -0,0 +1,118 @@
+"""
+CPU-rendered structure thumbnails.
+
+A thumbnail is the CA trace projected onto the structure's two principal
+axes, drawn with NumPy into an RGB array: chains are colored N- to
+C-terminus from blue to red, and depth along the third axis darkens the
+farther segments. encode_png() writes the array as a PNG with the standard
+library only.
+"""
+import struct
+import zlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from utils.structure import Structure
+
+DEFAULT_SIZE = 160
+# Consecutive CA atoms farther apart than this (Å) are a chain break
+CA_BREAK_DISTANCE = 4.5
+# Structures without CA atoms are drawn as at most this many points
+MAX_POINTS = 4000
+
+
+def encode_png(rgb: "np.ndarray", level: int = 6) -> bytes:
+    """PNG bytes of an (height, width, 3) uint8 image."""
+    import numpy as np
+
+    height, width, _ = rgb.shape
+    rows = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgb.reshape(height, width * 3)], axis=1)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)  # 8-bit RGB
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows.tobytes(), level))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _rainbow(t: "np.ndarray") -> "np.ndarray":
+    """Blue (t=0) through green to red (t=1), as float RGB in [0, 1]."""
+    import numpy as np
+
+    hue = (1 - t) * 4  # sextants of the HSV wheel: 4 = blue, 0 = red
+    x = 1 - np.abs(hue % 2 - 1)
+    sextant = np.floor(hue).astype(int).clip(0, 5)
+    rgb = np.zeros((len(t), 3))
+    table = [(0, 1), (1, 0), (1, 2), (2, 1), (2, 0), (0, 2)]  # (channel at 1, channel at x) per sextant
+    for s, (full, part) in enumerate(table):
+        mask = sextant == s
+        rgb[mask, full] = 1
+        rgb[mask, part] = x[mask]
+    return rgb
+
+
+def trace_image(structure: "Structure", size: int = DEFAULT_SIZE, margin: int = 6) -> "np.ndarray":
+    """(size, size, 3) uint8 image of the structure's CA trace on a white background."""
+    import numpy as np
+
+    image = np.full((size, size, 3), 255, dtype=np.uint8)
+    atoms = structure[structure.ca_mask]
+    connect = len(atoms) > 0
+    if not connect:
+        atoms = structure[:: max(1, -(-len(structure) // MAX_POINTS))]
+    if not len(atoms):
+        return image
+
+    xyz = atoms.coords.astype(np.float64)
+    xyz -= xyz.mean(axis=0)
+    if len(xyz) > 2:
+        xyz = xyz @ np.linalg.svd(xyz, full_matrices=False)[2].T  # principal axes
+    extent = max(np.ptp(xyz[:, 0]), np.ptp(xyz[:, 1]), 1e-6)
+    scale = (size - 2 * margin - 2) / extent
+    mid = (xyz[:, :2].max(axis=0) + xyz[:, :2].min(axis=0)) / 2
+    px = (xyz[:, :2] - mid) * scale + size / 2
+    px[:, 1] = size - 1 - px[:, 1]  # image rows grow downward
+    depth = (xyz[:, 2] - xyz[:, 2].min()) / (np.ptp(xyz[:, 2]) or 1.0)
+
+    # Position along each chain, for coloring
+    chain = atoms.chain_id.codes
+    starts = np.flatnonzero(np.r_[True, chain[1:] != chain[:-1]])
+    lengths = np.diff(np.r_[starts, len(chain)])
+    position = np.arange(len(chain)) - np.repeat(starts, lengths)
+    t = position / np.maximum(np.repeat(lengths, lengths) - 1, 1)
+
+    if connect and len(atoms) > 1:
+        gap = np.linalg.norm(np.diff(atoms.coords, axis=0), axis=1)
+        bonded = np.flatnonzero((chain[1:] == chain[:-1]) & (gap < CA_BREAK_DISTANCE))
+    else:
+        bonded = np.array([], dtype=int)
+    # Sample each bonded segment every half pixel; lone atoms are single points
+    steps = np.ceil(np.linalg.norm(px[bonded + 1] - px[bonded], axis=1) * 2).astype(int) + 1
+    segment = np.repeat(bonded, steps)
+    offsets = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+    f = (offsets / np.repeat(np.maximum(steps - 1, 1), steps))[:, None]
+    points = np.concatenate([px[segment] * (1 - f) + px[segment + 1] * f, px])
+    z = np.concatenate([depth[segment] * (1 - f[:, 0]) + depth[segment + 1] * f[:, 0], depth])
+    color_t = np.concatenate([t[segment] * (1 - f[:, 0]) + t[segment + 1] * f[:, 0], t])
+
+    shade = 0.45 + 0.55 * z  # nearer (larger z) is brighter
+    colors = (_rainbow(color_t) * shade[:, None] * 255).astype(np.uint8)
+    order = np.argsort(z, kind="stable")  # far first, so near points are drawn last and win
+    points, colors = np.round(points[order]).astype(int), colors[order]
+    for dy, dx in ((0, 0), (0, 1), (1, 0), (1, 1)):
+        rows, cols = points[:, 1] + dy, points[:, 0] + dx
+        inside = (rows >= 0) & (rows < size) & (cols >= 0) & (cols < size)
+        image[rows[inside], cols[inside]] = colors[inside]
+    return image
+
+
+def trace_png(structure: "Structure", size: int = DEFAULT_SIZE) -> bytes:
+    """PNG thumbnail of a structure's CA trace."""
+    return encode_png(trace_image(structure, size))
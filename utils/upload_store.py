@@ -0,0 +1,213 @@
+"""
+Content-addressed store for uploaded and session files.
+
+Uploads are streamed to disk in chunks while being hashed, so no full
+in-memory copy is made, and identical files from any session share one
+path: <root>/<digest[:2]>/<digest><suffix>. Paths are stable and safe to
+hand to backends. A SQLite index records size and last access; files not
+used for max_age_seconds are removed, and least-recently-used files are
+evicted once the store exceeds max_bytes. Files used within the last
+keep_seconds are never evicted so running jobs keep their inputs.
+Derived files written next to an entry (e.g. "<name>.idx") are removed
+with it.
+"""
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+from utils.metrics import count, span
+
+DEFAULT_UPLOAD_DIR = Path(tempfile.gettempdir()) / "portal_uploads"
+DEFAULT_MAX_BYTES = 10 * 1024**3
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 3600
+DEFAULT_KEEP_SECONDS = 24 * 3600
+EVICT_INTERVAL_SECONDS = 60
+_COPY_CHUNK_BYTES = 1024 * 1024
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS files_lru ON files (last_access)",
+)
+
+
+def _clean_suffix(name: str) -> str:
+    """File suffix kept for tools that detect format by extension; never the user's file name."""
+    suffix = Path(name or "").suffix.lower()
+    return suffix if suffix[1:].isalnum() and len(suffix) <= 10 else ""
+
+
+def _session_upload_paths() -> Optional[dict]:
+    """This session's (store root, file_id) -> stored path map, or None outside a Streamlit script run."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        if get_script_run_ctx(suppress_warning=True) is None:
+            return None
+        import streamlit as st
+
+        return st.session_state.setdefault("_upload_store_paths", {})
+    except Exception:
+        return None
+
+
+class UploadStore:
+    """
+    Deduplicating, quota-bounded file store keyed by content hash.
+
+    Args:
+        root: Store directory (created if missing)
+        max_bytes: Total size above which least-recently-used files are evicted
+        max_age_seconds: Files unused for this long are removed
+        keep_seconds: Files used more recently than this are never evicted
+    """
+
+    def __init__(
+        self,
+        root: Path = DEFAULT_UPLOAD_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+        keep_seconds: float = DEFAULT_KEEP_SECONDS,
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.keep_seconds = keep_seconds
+        self._last_evict = 0.0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.root / "index.sqlite3", timeout=30)
+
+    def _path(self, name: str) -> Path:
+        return self.root / name[:2] / name
+
+    def put_stream(self, fileobj: BinaryIO, suffix: str = "") -> Path:
+        """Stream a binary file object into the store. Returns the stored path."""
+        tmp = self.root / f".{uuid.uuid4().hex}.tmp"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with span("upload.store"), open(tmp, "wb") as f:
+                while chunk := fileobj.read(_COPY_CHUNK_BYTES):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            name = digest.hexdigest() + suffix
+            path = self._path(name)
+            path.parent.mkdir(exist_ok=True)
+            if path.exists():
+                tmp.unlink()
+            else:
+                tmp.replace(path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self._record(name, size)
+        count("portal_bytes_total", size, stage="upload.store")
+        return path
+
+    def put_bytes(self, data: Union[bytes, str], suffix: str = "") -> Path:
+        """Store in-memory content. Returns the stored path."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        name = hashlib.sha256(data).hexdigest() + suffix
+        path = self._path(name)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_name(f".{uuid.uuid4().hex}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+        self._record(name, len(data))
+        return path
+
+    def put_upload(self, uploaded_file) -> Path:
+        """
+        Store a Streamlit UploadedFile, keeping only its suffix. Returns the stored path.
+        Within a session the path is remembered by file_id, so reruns do not re-hash the upload.
+        """
+        memo = _session_upload_paths()
+        file_id = getattr(uploaded_file, "file_id", None)
+        key = (str(self.root), file_id)
+        if memo is not None and file_id and key in memo and memo[key].exists():
+            self.touch(memo[key])
+            return memo[key]
+        uploaded_file.seek(0)
+        try:
+            path = self.put_stream(uploaded_file, _clean_suffix(uploaded_file.name))
+        finally:
+            uploaded_file.seek(0)
+        if memo is not None and file_id:
+            memo[key] = path
+        return path
+
+    def touch(self, path: Path) -> None:
+        """Mark a stored file as in use, deferring its eviction."""
+        with self._connect() as conn:
+            conn.execute("UPDATE files SET last_access = ? WHERE name = ?", (time.time(), Path(path).name))
+
+    def _record(self, name: str, size: int) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (name, size, last_access) VALUES (?, ?, ?)",
+                (name, size, now),
+            )
+            if now - self._last_evict >= EVICT_INTERVAL_SECONDS:
+                self._last_evict = now
+                self._evict(conn, now)
+
+    def _remove(self, conn: sqlite3.Connection, name: str) -> None:
+        path = self._path(name)
+        path.unlink(missing_ok=True)
+        for derived in path.parent.glob(f"{name}.*"):
+            derived.unlink(missing_ok=True)
+        conn.execute("DELETE FROM files WHERE name = ?", (name,))
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        for (name,) in conn.execute(
+            "SELECT name FROM files WHERE last_access < ?", (now - self.max_age_seconds,)
+        ).fetchall():
+            self._remove(conn, name)
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()
+        if total <= self.max_bytes:
+            return
+        for name, size in conn.execute(
+            "SELECT name, size FROM files WHERE last_access < ? ORDER BY last_access",
+            (now - self.keep_seconds,),
+        ).fetchall():
+            self._remove(conn, name)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def evict(self) -> None:
+        """Apply the age and size limits now."""
+        with self._connect() as conn:
+            self._evict(conn, time.time())
+
+    def stats(self) -> dict[str, int]:
+        """Return stored file count and total bytes."""
+        with self._connect() as conn:
+            files, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+        return {"files": files, "bytes": size}
+
+
+_upload_store: Optional[UploadStore] = None
+_upload_store_lock = threading.Lock()
+
+
+def get_upload_store() -> UploadStore:
+    """Return the process-wide upload store."""
+    global _upload_store
+    with _upload_store_lock:
+        if _upload_store is None:
+            _upload_store = UploadStore()
+        return _upload_store